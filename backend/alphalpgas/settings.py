@@ -181,6 +181,15 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered invoice/quote PDF cache - local disk by default, or any storage
+# class (e.g. an object storage backend) named by PDF_CACHE_STORAGE
+PDF_CACHE_ROOT = config('PDF_CACHE_ROOT', default=str(BASE_DIR / 'media' / 'pdf_cache'))
+PDF_CACHE_STORAGE = config('PDF_CACHE_STORAGE', default='')
+
+# Worker processes for bulk PDF jobs (statement runs, invoice exports); these
+# can run inside a web request, so keep this well below the server's core count
+PDF_WORKERS = config('PDF_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -281,6 +290,10 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Set once a Celery worker consumes CELERY_BROKER_URL (the Procfile's worker
+# process). Without one, journal posting and EFT matching run in-process after
+# the request commits instead of being queued for a worker that never comes.
+BACKGROUND_WORKER = config('BACKGROUND_WORKER', default=False, cast=bool)
 
 # Wagtail Settings
 WAGTAIL_SITE_NAME = 'Alpha LPGas'
@@ -1,4 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Min
 from .models import (
     HeroBanner, CompanySettings, Client, Category, Product, ProductVariant,
     Quote, QuoteItem, Invoice, InvoiceItem, Payment, CreditNote, CreditNoteItem,
@@ -8,14 +10,40 @@ from .models import (
     LoyaltyCard, LoyaltyTransaction,
     AccountType, VATReturn, CIPCAnnualReturn, SARSTaxReturn, FinancialStatement, TaxConfiguration,
     WhatsAppConversation, WhatsAppMessage, WhatsAppOrderIntent, WhatsAppConfig,
-    UserMenuPermission
+    UserMenuPermission, DocumentSequence, ReconciliationBatch, ReconciliationLine,
+    PayerAlias, JournalLine, AccountBalanceSnapshot, ClientClosingBalance, StockClosingBalance,
+    PeriodClosedError, check_period_open
 )
 from .admin_loyalty import LoyaltyCardAdmin, LoyaltyTransactionAdmin
 
+from .services import posting
+
 # Import WhatsApp admin to trigger registration
 from . import admin_whatsapp
 
 
+@admin.action(description='Post journal entries')
+def post_journal_entries(modeladmin, request, queryset):
+    """Post the selected documents now, listing any left alone in a closed tax period"""
+    kind = posting.document_kind(queryset.model)
+    pks = list(queryset.values_list('pk', flat=True))
+    posted = removed = 0
+    skipped = []
+    try:
+        for start in range(0, len(pks), posting.CHUNK_SIZE):
+            chunk_posted, chunk_removed, chunk_skipped = posting.post_documents(kind, pks[start:start + posting.CHUNK_SIZE])
+            posted += chunk_posted
+            removed += chunk_removed
+            skipped.extend(chunk_skipped)
+    except ImproperlyConfigured as e:
+        modeladmin.message_user(request, str(e), messages.ERROR)
+        return
+    modeladmin.message_user(request, f'{posted} journal entries posted, {removed} replaced or removed.')
+    if skipped:
+        documents = ', '.join(str(document) for document in queryset.model.objects.filter(pk__in=skipped))
+        modeladmin.message_user(request, f'Not posted, dated in a closed tax period: {documents}', messages.WARNING)
+
+
 @admin.register(HeroBanner)
 class HeroBannerAdmin(admin.ModelAdmin):
     list_display = ['title', 'overlay_color', 'is_active', 'order', 'created_at']
@@ -178,6 +206,7 @@ class InvoiceAdmin(admin.ModelAdmin):
     readonly_fields = ['subtotal', 'tax_amount', 'total_amount', 'paid_amount', 'balance', 'created_at', 'updated_at']
     ordering = ['-created_at']
     inlines = [InvoiceItemInline]
+    actions = [post_journal_entries]
     
     @admin.display(description='Client', ordering='client__name')
     def client_name(self, obj):
@@ -197,6 +226,7 @@ class PaymentAdmin(admin.ModelAdmin):
     list_select_related = ['invoice', 'invoice__client', 'client', 'created_by']
     raw_id_fields = ['invoice', 'client', 'created_by']
     autocomplete_fields = ['invoice', 'client']
+    actions = [post_journal_entries]
     
     def get_queryset(self, request):
         """Optimize queryset with select_related to avoid N+1 queries"""
@@ -456,7 +486,7 @@ class SupplierAdmin(admin.ModelAdmin):
 
 @admin.register(ExpenseCategory)
 class ExpenseCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'parent', 'tax_deductible', 'is_active', 'order']
+    list_display = ['name', 'parent', 'account', 'tax_deductible', 'is_active', 'order']
     list_filter = ['is_active', 'tax_deductible', 'parent']
     search_fields = ['name', 'description']
     list_editable = ['is_active', 'order', 'tax_deductible']
@@ -470,6 +500,7 @@ class ExpenseAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
     readonly_fields = ['expense_number', 'subtotal', 'vat_amount', 'created_at', 'updated_at']
     autocomplete_fields = ['supplier', 'category']
+    actions = [post_journal_entries]
     
     fieldsets = (
         ('Expense Details', {
@@ -504,20 +535,28 @@ class ExpenseAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class JournalLineInline(admin.TabularInline):
+    model = JournalLine
+    extra = 2
+    fields = ['account', 'description', 'debit', 'credit']
+    autocomplete_fields = ['account']
+
+
 @admin.register(JournalEntry)
 class JournalEntryAdmin(admin.ModelAdmin):
+    inlines = [JournalLineInline]
     list_display = ['entry_number', 'date', 'entry_type', 'description_short', 'debit_amount', 'credit_amount', 'status']
     list_filter = ['status', 'entry_type', 'date']
     search_fields = ['entry_number', 'description', 'reference']
     date_hierarchy = 'date'
-    readonly_fields = ['entry_number', 'created_at', 'updated_at', 'posted_at', 'posted_by']
+    readonly_fields = ['entry_number', 'source', 'posting_key', 'created_at', 'updated_at', 'posted_at', 'posted_by']
     
     fieldsets = (
         ('Entry Details', {
             'fields': ('entry_number', 'date', 'entry_type', 'description', 'reference')
         }),
         ('Related Records', {
-            'fields': ('invoice', 'expense', 'payment'),
+            'fields': ('invoice', 'expense', 'payment', 'source', 'posting_key'),
             'classes': ('collapse',)
         }),
         ('Amounts', {
@@ -541,18 +580,35 @@ class JournalEntryAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
     
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if form.instance.lines.exists():
+            form.instance.update_totals()
+    
     actions = ['post_entries', 'void_entries']
     
     def post_entries(self, request, queryset):
         count = 0
         for entry in queryset.filter(status='draft'):
-            entry.post(request.user)
+            try:
+                entry.post(request.user)
+            except ValueError as e:
+                self.message_user(request, str(e), level=messages.ERROR)
+                continue
             count += 1
         self.message_user(request, f'{count} journal entries posted.')
     post_entries.short_description = 'Post selected entries'
     
     def void_entries(self, request, queryset):
-        count = queryset.filter(status='posted').update(status='void')
+        posted = queryset.filter(status='posted')
+        first_date = posted.aggregate(first=Min('date'))['first']
+        try:
+            check_period_open('A selected entry', first_date)
+        except PeriodClosedError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        count = posted.update(status='void')
+        AccountBalanceSnapshot.invalidate(first_date)
         self.message_user(request, f'{count} journal entries voided.')
     void_entries.short_description = 'Void selected entries'
 
@@ -562,7 +618,8 @@ class TaxPeriodAdmin(admin.ModelAdmin):
     list_display = ['name', 'period_type', 'start_date', 'end_date', 'status', 'total_income', 'total_expenses', 'vat_payable']
     list_filter = ['status', 'period_type']
     search_fields = ['name']
-    readonly_fields = ['total_income', 'total_expenses', 'output_vat', 'input_vat', 'vat_payable', 'created_at', 'updated_at']
+    readonly_fields = ['total_income', 'total_expenses', 'output_vat', 'input_vat', 'vat_payable',
+                       'closed_at', 'closed_by', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Period Details', {
@@ -575,19 +632,84 @@ class TaxPeriodAdmin(admin.ModelAdmin):
         ('Filing', {
             'fields': ('filed_date', 'notes')
         }),
+        ('Closing', {
+            'fields': ('closed_at', 'closed_by'),
+            'description': 'Use the Close and Reopen actions. Records dated on or before the end of a closed period cannot be changed.'
+        }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
-    actions = ['calculate_totals']
+    actions = ['calculate_totals', 'close_periods', 'reopen_periods', 'mark_filed']
+    
+    def get_readonly_fields(self, request, obj=None):
+        # A closed period's status only changes through the actions, which keep its closing balances in step
+        if obj and obj.closed_at:
+            return self.readonly_fields + ['status']
+        return self.readonly_fields
     
     def calculate_totals(self, request, queryset):
         for period in queryset:
             period.calculate_totals()
         self.message_user(request, f'Totals calculated for {queryset.count()} periods.')
     calculate_totals.short_description = 'Calculate totals for selected periods'
+    
+    def close_periods(self, request, queryset):
+        count = 0
+        for period in queryset.order_by('end_date'):
+            try:
+                period.close(request.user)
+                count += 1
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+        self.message_user(request, f'{count} periods closed.')
+    close_periods.short_description = 'Close selected periods'
+    
+    def reopen_periods(self, request, queryset):
+        count = 0
+        for period in queryset.order_by('-end_date'):
+            try:
+                period.reopen()
+                count += 1
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+        self.message_user(request, f'{count} periods reopened.')
+    reopen_periods.short_description = 'Reopen selected periods'
+    
+    def mark_filed(self, request, queryset):
+        from django.utils import timezone
+        count = queryset.filter(status='closed').update(status='filed', filed_date=timezone.now().date())
+        self.message_user(request, f'{count} closed periods marked as filed.')
+    mark_filed.short_description = 'Mark selected closed periods as filed'
+
+
+@admin.register(ClientClosingBalance)
+class ClientClosingBalanceAdmin(admin.ModelAdmin):
+    list_display = ['period', 'client', 'balance']
+    list_filter = ['period']
+    search_fields = ['client__name']
+    list_select_related = ['period', 'client']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockClosingBalance)
+class StockClosingBalanceAdmin(admin.ModelAdmin):
+    list_display = ['period', 'cylinder_size', 'quantity']
+    list_filter = ['period', 'cylinder_size']
+    list_select_related = ['period', 'cylinder_size']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # ============================================
@@ -640,6 +762,7 @@ class StockPurchaseAdmin(admin.ModelAdmin):
     readonly_fields = ['purchase_number', 'total_cylinders', 'total_volume_kg', 'total_cost', 'created_at', 'updated_at']
     autocomplete_fields = ['supplier', 'expense']
     inlines = [StockPurchaseItemInline]
+    actions = [post_journal_entries]
     
     fieldsets = (
         ('Purchase Details', {
@@ -856,7 +979,16 @@ class CIPCAnnualReturnAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_submitted', 'mark_approved']
+    actions = ['populate_financials', 'mark_submitted', 'mark_approved']
+    
+    def populate_financials(self, request, queryset):
+        count = 0
+        for cipc_return in queryset.filter(status='draft'):
+            cipc_return.populate_from_financial_statements()
+            cipc_return.save()
+            count += 1
+        self.message_user(request, f'{count} CIPC returns populated from the ledger.')
+    populate_financials.short_description = 'Populate financial figures from the ledger'
     
     def mark_submitted(self, request, queryset):
         from django.utils import timezone
@@ -939,7 +1071,16 @@ class SARSTaxReturnAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['calculate_tax', 'mark_submitted', 'mark_assessed', 'mark_paid']
+    actions = ['populate_financials', 'calculate_tax', 'mark_submitted', 'mark_assessed', 'mark_paid']
+    
+    def populate_financials(self, request, queryset):
+        count = 0
+        for tax_return in queryset.filter(status='draft'):
+            tax_return.populate_from_financial_statements()
+            tax_return.save()
+            count += 1
+        self.message_user(request, f'{count} tax returns populated from the ledger.')
+    populate_financials.short_description = 'Populate income and deductions from the ledger'
     
     def calculate_tax(self, request, queryset):
         count = 0
@@ -1121,3 +1262,48 @@ class UserMenuPermissionAdmin(admin.ModelAdmin):
             'description': 'Fine-grained control over Accounting menu items. Only applies if "Accounting menu" is enabled above.'
         }),
     )
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ['key', 'document_type', 'last_value', 'updated_at']
+    list_filter = ['document_type']
+    search_fields = ['key']
+    readonly_fields = ['key', 'document_type', 'start_value', 'updated_at']
+    
+    def has_add_permission(self, request):
+        # Sequences are created on first use; reseed with the management command
+        return False
+
+
+class ReconciliationLineInline(admin.TabularInline):
+    model = ReconciliationLine
+    extra = 0
+    fields = ['row_num', 'date', 'amount', 'description', 'status', 'payment']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(ReconciliationBatch)
+class ReconciliationBatchAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'status', 'total_lines', 'matched_lines', 'skipped_rows', 'created_by', 'created_at']
+    list_filter = ['status']
+    search_fields = ['filename']
+    readonly_fields = ['total_lines', 'processed_lines', 'matched_lines', 'skipped_rows', 'error', 'created_at', 'updated_at']
+    inlines = [ReconciliationLineInline]
+
+
+@admin.register(PayerAlias)
+class PayerAliasAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'client', 'times_matched', 'last_matched_at']
+    search_fields = ['reference', 'client__name']
+    raw_id_fields = ['client']
+    readonly_fields = ['times_matched', 'last_matched_at', 'created_at', 'updated_at']
+
+
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['account', 'month', 'debit_total', 'credit_total', 'updated_at']
+    list_filter = ['month']
+    search_fields = ['account__code', 'account__name']
+    readonly_fields = ['account', 'month', 'debit_total', 'credit_total', 'updated_at']
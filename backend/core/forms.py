@@ -3,10 +3,31 @@ from django.core.exceptions import ValidationError
 from django.db.models import Q
 from .models import (
     Client, Product, Quote, QuoteItem, Invoice, InvoiceItem,
-    Payment, CreditNote, CreditNoteItem, CompanySettings
+    Payment, CreditNote, CreditNoteItem, CompanySettings,
+    PeriodClosedError, check_period_open
 )
 
 
+def _open_period_date(form, field, label, keep_stored=True):
+    """
+    Clean a document date that must fall after every closed TaxPeriod. When
+    editing, the date already stored is checked too unless keep_stored is
+    False and the date is unchanged.
+    """
+    day = form.cleaned_data.get(field)
+    days = [day]
+    if form.instance.pk:
+        stored = getattr(form.instance, field)
+        if stored == day and not keep_stored:
+            return day
+        days.append(stored)
+    try:
+        check_period_open(label, *days)
+    except PeriodClosedError as e:
+        raise ValidationError(str(e))
+    return day
+
+
 class ClientForm(forms.ModelForm):
     """Form for creating and updating clients"""
     
@@ -326,6 +347,10 @@ class InvoiceForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Customize client dropdown to show name, phone, and address
         self.fields['client'].label_from_instance = lambda obj: f"{obj.name} - {obj.phone or 'No phone'} - {obj.address or 'No address'}"
+    
+    def clean_issue_date(self):
+        # Only the totals of an invoice in a closed period are frozen, so an unchanged date is fine
+        return _open_period_date(self, 'issue_date', 'This invoice', keep_stored=False)
 
 
 class InvoiceItemForm(forms.ModelForm):
@@ -428,6 +453,9 @@ class PaymentForm(forms.ModelForm):
             except Invoice.DoesNotExist:
                 pass
         
+    def clean_payment_date(self):
+        return _open_period_date(self, 'payment_date', 'This payment')
+    
     def clean(self):
         cleaned_data = super().clean()
         invoice = cleaned_data.get('invoice')
@@ -504,6 +532,9 @@ class MultiPaymentForm(forms.ModelForm):
             except (ValueError, TypeError):
                 self.fields['selected_invoices'].queryset = Invoice.objects.none()
 
+    def clean_payment_date(self):
+        return _open_period_date(self, 'payment_date', 'This payment')
+
     def clean(self):
         """Validate that selected invoices belong to the client"""
         cleaned_data = super().clean()
@@ -596,6 +627,9 @@ class CreditNoteForm(forms.ModelForm):
         if not self.instance.pk:
             from datetime import date
             self.fields['issue_date'].initial = date.today()
+    
+    def clean_issue_date(self):
+        return _open_period_date(self, 'issue_date', 'This credit note')
 
 
 class CreditNoteItemForm(forms.ModelForm):
@@ -0,0 +1,58 @@
+"""
+Management command to audit document number sequences for gaps.
+A gap is a number the sequence has issued that no longer exists in the
+document table, e.g. a deleted invoice.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.models import DocumentSequence
+from core.models_sequence import DOCUMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = 'List document numbers issued by a sequence that are missing from the document tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            dest='types',
+            help='Document code to audit (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--key',
+            type=str,
+            help='Audit a single sequence key, e.g. INV or PAY-20240115',
+        )
+
+    def handle(self, *args, **options):
+        codes = options['types'] or list(DOCUMENT_TYPES)
+        unknown = [code for code in codes if code not in DOCUMENT_TYPES]
+        if unknown:
+            raise CommandError(f'Unknown document type(s): {", ".join(unknown)}')
+
+        sequences = DocumentSequence.objects.filter(document_type__in=codes)
+        if options['key']:
+            sequences = sequences.filter(key=options['key'])
+
+        total_missing = 0
+        for sequence in sequences:
+            gaps = sequence.find_gaps()
+            if not gaps:
+                continue
+
+            code = sequence.document_type
+            missing = sum(last - first + 1 for first, last in gaps)
+            total_missing += missing
+            self.stdout.write(self.style.WARNING(f'{sequence.key}: {missing} missing number(s)'))
+            for first, last in gaps:
+                first_number = DocumentSequence.format_number(code, sequence.key, first)
+                if first == last:
+                    self.stdout.write(f'  {first_number}')
+                else:
+                    last_number = DocumentSequence.format_number(code, sequence.key, last)
+                    self.stdout.write(f'  {first_number} .. {last_number}')
+
+        if total_missing:
+            self.stdout.write(self.style.WARNING(f'\nTotal missing numbers: {total_missing}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No gaps found'))
@@ -0,0 +1,105 @@
+"""
+Management command to benchmark invoice number allocation against table size.
+Inserts synthetic invoices inside a transaction that is rolled back at the end,
+so it is safe to run against a development copy of the database.
+Usage: python manage.py benchmark_document_numbers --invoices 100000
+"""
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Client, Invoice, DocumentSequence
+from core.models_sequence import INVOICE_NUMBER_FLOOR
+
+
+class Command(BaseCommand):
+    help = 'Benchmark INV number allocation latency as the invoice table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invoices',
+            type=int,
+            default=100000,
+            help='Number of synthetic invoices to insert (default: 100000)',
+        )
+        parser.add_argument(
+            '--checkpoints',
+            type=int,
+            default=5,
+            help='Number of table sizes to measure at (default: 5)',
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=50,
+            help='Allocations timed per checkpoint (default: 50)',
+        )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Also time the previous full-scan allocation for comparison',
+        )
+
+    def handle(self, *args, **options):
+        total = options['invoices']
+        checkpoints = max(1, options['checkpoints'])
+        samples = max(1, options['samples'])
+        step = max(1, total // checkpoints)
+
+        self.stdout.write(f'Benchmarking INV allocation up to {total} invoices ({samples} samples per checkpoint)')
+        self.stdout.write(f'{"invoices":>10}  {"sequence ms":>12}  {"legacy scan ms":>15}')
+
+        with transaction.atomic():
+            client = Client.objects.create(name='Benchmark Client', phone='0000000000')
+            today = date.today()
+            inserted = 0
+            next_value = DocumentSequence.reseed('INV', 'INV').last_value + 1
+
+            while inserted < total:
+                batch = min(step, total - inserted)
+                Invoice.objects.bulk_create(
+                    [
+                        Invoice(
+                            invoice_number=f"INV-{next_value + i:06d}",
+                            client=client,
+                            issue_date=today,
+                            due_date=today,
+                        )
+                        for i in range(batch)
+                    ],
+                    batch_size=5000,
+                )
+                next_value += batch
+                inserted += batch
+                DocumentSequence.reseed('INV', 'INV')
+
+                sequence_ms = self._time(lambda: DocumentSequence.next_number('INV'), samples)
+                legacy_ms = self._time(self._legacy_next_number, samples) if options['legacy'] else None
+                # Keep the synthetic numbers contiguous with the sequence
+                next_value = DocumentSequence.objects.get(key='INV').last_value + 1
+
+                legacy_text = f'{legacy_ms:15.3f}' if legacy_ms is not None else f'{"-":>15}'
+                self.stdout.write(f'{inserted:>10}  {sequence_ms:12.3f}  {legacy_text}')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (all benchmark data rolled back)'))
+
+    def _time(self, allocate, samples):
+        """Average milliseconds per call"""
+        start = time.perf_counter()
+        for _ in range(samples):
+            allocate()
+        return (time.perf_counter() - start) * 1000 / samples
+
+    def _legacy_next_number(self):
+        """Previous Invoice.save() allocation: scan and parse every INV number"""
+        max_num = INVOICE_NUMBER_FLOOR
+        for inv_num in Invoice.objects.filter(invoice_number__startswith='INV-').values_list('invoice_number', flat=True):
+            try:
+                num = int(inv_num.replace('INV-', ''))
+                if num > max_num:
+                    max_num = num
+            except (ValueError, AttributeError):
+                continue
+        return f"INV-{max_num + 1:06d}"
@@ -0,0 +1,223 @@
+"""
+Management command to benchmark EFT description matching on a synthetic
+statement. Builds unsaved clients and invoices in memory, so it never
+touches the database. Compares the previous per-invoice scoring, which
+tokenised every client on every row, with the per-upload ClientMatchIndex,
+and checks both give the same scores and reasons.
+Usage: python manage.py benchmark_eft_matching --clients 10000 --rows 1000
+"""
+import random
+import re
+import time
+from django.core.management.base import BaseCommand
+from core.models import Client, Invoice
+from core.views_eft_reconciliation import (
+    ClientMatchIndex, _score_description_match, extract_invoice_number,
+    partial_contains, similarity_ratio,
+)
+
+
+FIRST_NAMES = ['john', 'mary', 'thabo', 'sipho', 'anna', 'pieter', 'fatima', 'david', 'lerato', 'ahmed',
+               'sarah', 'johan', 'nomsa', 'michael', 'zanele', 'chris', 'ruth', 'kagiso', 'emma', 'yusuf']
+LAST_NAMES = ['smith', 'naidoo', 'botha', 'dlamini', 'van der merwe', 'khumalo', 'pillay', 'jacobs',
+              'nel', 'mokoena', 'adams', 'fourie', 'ndlovu', 'peters', 'le roux', 'mahlangu', 'davids',
+              'venter', 'sithole', 'hendricks', 'coetzee', 'zulu', 'williams', 'kruger', 'moodley']
+STREETS = ['main', 'kommetjie', 'ou kaapse weg', 'welcome glen', 'noordhoek', 'sunnybrae', 'beach',
+           'recreation', 'milkwood', 'protea', 'fish eagle', 'silvermine', 'clovelly', 'glencairn']
+SUFFIXES = ['road', 'street', 'avenue', 'close', 'crescent', 'drive', 'way']
+CITIES = ['Fish Hoek', 'Kommetjie', 'Noordhoek', 'Sun Valley', 'Simons Town', 'Ocean View', 'Capri']
+NOISE = ['IB PAYMENT FROM {n}', 'MAGTAPE CREDIT {n}', 'CREDIT TRANSFER REF {n}', 'DEPOSIT ATM {n}',
+         'IMMEDIATE PAYMENT {n}', 'SALARY {n}']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark EFT description matching with and without the client match index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=10000,
+            help='Synthetic clients with one open invoice each (default: 10000)',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Synthetic bank statement rows (default: 1000)',
+        )
+        parser.add_argument(
+            '--legacy-rows',
+            type=int,
+            default=20,
+            help='Rows timed with the previous scoring, which is too slow to run on all (default: 20)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        invoices = self._invoices(rng, options['clients'])
+        rows = self._descriptions(rng, invoices, options['rows'])
+        legacy_rows = rows[:max(1, min(options['legacy_rows'], len(rows)))]
+
+        self.stdout.write(
+            f'{len(invoices)} clients, {len(rows)} rows '
+            f'({len(legacy_rows)} rows scored with the previous method)'
+        )
+
+        # Previous method: score every client's invoice on every row
+        start = time.perf_counter()
+        legacy_results = [
+            [self._legacy_score(invoice, description) for invoice in invoices]
+            for description in legacy_rows
+        ]
+        legacy_ms = (time.perf_counter() - start) * 1000 / len(legacy_rows)
+
+        # Indexed: one index per upload, then score only clients with evidence
+        by_client = {invoice.client.pk: invoice for invoice in invoices}
+        start = time.perf_counter()
+        index = ClientMatchIndex(invoice.client for invoice in invoices)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        candidates = 0
+        for description in rows:
+            evidence = index.match(description)
+            for client_id in evidence.candidate_client_ids():
+                _score_description_match(by_client[client_id], description, evidence)
+                candidates += 1
+        indexed_ms = (time.perf_counter() - start) * 1000 / len(rows)
+
+        # Same scores and reasons for every client on the legacy rows
+        mismatches = 0
+        fuzzy_only = 0
+        for description, expected in zip(legacy_rows, legacy_results):
+            evidence = index.match(description)
+            candidate_ids = evidence.candidate_client_ids()
+            for invoice, legacy in zip(invoices, expected):
+                if _score_description_match(invoice, description, evidence) != legacy:
+                    mismatches += 1
+                if legacy[0] > 0 and invoice.client.pk not in candidate_ids:
+                    fuzzy_only += 1
+
+        self.stdout.write(f'{"method":>10}  {"ms per row":>12}')
+        self.stdout.write(f'{"previous":>10}  {legacy_ms:12.3f}')
+        self.stdout.write(f'{"indexed":>10}  {indexed_ms:12.3f}')
+        self.stdout.write(f'Index build: {build_ms:.1f} ms, {candidates / len(rows):.1f} candidate clients per row')
+        self.stdout.write(
+            f'Matches without indexed evidence (fuzzy name or invoice number only): {fuzzy_only}'
+        )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} score(s) differ from the previous method'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Scores and reasons identical; indexed matching is {legacy_ms / indexed_ms:.0f}x faster per row'
+            ))
+
+    def _invoices(self, rng, count):
+        invoices = []
+        for i in range(1, count + 1):
+            client = Client(
+                pk=i,
+                name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'.title(),
+                phone='0000000000',
+                address=f'{rng.randint(1, 250)} {rng.choice(STREETS)} {rng.choice(SUFFIXES)}'.title(),
+                city=rng.choice(CITIES),
+            )
+            invoices.append(Invoice(pk=i, invoice_number=f'INV-{4240 + i:06d}', client=client))
+        return invoices
+
+    def _descriptions(self, rng, invoices, count):
+        rows = []
+        for _ in range(count):
+            roll = rng.random()
+            invoice = rng.choice(invoices)
+            client = invoice.client
+            if roll < 0.3:
+                rows.append(f'MAGTAPE CREDIT {client.name[0]} {client.name.split()[-1]} {client.address}'.upper())
+            elif roll < 0.5:
+                rows.append(f'{client.name} {invoice.invoice_number.replace("-", "")}'.upper())
+            elif roll < 0.7:
+                rows.append(f'IB PAYMENT {client.address}'.upper())
+            else:
+                rows.append(rng.choice(NOISE).format(n=rng.randint(1000, 9999999)))
+        return rows
+
+    def _legacy_score(self, invoice, description):
+        """Previous _score_description_match, tokenising the client on every call"""
+        score = 0
+        reasons = []
+        description_lower = description.lower() if description else ''
+
+        if not description_lower:
+            return score, reasons
+
+        inv_num_raw = invoice.invoice_number
+        inv_num_digits = inv_num_raw.replace('INV-', '').replace('INV', '').lstrip('0') or '0'
+
+        if inv_num_raw.lower() in description_lower:
+            score += 60
+            reasons.append(f"Invoice number '{inv_num_raw}' found in description")
+        else:
+            extracted = extract_invoice_number(description)
+            if extracted:
+                extracted_num, is_strong = extracted
+                if extracted_num == inv_num_digits:
+                    score += 50 if is_strong else 30
+                    reasons.append(f"Invoice number match: {inv_num_raw}")
+
+        client_name = invoice.client.name
+        if client_name:
+            name_parts = [p for p in client_name.lower().split() if len(p) >= 3]
+            name_in_desc = any(part in description_lower for part in name_parts)
+
+            if name_in_desc:
+                score += 35
+                reasons.append(f"Client name '{client_name}' found in description")
+            elif partial_contains(description, client_name):
+                score += 30
+                reasons.append(f"Client name '{client_name}' matches description")
+            else:
+                name_similarity = similarity_ratio(client_name, description)
+                if name_similarity > 0.55:
+                    score += int(name_similarity * 25)
+                    reasons.append(f"Client name similarity: {int(name_similarity * 100)}%")
+
+        client_address = invoice.client.address
+        if client_address:
+            addr_parts = [p for p in re.split(r'[\s,./\-]+', client_address.lower()) if len(p) >= 2]
+            addr_numbers = [p for p in addr_parts if p.isdigit()]
+            addr_words = [p for p in addr_parts if not p.isdigit() and len(p) >= 3]
+            has_number_match = any(num in description_lower for num in addr_numbers)
+
+            street_name_matches = []
+            for word in addr_words:
+                if word in description_lower:
+                    street_name_matches.append(word)
+                elif len(word) >= 3:
+                    for i in range(len(word) - 2):
+                        if word[i:i+3] in description_lower:
+                            street_name_matches.append(word[:i+3])
+                            break
+
+            has_street_match = len(street_name_matches) > 0
+
+            if has_number_match and has_street_match:
+                score += 40
+                reasons.append(f"Address match: number + street name '{client_address}'")
+            elif has_street_match and not addr_numbers:
+                score += 30
+                reasons.append(f"Street name match: '{client_address}'")
+
+        client_city = invoice.client.city
+        if client_city and len(client_city) >= 3:
+            if client_city.lower() in description_lower:
+                score += 10
+                reasons.append(f"City '{client_city}' found in description")
+
+        return score, reasons
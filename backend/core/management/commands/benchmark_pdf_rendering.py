@@ -0,0 +1,67 @@
+"""
+Management command to benchmark per-document PDF render time with and
+without the cached PDF rendering context. The cold figures rebuild the
+context before every render, which is what each PDF used to cost.
+Read-only: renders existing invoices without saving anything.
+Usage: python manage.py benchmark_pdf_rendering --samples 50
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Invoice
+from core.pdf_generator import generate_invoice_pdf, get_pdf_context, invalidate_pdf_context
+
+
+class Command(BaseCommand):
+    help = 'Benchmark invoice PDF render time with a cold and a cached rendering context'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invoice',
+            help='Invoice number to render (default: the latest invoice with items)',
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=50,
+            help='Renders timed per mode (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        samples = max(1, options['samples'])
+
+        invoices = Invoice.objects.select_related('client')
+        if options['invoice']:
+            invoice = invoices.filter(invoice_number=options['invoice']).first()
+            if invoice is None:
+                raise CommandError(f"Invoice {options['invoice']} not found")
+        else:
+            invoice = invoices.filter(items__isnull=False).order_by('-pk').first()
+            if invoice is None:
+                raise CommandError('No invoices with items to render')
+
+        self.stdout.write(f'Rendering {invoice.invoice_number} {samples} times per mode')
+
+        # Warm imports and the database connection before timing anything
+        generate_invoice_pdf(invoice)
+
+        def cold_render():
+            invalidate_pdf_context()
+            generate_invoice_pdf(invoice)
+
+        cold_ms = self._time(cold_render, samples)
+
+        get_pdf_context()
+        cached_ms = self._time(lambda: generate_invoice_pdf(invoice), samples)
+
+        self.stdout.write(f'{"mode":>8}  {"ms per invoice":>15}')
+        self.stdout.write(f'{"cold":>8}  {cold_ms:15.3f}')
+        self.stdout.write(f'{"cached":>8}  {cached_ms:15.3f}')
+        if cached_ms:
+            self.stdout.write(self.style.SUCCESS(f'Cached context is {cold_ms / cached_ms:.2f}x faster'))
+
+    def _time(self, render, samples):
+        """Average milliseconds per call"""
+        start = time.perf_counter()
+        for _ in range(samples):
+            render()
+        return (time.perf_counter() - start) * 1000 / samples
@@ -0,0 +1,52 @@
+"""
+Management command to close tax periods, freezing their balances.
+Closes every open period ending on or before --through, oldest first, and
+writes closing balances for periods that were marked closed or filed
+before closing balances existed (run once after upgrading):
+    python manage.py close_tax_periods --through 2026-02-28
+    python manage.py close_tax_periods --existing
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import TaxPeriod
+from core.models_period_close import CLOSED_STATUSES
+from core.services import period_close
+
+
+class Command(BaseCommand):
+    help = 'Close tax periods and write their closing balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--through',
+            type=date.fromisoformat,
+            help='Close every open period ending on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--existing',
+            action='store_true',
+            help='Write closing balances for periods already closed or filed without them',
+        )
+
+    def handle(self, *args, **options):
+        if not options['through'] and not options['existing']:
+            raise CommandError('Pass --through and/or --existing')
+
+        if options['existing']:
+            for period in TaxPeriod.objects.filter(
+                status__in=CLOSED_STATUSES, closed_at__isnull=True,
+            ).order_by('end_date'):
+                period_close.snapshot_period(period)
+                period.closed_at = timezone.now()
+                period.save(update_fields=['closed_at', 'updated_at'])
+                self.stdout.write(f'Wrote closing balances for {period.name}')
+
+        if options['through']:
+            for period in TaxPeriod.objects.filter(
+                status='open', end_date__lte=options['through'],
+            ).order_by('end_date'):
+                period_close.close_period(period)
+                self.stdout.write(f'Closed {period.name}')
+
+        self.stdout.write(self.style.SUCCESS('Done'))
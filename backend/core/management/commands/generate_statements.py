@@ -0,0 +1,109 @@
+"""
+Management command for the month-end statement run.
+Renders a PDF statement for every client with activity in the period and
+writes them to storage as one zip archive or as per-client files:
+    python manage.py generate_statements
+    python manage.py generate_statements --from 2025-03-01 --to 2025-03-31 --output files
+    python manage.py generate_statements --async
+"""
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from core.services.statement_run import StatementRun, OUTPUT_CHOICES, OUTPUT_ZIP
+
+
+class Command(BaseCommand):
+    help = 'Generate PDF statements for all clients with activity in a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            help='Statement start date (YYYY-MM-DD, default: first day of last month)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            help='Statement end date (YYYY-MM-DD, default: last day of last month)',
+        )
+        parser.add_argument(
+            '--output',
+            choices=OUTPUT_CHOICES,
+            default=OUTPUT_ZIP,
+            help='Write one zip archive or one file per client (default: zip)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Rendering processes (default: the PDF_WORKERS setting)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Statements rendered per batch (default: 50)',
+        )
+        parser.add_argument(
+            '--async',
+            dest='run_async',
+            action='store_true',
+            help='Queue the run as a Celery task instead of running it here',
+        )
+
+    def _parse_date(self, value, option):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+
+    def handle(self, *args, **options):
+        last_month_end = date.today().replace(day=1) - timedelta(days=1)
+        start_date = last_month_end.replace(day=1)
+        end_date = last_month_end
+        if options['date_from']:
+            start_date = self._parse_date(options['date_from'], '--from')
+        if options['date_to']:
+            end_date = self._parse_date(options['date_to'], '--to')
+        if start_date > end_date:
+            raise CommandError('--from must not be after --to')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        if options['run_async']:
+            from core.tasks import generate_statements
+            task = generate_statements.delay(
+                str(start_date), str(end_date),
+                output=options['output'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Queued statement run as task {task.id}'))
+            return
+
+        self.stdout.write(f'Generating statements from {start_date} to {end_date}...')
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total} statements')
+
+        result = StatementRun(
+            start_date, end_date,
+            output=options['output'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        ).run()
+
+        if not result['total']:
+            self.stdout.write('No client activity in this period, nothing to generate')
+            return
+
+        for failure in result['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"Client {failure['client_id']}: {failure['error']}"
+            ))
+        if result['output'] == OUTPUT_ZIP:
+            self.stdout.write(f"Archive: {result['files'][0]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {result['rendered']} statement(s) written, {len(result['failed'])} failed"
+        ))
@@ -6,7 +6,7 @@ import os
 from decimal import Decimal
 from django.core.management.base import BaseCommand
 from django.db import connection
-from core.models import Client, Invoice, InvoiceItem, Product, Payment
+from core.models import Client, Invoice, InvoiceItem, Product, Payment, DocumentSequence
 
 
 class Command(BaseCommand):
@@ -173,6 +173,9 @@ class Command(BaseCommand):
         
         local_conn.close()
         
+        # Continue invoice numbering after the imported numbers
+        DocumentSequence.reseed('INV', 'INV')
+        
         self.stdout.write(self.style.SUCCESS(
             f'\nImport completed!\n'
             f'Invoices: {created} created, {updated} updated, {errors} errors\n'
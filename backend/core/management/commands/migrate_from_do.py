@@ -7,7 +7,7 @@ from decimal import Decimal
 from datetime import datetime
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from core.models import Client, Invoice, InvoiceItem, Product, Payment
+from core.models import Client, Invoice, InvoiceItem, Product, Payment, DocumentSequence
 
 
 class Command(BaseCommand):
@@ -68,6 +68,9 @@ class Command(BaseCommand):
             
             if not clients_only:
                 self.migrate_invoices(cursor, dry_run)
+                if not dry_run:
+                    # Continue invoice numbering after the imported numbers
+                    DocumentSequence.reseed('INV', 'INV')
 
             cursor.close()
             conn.close()
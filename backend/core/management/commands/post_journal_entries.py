@@ -0,0 +1,68 @@
+"""
+Management command to post journal entries for existing documents.
+Walks invoices, payments, expenses and stock purchases in primary key order,
+10,000 at a time, each chunk in its own transaction. Documents already posted
+with the same figures are skipped, so an interrupted run can simply be
+started again. Documents dated in a closed tax period are skipped and
+listed, so post history before closing periods.
+Usage: python manage.py post_journal_entries
+       python manage.py post_journal_entries --kind invoice --kind payment
+"""
+import time
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from core.services import posting
+
+
+class Command(BaseCommand):
+    help = 'Post automatic journal entries for existing invoices, payments, expenses and stock purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=list(posting.DOCUMENT_KINDS),
+            help='Document kind to post (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=posting.CHUNK_SIZE,
+            help=f'Documents per transaction (default: {posting.CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        # Fail before the first chunk if the chart of accounts is incomplete
+        try:
+            posting.posting_accounts()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        for kind in options['kind'] or posting.DOCUMENT_KINDS:
+            model = apps.get_model(posting.DOCUMENT_KINDS[kind][0])
+            started = time.perf_counter()
+            posted = removed = 0
+            skipped = []
+            last_pk = 0
+            while True:
+                pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:options['chunk_size']])
+                if not pks:
+                    break
+                chunk_posted, chunk_removed, chunk_skipped = posting.post_documents(kind, pks)
+                posted += chunk_posted
+                removed += chunk_removed
+                skipped.extend(chunk_skipped)
+                last_pk = pks[-1]
+                self.stdout.write(f'{kind}: up to #{last_pk}, {posted} posted')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: {posted} posted, {removed} replaced or removed, '
+                f'{len(skipped)} skipped in closed periods ({time.perf_counter() - started:.1f}s)'
+            ))
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'{kind} not posted (closed period): ' + ', '.join(f'#{pk}' for pk in skipped)
+                ))
@@ -0,0 +1,74 @@
+"""
+Management command to rebuild the ClientStats analytics snapshots.
+Schedule nightly as a consistency check for the incremental refreshes:
+    python manage.py rebuild_client_stats
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Client, ClientStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-client analytics snapshots and report any that had drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted snapshots without fixing them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Clients processed per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+
+        client_ids = list(Client.objects.order_by('pk').values_list('pk', flat=True))
+        self.stdout.write(f'Rebuilding analytics snapshots for {len(client_ids)} clients...')
+
+        drifted = created = 0
+        for offset in range(0, len(client_ids), batch_size):
+            batch = client_ids[offset:offset + batch_size]
+            computed = ClientStats.compute(batch)
+            existing = ClientStats.objects.in_bulk(batch, field_name='client_id')
+
+            to_create, to_update = [], []
+            for client_id in batch:
+                values = ClientStats.empty_values() | computed.get(client_id, {})
+                stats = existing.get(client_id)
+                if stats is None:
+                    created += 1
+                    to_create.append(ClientStats(client_id=client_id, **values))
+                    continue
+
+                changed = [
+                    field for field in ClientStats.SNAPSHOT_FIELDS
+                    if getattr(stats, field) != values[field]
+                ]
+                if changed:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Client {client_id}: drifted fields {", ".join(changed)}'
+                    ))
+                    for field in changed:
+                        setattr(stats, field, values[field])
+                    to_update.append(stats)
+
+            if not check_only:
+                with transaction.atomic():
+                    ClientStats.objects.bulk_create(to_create)
+                    ClientStats.objects.bulk_update(to_update, ClientStats.SNAPSHOT_FIELDS)
+
+        if check_only:
+            self.stdout.write(self.style.WARNING(
+                f'CHECK ONLY: {drifted} drifted, {created} missing snapshot(s)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Done: {drifted} drifted snapshot(s) fixed, {created} created'
+            ))
@@ -0,0 +1,30 @@
+"""
+Management command to bring the month-end account balance snapshots up to date.
+Schedule nightly (snapshots a backdated journal line invalidated are
+rebuilt on the next run; balances stay correct in between, only slower):
+    python manage.py rebuild_ledger_snapshots
+    python manage.py rebuild_ledger_snapshots --full
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import AccountBalanceSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Write month-end account balance snapshots through the last complete month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Delete every snapshot except closed periods\' and rebuild them',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['full']:
+                deleted, _ = AccountBalanceSnapshot.objects.filter(period__isnull=True).delete()
+                self.stdout.write(f'Deleted {deleted} snapshot(s)')
+            written = AccountBalanceSnapshot.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {written} snapshot(s) written'))
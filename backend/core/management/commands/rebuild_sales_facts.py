@@ -0,0 +1,112 @@
+"""
+Management command to backfill and check the DailySalesFact table.
+Migration 0047 fills it from the payment history on deploy; run this
+nightly as a consistency check for the incremental refreshes:
+    python manage.py rebuild_sales_facts
+    python manage.py rebuild_sales_facts --from 2024-01-01 --to 2024-12-31
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from core.models import Payment, DailySalesFact
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pre-aggregated daily sales facts and report any days that had drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            help='First payment date to rebuild (YYYY-MM-DD, default: earliest payment)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            help='Last payment date to rebuild (YYYY-MM-DD, default: latest payment)',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted days without fixing them',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Days rebuilt per transaction (default: 31)',
+        )
+
+    def _parse_date(self, value, option):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        chunk_days = options['chunk_days']
+
+        bounds = Payment.objects.aggregate(first=Min('payment_date'), last=Max('payment_date'))
+        fact_bounds = DailySalesFact.objects.aggregate(first=Min('date'), last=Max('date'))
+        start_date = min(filter(None, [bounds['first'], fact_bounds['first']]), default=None)
+        end_date = max(filter(None, [bounds['last'], fact_bounds['last']]), default=None)
+        if options['date_from']:
+            start_date = self._parse_date(options['date_from'], '--from')
+        if options['date_to']:
+            end_date = self._parse_date(options['date_to'], '--to')
+
+        if start_date is None or end_date is None:
+            self.stdout.write('No payments found, nothing to rebuild')
+            return
+        if start_date > end_date:
+            raise CommandError('--from must not be after --to')
+
+        self.stdout.write(f'Rebuilding daily sales facts from {start_date} to {end_date}...')
+
+        drifted_days = set()
+        rows = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            payment_filters = {
+                'payment_date__gte': chunk_start,
+                'payment_date__lte': chunk_end,
+            }
+
+            existing = list(DailySalesFact.objects.filter(date__gte=chunk_start, date__lte=chunk_end))
+            if check_only:
+                facts = DailySalesFact.compute(**payment_filters)
+            else:
+                facts = DailySalesFact.rebuild(**payment_filters)
+
+            stored = {
+                (fact.date, fact.payment_method, fact.product_id): fact
+                for fact in existing
+            }
+            for fact in facts:
+                key = (fact.date, fact.payment_method, fact.product_id)
+                previous = stored.pop(key, None)
+                if previous is None or any(
+                    getattr(previous, field) != getattr(fact, field)
+                    for field in DailySalesFact.FACT_FIELDS
+                ):
+                    drifted_days.add(fact.date)
+            # Stored rows with no matching sales any more
+            drifted_days.update(day for day, _, _ in stored)
+
+            rows += len(facts)
+            chunk_start = chunk_end + timedelta(days=1)
+
+        for day in sorted(drifted_days):
+            self.stdout.write(self.style.WARNING(f'{day}: facts out of date'))
+
+        if check_only:
+            self.stdout.write(self.style.WARNING(
+                f'CHECK ONLY: {len(drifted_days)} drifted day(s), {rows} fact row(s) expected'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Done: {rows} fact row(s) written, {len(drifted_days)} drifted day(s) fixed'
+            ))
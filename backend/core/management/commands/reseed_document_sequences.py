@@ -0,0 +1,60 @@
+"""
+Management command to reseed document number sequences from existing documents.
+Run after importing documents with explicit numbers, or to repair a sequence
+that has fallen behind the document table.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.models import DocumentSequence
+from core.models_sequence import DOCUMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = 'Reseed document number sequences (INV, QT, PAY, CN, SM, PO, EXP, JE) from existing documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            dest='types',
+            help='Document code to reseed (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be changed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        codes = options['types'] or list(DOCUMENT_TYPES)
+        dry_run = options['dry_run']
+
+        unknown = [code for code in codes if code not in DOCUMENT_TYPES]
+        if unknown:
+            raise CommandError(f'Unknown document type(s): {", ".join(unknown)}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made'))
+
+        for code in codes:
+            # Today's sequence plus every sequence already issued for this type
+            keys = {DocumentSequence.sequence_key(code)}
+            keys.update(
+                DocumentSequence.objects.filter(document_type=code).values_list('key', flat=True)
+            )
+
+            for key in sorted(keys):
+                current = DocumentSequence.objects.filter(key=key).values_list('last_value', flat=True).first()
+                if dry_run:
+                    scanned = DocumentSequence.scan_last_value(code, key)
+                    self.stdout.write(f'Would reseed {key}: {current} -> {scanned}')
+                    continue
+
+                sequence = DocumentSequence.reseed(code, key)
+                self.stdout.write(f'Reseeded {key}: {current} -> {sequence.last_value}')
+                if code == 'INV':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Next invoice number will be: '
+                        f'{DocumentSequence.format_number(code, key, sequence.last_value + 1)}'
+                    ))
+
+        self.stdout.write(self.style.SUCCESS('Document sequences reseeded'))
@@ -132,6 +132,8 @@ class Command(BaseCommand):
              'description': 'Vehicle insurance premiums', 'is_vat_applicable': True, 'default_vat_rate': 15.00},
             {'code': '5530', 'name': 'Vehicle Licenses', 'category': 'expense', 'subcategory': 'operating_expense',
              'description': 'Vehicle license fees', 'is_vat_applicable': False},
+            {'code': '5600', 'name': 'General Expenses', 'category': 'expense', 'subcategory': 'operating_expense',
+             'description': 'Expenses whose category has no account of its own', 'is_vat_applicable': True, 'default_vat_rate': 15.00},
             
             # Administrative Expenses (5700-5899)
             {'code': '5700', 'name': 'Office Supplies', 'category': 'expense', 'subcategory': 'administrative_expense',
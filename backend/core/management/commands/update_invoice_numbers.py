@@ -4,7 +4,7 @@ This ensures the latest invoice from the old system (INV-004240) continues seque
 """
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from core.models import Invoice
+from core.models import Invoice, DocumentSequence
 
 
 class Command(BaseCommand):
@@ -66,5 +66,6 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING(f'DRY RUN: Would update {count} invoices'))
             self.stdout.write(f'Next invoice number would be: INV-{current_number:06d}')
         else:
+            DocumentSequence.reseed('INV', 'INV')
             self.stdout.write(self.style.SUCCESS(f'Successfully updated {updated} invoices'))
             self.stdout.write(self.style.SUCCESS(f'Next invoice number will be: INV-{current_number:06d}'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_user_menu_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Sequence key, e.g. INV or QT-20240115', max_length=50, unique=True)),
+                ('document_type', models.CharField(help_text='Document code, e.g. INV, QT, PAY', max_length=10)),
+                ('start_value', models.PositiveIntegerField(default=0, help_text='Numbers at or below this value are never issued')),
+                ('last_value', models.PositiveIntegerField(default=0, help_text='Last number issued')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'ordering': ['document_type', 'key'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_document_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_invoices', models.IntegerField(default=0)),
+                ('paid_invoices', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('avg_order_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('first_order_date', models.DateField(blank=True, null=True)),
+                ('last_order_date', models.DateField(blank=True, null=True)),
+                ('avg_lead_time', models.DecimalField(decimal_places=1, default=0, max_digits=8)),
+                ('min_lead_time', models.IntegerField(default=0)),
+                ('max_lead_time', models.IntegerField(default=0)),
+                ('favorite_products', models.JSONField(blank=True, default=list)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.client')),
+            ],
+            options={
+                'verbose_name': 'Client Statistics',
+                'verbose_name_plural': 'Client Statistics',
+            },
+        ),
+    ]
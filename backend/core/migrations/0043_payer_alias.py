@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_reconciliation_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayerAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(help_text='Normalized bank description', max_length=255, unique=True)),
+                ('times_matched', models.PositiveIntegerField(default=0)),
+                ('last_matched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payer_aliases', to='core.client')),
+            ],
+            options={
+                'verbose_name': 'Payer Alias',
+                'verbose_name_plural': 'Payer Aliases',
+                'ordering': ['reference'],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0044_journal_lines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountbalancesnapshot',
+            name='period',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='account_balances', to='core.taxperiod'),
+        ),
+        migrations.AddField(
+            model_name='taxperiod',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taxperiod',
+            name='closed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tax_periods_closed', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='StockClosingBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('cylinder_size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closing_balances', to='core.cylindersize')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='core.taxperiod')),
+            ],
+            options={
+                'verbose_name': 'Stock Closing Balance',
+                'verbose_name_plural': 'Stock Closing Balances',
+                'ordering': ['period', 'cylinder_size'],
+                'unique_together': {('period', 'cylinder_size')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClientClosingBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closing_balances', to='core.client')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='client_balances', to='core.taxperiod')),
+            ],
+            options={
+                'verbose_name': 'Client Closing Balance',
+                'verbose_name_plural': 'Client Closing Balances',
+                'ordering': ['period', 'client'],
+                'unique_together': {('period', 'client')},
+            },
+        ),
+    ]
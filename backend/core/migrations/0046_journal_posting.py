@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_period_close'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expensecategory',
+            name='account',
+            field=models.ForeignKey(blank=True, help_text='Expense account debited when expenses are posted to the ledger (default: 5600 General Expenses)', limit_choices_to={'category': 'expense'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expense_categories', to='core.accounttype'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='posting_key',
+            field=models.CharField(blank=True, editable=False, help_text='Source plus a digest of the posted lines; posting the same figures again is a no-op', max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='source',
+            field=models.CharField(blank=True, db_index=True, help_text='Document the entry was posted from, e.g. invoice:42', max_length=50),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_daily_sales_facts(apps, schema_editor):
+    """Fill DailySalesFact from the payment history, as rebuild_sales_facts does"""
+    DailySalesFact = apps.get_model('core', 'DailySalesFact')
+    Payment = apps.get_model('core', 'Payment')
+    InvoiceItem = apps.get_model('core', 'InvoiceItem')
+
+    facts = [
+        DailySalesFact(
+            date=row['payment_date'],
+            payment_method=row['payment_method'],
+            amount=row['total'] or Decimal('0.00'),
+            payment_count=row['count'],
+        )
+        for row in Payment.objects.values('payment_date', 'payment_method').annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+        ).order_by()
+    ]
+    facts.extend(
+        DailySalesFact(
+            date=row['invoice__payments__payment_date'],
+            payment_method=row['invoice__payments__payment_method'],
+            product_id=row['product_id'],
+            quantity=row['quantity_total'] or Decimal('0.00'),
+            sales_total=row['sales'] or Decimal('0.00'),
+            vat_amount=Decimal(row['vat'] or 0).quantize(Decimal('0.01')),
+            line_count=row['lines'],
+        )
+        for row in InvoiceItem.objects.filter(invoice__payments__isnull=False).values(
+            'invoice__payments__payment_date', 'invoice__payments__payment_method', 'product_id'
+        ).annotate(
+            quantity_total=Sum('quantity'),
+            sales=Sum('total'),
+            vat=Sum('tax_amount'),
+            lines=Count('id'),
+        ).order_by()
+    )
+
+    DailySalesFact.objects.all().delete()
+    DailySalesFact.objects.bulk_create(facts, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_journal_posting'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales_facts, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -27,6 +27,21 @@ from .models_loyalty import LoyaltyCard, LoyaltyTransaction
 # Import WhatsApp models
 from .models_whatsapp import WhatsAppConversation, WhatsAppMessage, WhatsAppOrderIntent, WhatsAppConfig
 
+# Import document numbering models
+from .models_sequence import DocumentSequence
+
+# Import client analytics snapshot models
+from .models_analytics import ClientStats, DailySalesFact
+
+# Import EFT reconciliation models
+from .models_reconciliation import ReconciliationBatch, ReconciliationLine, PayerAlias
+
+# Import general ledger models
+from .models_ledger import JournalLine, AccountBalanceSnapshot
+
+# Import period close models
+from .models_period_close import ClientClosingBalance, StockClosingBalance, PeriodClosedError, check_period_open
+
 
 class UserMenuPermission(models.Model):
     """Controls which accounting menu sections/items a user can see"""
@@ -301,71 +316,64 @@ class Client(models.Model):
     
     def get_analytics(self):
         """Get comprehensive analytics for this client"""
-        from django.db.models import Sum, Count, Avg, Max
-        from datetime import datetime, timedelta
-        from collections import defaultdict
+        from django.db.models import Sum, Count, F, Window
+        from django.db.models.functions import TruncMonth, Lag
+        from datetime import date
         
-        # Get all invoices and orders
+        # Totals, favourites and lead-time stats come from the stored snapshot
+        stats = ClientStats.for_client(self)
         invoices = self.invoices.all()
-        orders = Order.objects.filter(customer_phone=self.phone)
         
         # Basic metrics
-        total_invoices = invoices.count()
-        total_orders = orders.count()
-        total_spent = invoices.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        total_paid = invoices.aggregate(paid=Sum('paid_amount'))['paid'] or Decimal('0.00')
-        outstanding_balance = total_spent - total_paid
+        total_invoices = stats.total_invoices
+        total_orders = Order.objects.filter(customer_phone=self.phone).count()
+        total_spent = stats.total_spent
+        total_paid = stats.total_paid
+        outstanding_balance = stats.outstanding_balance
         
         # Average order value
-        avg_order_value = invoices.aggregate(avg=Avg('total_amount'))['avg'] or Decimal('0.00')
+        avg_order_value = stats.avg_order_value
         
         # Last order date
-        last_invoice = invoices.order_by('-issue_date').first()
-        last_order_date = last_invoice.issue_date if last_invoice else None
+        last_order_date = stats.last_order_date
         
         # Days since last order
+        today = date.today()
         days_since_last_order = None
         if last_order_date:
-            days_since_last_order = (datetime.now().date() - last_order_date).days
+            days_since_last_order = (today - last_order_date).days
+        
+        # Product preferences (top 5 by quantity)
+        favorite_products = [dict(product) for product in stats.favorite_products]
         
-        # Product preferences (from invoice items)
-        product_stats = defaultdict(lambda: {'quantity': 0, 'total_spent': Decimal('0.00'), 'count': 0})
-        for invoice in invoices:
-            for item in invoice.items.all():
-                product_stats[item.product.name]['quantity'] += float(item.quantity)
-                product_stats[item.product.name]['total_spent'] += item.total
-                product_stats[item.product.name]['count'] += 1
+        # Monthly spending trend (last 12 calendar months, including this one)
+        month_starts = []
+        year, month = today.year, today.month
+        for _ in range(12):
+            month_starts.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        month_starts.reverse()
         
-        # Sort products by quantity ordered
-        favorite_products = sorted(
-            [{'name': k, **v} for k, v in product_stats.items()],
-            key=lambda x: x['quantity'],
-            reverse=True
-        )[:5]  # Top 5 products
+        monthly_totals = {
+            row['month']: row
+            for row in invoices.filter(
+                issue_date__gte=month_starts[0],
+                issue_date__lte=today,
+            ).annotate(
+                month=TruncMonth('issue_date')
+            ).values('month').annotate(
+                month_total=Sum('total_amount'),
+                month_count=Count('id'),
+            ).order_by('month')
+        }
         
-        # Monthly spending trend (last 12 months)
         monthly_data = []
-        for i in range(11, -1, -1):
-            month_start = (datetime.now() - timedelta(days=30*i)).replace(day=1).date()
-            if i > 0:
-                month_end = (datetime.now() - timedelta(days=30*(i-1))).replace(day=1).date()
-            else:
-                month_end = datetime.now().date()
-            
-            month_total = invoices.filter(
-                issue_date__gte=month_start,
-                issue_date__lt=month_end
-            ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-            
-            month_count = invoices.filter(
-                issue_date__gte=month_start,
-                issue_date__lt=month_end
-            ).count()
-            
+        for month_start in month_starts:
+            row = monthly_totals.get(month_start, {})
             monthly_data.append({
                 'month': month_start.strftime('%b %Y'),
-                'total': float(month_total),
-                'count': month_count
+                'total': float(row.get('month_total') or 0),
+                'count': row.get('month_count', 0),
             })
         
         # Order frequency (orders per month)
@@ -379,37 +387,34 @@ class Client(models.Model):
             orders_per_month = 0
         
         # Payment behavior
-        paid_invoices = invoices.filter(status='paid').count()
-        payment_rate = (paid_invoices / total_invoices * 100) if total_invoices > 0 else 0
+        payment_rate = stats.payment_rate
         
-        # Invoice dates timeline and lead times
-        invoice_dates = []
-        lead_times = []
-        previous_date = None
+        # Invoice dates timeline, with the previous order date from a LAG window
+        timeline = invoices.annotate(
+            previous_date=Window(
+                expression=Lag('issue_date'),
+                order_by=[F('issue_date').asc(), F('id').asc()],
+            )
+        ).order_by('issue_date', 'id').values(
+            'issue_date', 'invoice_number', 'total_amount', 'status', 'previous_date'
+        )
         
-        for invoice in invoices.order_by('issue_date'):
+        invoice_dates = []
+        for row in timeline:
             invoice_data = {
-                'date': invoice.issue_date.isoformat(),
-                'invoice_number': invoice.invoice_number,
-                'total': float(invoice.total_amount),
-                'status': invoice.status,
+                'date': row['issue_date'].isoformat(),
+                'invoice_number': row['invoice_number'],
+                'total': float(row['total_amount']),
+                'status': row['status'],
             }
             
             # Calculate lead time from previous order
-            if previous_date:
-                lead_time_days = (invoice.issue_date - previous_date).days
-                invoice_data['lead_time'] = lead_time_days
-                lead_times.append(lead_time_days)
+            if row['previous_date']:
+                invoice_data['lead_time'] = (row['issue_date'] - row['previous_date']).days
             else:
                 invoice_data['lead_time'] = None
             
             invoice_dates.append(invoice_data)
-            previous_date = invoice.issue_date
-        
-        # Calculate average lead time
-        avg_lead_time = sum(lead_times) / len(lead_times) if lead_times else 0
-        min_lead_time = min(lead_times) if lead_times else 0
-        max_lead_time = max(lead_times) if lead_times else 0
         
         return {
             'total_invoices': total_invoices,
@@ -423,41 +428,23 @@ class Client(models.Model):
             'favorite_products': favorite_products,
             'monthly_data': monthly_data,
             'orders_per_month': round(orders_per_month, 1),
-            'payment_rate': round(payment_rate, 1),
+            'payment_rate': payment_rate,
             'customer_since': self.created_at.date(),
             'invoice_dates': invoice_dates,
-            'avg_lead_time': round(avg_lead_time, 1),
-            'min_lead_time': min_lead_time,
-            'max_lead_time': max_lead_time,
+            'avg_lead_time': float(stats.avg_lead_time),
+            'min_lead_time': stats.min_lead_time,
+            'max_lead_time': stats.max_lead_time,
         }
     
     def get_summary_stats(self):
         """Get quick summary statistics for display on client detail page"""
-        from django.db.models import Sum
-        from collections import Counter
-        
-        invoices = self.invoices.all()
-        total_spent = invoices.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        total_invoices = invoices.count()
-        
-        # Most ordered product
-        product_counts = Counter()
-        for invoice in invoices:
-            for item in invoice.items.all():
-                product_counts[item.product.name] += float(item.quantity)
-        
-        most_ordered = product_counts.most_common(1)
-        most_ordered_product = most_ordered[0][0] if most_ordered else 'N/A'
-        
-        # Last order
-        last_invoice = invoices.order_by('-issue_date').first()
-        last_order_date = last_invoice.issue_date if last_invoice else None
+        stats = ClientStats.for_client(self)
         
         return {
-            'total_orders': total_invoices,
-            'total_spent': total_spent,
-            'most_ordered_product': most_ordered_product,
-            'last_order_date': last_order_date,
+            'total_orders': stats.total_invoices,
+            'total_spent': stats.total_spent,
+            'most_ordered_product': stats.most_ordered_product,
+            'last_order_date': stats.last_order_date,
         }
 
 
@@ -617,30 +604,9 @@ class Quote(models.Model):
 
     def save(self, *args, **kwargs):
         """Override save to auto-generate quote number"""
-        if not self.quote_number:
-            # Generate quote number: QT-YYYYMMDD-XXX
-            from datetime import date
-            today = date.today()
-            prefix = f"QT-{today.strftime('%Y%m%d')}"
-            
-            # Get the last quote number for today
-            last_quote = Quote.objects.filter(
-                quote_number__startswith=prefix
-            ).order_by('quote_number').last()
-            
-            if last_quote:
-                # Extract the sequence number and increment
-                try:
-                    last_seq = int(last_quote.quote_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.quote_number = f"{prefix}-{new_seq:03d}"
-        
-        super().save(*args, **kwargs)
+        # Generate quote number: QT-YYYYMMDD-XXX
+        with DocumentSequence.numbering(self, 'QT'):
+            super().save(*args, **kwargs)
 
     def calculate_totals(self):
         """Calculate subtotal, VAT, and total from line items (VAT-inclusive)"""
@@ -722,25 +688,6 @@ class Invoice(models.Model):
 
     def save(self, *args, **kwargs):
         """Override save to auto-generate invoice number, set due_date based on payment terms, and calculate balance"""
-        if not self.invoice_number:
-            # Generate invoice number: INV-XXXXXX (sequential, starting from 004241)
-            # Get all invoices with INV- prefix and find the highest numeric value
-            all_invoices = Invoice.objects.filter(invoice_number__startswith='INV-').values_list('invoice_number', flat=True)
-            
-            max_num = 4240  # Start from 4240 so first invoice is 4241
-            for inv_num in all_invoices:
-                try:
-                    # Extract numeric part from INV-XXXXXX
-                    num = int(inv_num.replace('INV-', ''))
-                    if num > max_num:
-                        max_num = num
-                except (ValueError, AttributeError):
-                    # Skip invalid invoice numbers
-                    continue
-            
-            new_num = max_num + 1
-            self.invoice_number = f"INV-{new_num:06d}"
-        
         # Auto-set due_date based on payment_terms if not set
         if not self.due_date and self.issue_date:
             from datetime import timedelta
@@ -761,7 +708,11 @@ class Invoice(models.Model):
                 self.due_date = self.issue_date
         
         self.balance = self.total_amount - self.paid_amount
-        super().save(*args, **kwargs)
+        
+        # Generate invoice number: INV-XXXXXX (sequential, starting from 004241)
+        # Allocated from the locked INV sequence row, not by scanning invoices
+        with DocumentSequence.numbering(self, 'INV'):
+            super().save(*args, **kwargs)
 
     def calculate_totals(self):
         """Calculate subtotal, VAT, and total from line items (VAT-inclusive)"""
@@ -787,6 +738,42 @@ class Invoice(models.Model):
         
         self.save()
 
+    @classmethod
+    def refresh_payment_totals(cls, invoice_ids):
+        """
+        Recompute paid_amount, balance and status from the payments table for
+        several invoices in one UPDATE. Same rules as calculate_totals, for
+        bulk payment posting where the line item totals have not changed.
+        """
+        from django.db.models import Case, DecimalField, OuterRef, Subquery, Sum, Value, When
+        from django.db.models.functions import Coalesce
+        from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
+        from django.utils import timezone
+
+        def paid():
+            # SET clauses read the old column values, so F('paid_amount') would be stale
+            return Coalesce(
+                Subquery(
+                    Payment.objects.filter(invoice=OuterRef('pk'))
+                    .order_by().values('invoice').annotate(total=Sum('amount')).values('total'),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+
+        return cls.objects.filter(pk__in=set(invoice_ids)).update(
+            paid_amount=paid(),
+            balance=models.F('total_amount') - paid(),
+            status=Case(
+                When(GreaterThanOrEqual(paid(), models.F('total_amount')), then=Value('paid')),
+                When(GreaterThan(paid(), Value(Decimal('0.00'))), then=Value('partially_paid')),
+                default=Value('unpaid'),
+                output_field=models.CharField(),
+            ),
+            updated_at=timezone.now(),
+        )
+
 
 class InvoiceItem(models.Model):
     """Line items for invoices"""
@@ -883,34 +870,57 @@ class Payment(models.Model):
 
     def save(self, *args, **kwargs):
         """Override save to auto-generate payment number"""
-        if not self.payment_number:
-            # Generate payment number: PAY-YYYYMMDD-XXX
-            from datetime import date
-            today = date.today()
-            prefix = f"PAY-{today.strftime('%Y%m%d')}"
-            
-            # Get the last payment number for today
-            last_payment = Payment.objects.filter(
-                payment_number__startswith=prefix
-            ).order_by('payment_number').last()
-            
-            if last_payment:
-                # Extract the sequence number and increment
-                try:
-                    last_seq = int(last_payment.payment_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.payment_number = f"{prefix}-{new_seq:03d}"
-        
-        super().save(*args, **kwargs)
-        # Update invoice paid amount and status (only if invoice is set)
-        if self.invoice:
-            self.invoice.paid_amount = sum(p.amount for p in self.invoice.payments.all())
-            self.invoice.calculate_totals()
+        # Generate payment number: PAY-YYYYMMDD-XXX
+        with DocumentSequence.numbering(self, 'PAY'):
+            super().save(*args, **kwargs)
+            # Update invoice paid amount and status (only if invoice is set)
+            if self.invoice:
+                self.invoice.paid_amount = sum(p.amount for p in self.invoice.payments.all())
+                self.invoice.calculate_totals()
+
+    @classmethod
+    def bulk_post(cls, payments):
+        """
+        Create many unsaved payments in one short transaction: numbers are
+        reserved as a block, the rows are bulk inserted and every affected
+        invoice's paid amount, balance and status is recomputed in one UPDATE.
+        bulk_create skips save() and the post_save signals, so the analytics
+        and PDF cache refreshes and the journal posting they would trigger
+        are queued here instead.
+        """
+        from .services import pdf_cache, posting
+
+        payments = list(payments)
+        if not payments:
+            return []
+        # bulk_create skips the closed period check in the pre_save signal
+        check_period_open('Payment', *(payment.payment_date for payment in payments))
+
+        with transaction.atomic():
+            unnumbered = [payment for payment in payments if not payment.payment_number]
+            for payment, number in zip(unnumbered, DocumentSequence.reserve_numbers('PAY', len(unnumbered))):
+                payment.payment_number = number
+            created = cls.objects.bulk_create(payments)
+
+            invoice_ids = {payment.invoice_id for payment in created if payment.invoice_id}
+            Invoice.refresh_payment_totals(invoice_ids)
+
+            client_ids = {payment.client_id for payment in created if payment.client_id}
+            client_ids.update(
+                Invoice.objects.filter(pk__in=invoice_ids).values_list('client_id', flat=True)
+            )
+            dates = {payment.payment_date for payment in created}
+            posting.queue('payment', [payment.pk for payment in created])
+
+            def refresh():
+                ClientStats.refresh_many(client_ids)
+                DailySalesFact.refresh_dates(dates)
+                for invoice_id in invoice_ids:
+                    pdf_cache.invalidate('invoice', invoice_id)
+
+            transaction.on_commit(refresh)
+
+        return created
 
 
 class CreditNote(models.Model):
@@ -944,34 +954,13 @@ class CreditNote(models.Model):
     
     def save(self, *args, **kwargs):
         """Override save to auto-generate credit note number"""
-        if not self.credit_note_number:
-            # Generate credit note number: CN-YYYYMMDD-XXX
-            from datetime import date
-            today = date.today()
-            prefix = f"CN-{today.strftime('%Y%m%d')}"
-            
-            # Get the last credit note number for today
-            last_credit_note = CreditNote.objects.filter(
-                credit_note_number__startswith=prefix
-            ).order_by('credit_note_number').last()
-            
-            if last_credit_note:
-                # Extract the sequence number and increment
-                try:
-                    last_seq = int(last_credit_note.credit_note_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.credit_note_number = f"{prefix}-{new_seq:03d}"
-        
         # Set client from invoice if not set
         if self.invoice and not self.client_id:
             self.client = self.invoice.client
         
-        super().save(*args, **kwargs)
+        # Generate credit note number: CN-YYYYMMDD-XXX
+        with DocumentSequence.numbering(self, 'CN'):
+            super().save(*args, **kwargs)
     
     def calculate_totals(self):
         """Calculate subtotal, VAT, and total from line items (VAT-inclusive)"""
@@ -6,6 +6,8 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from .models_sequence import DocumentSequence
+
 
 class Supplier(models.Model):
     """Supplier/Vendor for tracking purchases and expenses"""
@@ -38,6 +40,11 @@ class ExpenseCategory(models.Model):
     description = models.TextField(blank=True)
     tax_deductible = models.BooleanField(default=True, help_text="Is this expense tax deductible?")
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subcategories')
+    account = models.ForeignKey(
+        'AccountType', on_delete=models.SET_NULL, null=True, blank=True, related_name='expense_categories',
+        limit_choices_to={'category': 'expense'},
+        help_text="Expense account debited when expenses are posted to the ledger (default: 5600 General Expenses)"
+    )
     order = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
 
@@ -107,27 +114,6 @@ class Expense(models.Model):
         return f"{self.expense_number} - {self.description[:50]}"
 
     def save(self, *args, **kwargs):
-        # Auto-generate expense number
-        if not self.expense_number:
-            from datetime import date
-            today = date.today()
-            prefix = f"EXP-{today.strftime('%Y%m%d')}"
-            
-            last_expense = Expense.objects.filter(
-                expense_number__startswith=prefix
-            ).order_by('expense_number').last()
-            
-            if last_expense:
-                try:
-                    last_seq = int(last_expense.expense_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.expense_number = f"{prefix}-{new_seq:03d}"
-        
         # Calculate VAT from total (VAT inclusive)
         if self.total_amount and self.vat_rate:
             self.vat_amount = self.total_amount - (self.total_amount / (1 + self.vat_rate / 100))
@@ -137,7 +123,9 @@ class Expense(models.Model):
         if self.category:
             self.is_tax_deductible = self.category.tax_deductible
         
-        super().save(*args, **kwargs)
+        # Auto-generate expense number
+        with DocumentSequence.numbering(self, 'EXP'):
+            super().save(*args, **kwargs)
 
 
 class JournalEntry(models.Model):
@@ -168,6 +156,13 @@ class JournalEntry(models.Model):
     expense = models.ForeignKey(Expense, on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_entries')
     payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_entries')
     
+    # Set on entries posted automatically from a document (see core.services.posting)
+    source = models.CharField(max_length=50, blank=True, db_index=True, help_text="Document the entry was posted from, e.g. invoice:42")
+    posting_key = models.CharField(
+        max_length=100, unique=True, null=True, blank=True, editable=False,
+        help_text="Source plus a digest of the posted lines; posting the same figures again is a no-op"
+    )
+    
     # Amounts
     debit_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     credit_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -191,31 +186,30 @@ class JournalEntry(models.Model):
 
     def save(self, *args, **kwargs):
         # Auto-generate entry number
-        if not self.entry_number:
-            from datetime import date
-            today = date.today()
-            prefix = f"JE-{today.strftime('%Y%m%d')}"
+        with DocumentSequence.numbering(self, 'JE'):
+            super().save(*args, **kwargs)
             
-            last_entry = JournalEntry.objects.filter(
-                entry_number__startswith=prefix
-            ).order_by('entry_number').last()
-            
-            if last_entry:
-                try:
-                    last_seq = int(last_entry.entry_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.entry_number = f"{prefix}-{new_seq:03d}"
-        
-        super().save(*args, **kwargs)
+            # Lines carry the entry date for ledger queries
+            self.lines.exclude(date=self.date).update(date=self.date)
+
+    @property
+    def is_balanced(self):
+        """Whether the entry's lines debit and credit the same amount"""
+        totals = self.lines.aggregate(debit=models.Sum('debit'), credit=models.Sum('credit'))
+        return (totals['debit'] or 0) == (totals['credit'] or 0)
+
+    def update_totals(self):
+        """Set debit_amount and credit_amount from the entry's lines"""
+        totals = self.lines.aggregate(debit=models.Sum('debit'), credit=models.Sum('credit'))
+        self.debit_amount = totals['debit'] or Decimal('0.00')
+        self.credit_amount = totals['credit'] or Decimal('0.00')
+        self.save(update_fields=['debit_amount', 'credit_amount', 'updated_at'])
 
     def post(self, user):
         """Post the journal entry"""
         from django.utils import timezone
+        if not self.is_balanced:
+            raise ValueError(f'Journal entry {self.entry_number} does not balance')
         self.status = 'posted'
         self.posted_at = timezone.now()
         self.posted_by = user
@@ -256,6 +250,8 @@ class TaxPeriod(models.Model):
     
     notes = models.TextField(blank=True)
     filed_date = models.DateField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tax_periods_closed')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -269,27 +265,34 @@ class TaxPeriod(models.Model):
 
     def calculate_totals(self):
         """Calculate totals from invoices and expenses within this period"""
-        from .models import Invoice, Payment
+        from .services import period_totals
         
         # Income from paid invoices
-        invoices = Invoice.objects.filter(
-            issue_date__gte=self.start_date,
-            issue_date__lte=self.end_date,
-            status__in=['paid', 'partially_paid']
-        )
-        self.total_income = sum(inv.total_amount for inv in invoices)
-        self.output_vat = sum(inv.tax_amount for inv in invoices)
+        sales = period_totals.sales_totals(self.start_date, self.end_date, ['paid', 'partially_paid'])
+        self.total_income = sales['total']
+        self.output_vat = sales['tax']
         
         # Expenses
-        expenses = Expense.objects.filter(
-            date__gte=self.start_date,
-            date__lte=self.end_date,
-            payment_status='paid'
-        )
-        self.total_expenses = sum(exp.total_amount for exp in expenses)
-        self.input_vat = sum(exp.vat_amount for exp in expenses)
+        purchases = period_totals.purchase_totals(self.start_date, self.end_date, ['paid'])
+        self.total_expenses = purchases['total']
+        self.input_vat = purchases['tax']
         
         # Net VAT payable
         self.vat_payable = self.output_vat - self.input_vat
         
         self.save()
+
+    def close(self, user=None):
+        """Freeze balances at the period end and lock everything dated up to it"""
+        from .services import period_close
+        period_close.close_period(self, user)
+        # The service works on a locked copy; pick up its totals and status
+        self.refresh_from_db()
+        return self
+
+    def reopen(self):
+        """Reopen the latest closed period for corrections"""
+        from .services import period_close
+        period_close.reopen_period(self)
+        self.refresh_from_db()
+        return self
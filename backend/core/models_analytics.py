@@ -0,0 +1,319 @@
+"""
+Analytics snapshot models.
+ClientStats stores a per-client rollup of invoice history so the client
+detail and analytics pages read one row instead of recomputing it on every
+request. DailySalesFact stores daily sales totals so the sales reports and
+dashboard read a small pre-aggregated table instead of scanning payments
+and invoice items over the whole range.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Sum, Count, Avg, Min, Max, Q
+
+
+class ClientStats(models.Model):
+    """
+    Materialized analytics for one client.
+    Refreshed for the affected client whenever an invoice, invoice item or
+    payment changes (see core.signals), and rebuilt nightly for all clients
+    by the rebuild_client_stats command.
+    """
+    client = models.OneToOneField('Client', on_delete=models.CASCADE, related_name='stats')
+
+    # Totals
+    total_invoices = models.IntegerField(default=0)
+    paid_invoices = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    avg_order_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Order dates
+    first_order_date = models.DateField(null=True, blank=True)
+    last_order_date = models.DateField(null=True, blank=True)
+
+    # Lead time between consecutive invoices (days)
+    avg_lead_time = models.DecimalField(max_digits=8, decimal_places=1, default=0)
+    min_lead_time = models.IntegerField(default=0)
+    max_lead_time = models.IntegerField(default=0)
+
+    # Top 5 products by quantity: [{'name', 'quantity', 'total_spent', 'count'}]
+    favorite_products = models.JSONField(default=list, blank=True)
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Client Statistics'
+        verbose_name_plural = 'Client Statistics'
+
+    def __str__(self):
+        return f"Stats for {self.client}"
+
+    @property
+    def outstanding_balance(self):
+        return self.total_spent - self.total_paid
+
+    @property
+    def payment_rate(self):
+        """Percentage of invoices fully paid"""
+        if not self.total_invoices:
+            return 0
+        return round(self.paid_invoices / self.total_invoices * 100, 1)
+
+    @property
+    def most_ordered_product(self):
+        return self.favorite_products[0]['name'] if self.favorite_products else 'N/A'
+
+    # Fields compared by the nightly consistency check
+    SNAPSHOT_FIELDS = [
+        'total_invoices', 'paid_invoices', 'total_spent', 'total_paid', 'avg_order_value',
+        'first_order_date', 'last_order_date', 'avg_lead_time', 'min_lead_time', 'max_lead_time',
+        'favorite_products',
+    ]
+
+    @classmethod
+    def for_client(cls, client):
+        """Snapshot for a client, built on first access"""
+        try:
+            return client.stats
+        except cls.DoesNotExist:
+            return cls.refresh(client.pk)
+
+    @classmethod
+    def refresh(cls, client_id):
+        """Recompute and store the snapshot for one client"""
+        from .models import Client
+
+        if not Client.objects.filter(pk=client_id).exists():
+            # Client was deleted; its snapshot went with it
+            return None
+
+        values = cls.compute([client_id]).get(client_id, {})
+        stats, _ = cls.objects.update_or_create(
+            client_id=client_id,
+            defaults=cls.empty_values() | values,
+        )
+        return stats
+
+    @classmethod
+    def refresh_many(cls, client_ids):
+        """Recompute and store the snapshots for several clients in one pass"""
+        from .models import Client
+
+        client_ids = list(Client.objects.filter(pk__in=set(client_ids)).values_list('pk', flat=True))
+        if not client_ids:
+            return
+        computed = cls.compute(client_ids)
+        existing = cls.objects.in_bulk(client_ids, field_name='client_id')
+
+        to_create, to_update = [], []
+        for client_id in client_ids:
+            values = cls.empty_values() | computed.get(client_id, {})
+            stats = existing.get(client_id)
+            if stats is None:
+                to_create.append(cls(client_id=client_id, **values))
+                continue
+            for field, value in values.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+
+        cls.objects.bulk_create(to_create)
+        cls.objects.bulk_update(to_update, cls.SNAPSHOT_FIELDS)
+
+    @classmethod
+    def empty_values(cls):
+        """Snapshot values for a client with no invoices"""
+        return {
+            'total_invoices': 0,
+            'paid_invoices': 0,
+            'total_spent': Decimal('0.00'),
+            'total_paid': Decimal('0.00'),
+            'avg_order_value': Decimal('0.00'),
+            'first_order_date': None,
+            'last_order_date': None,
+            'avg_lead_time': Decimal('0.0'),
+            'min_lead_time': 0,
+            'max_lead_time': 0,
+            'favorite_products': [],
+        }
+
+    @classmethod
+    def compute(cls, client_ids=None):
+        """
+        Compute snapshot values for the given clients (or all clients) in
+        three grouped queries. Returns {client_id: values} for clients that
+        have invoices.
+        """
+        from .models import Invoice, InvoiceItem
+
+        invoices = Invoice.objects.all()
+        items = InvoiceItem.objects.all()
+        if client_ids is not None:
+            invoices = invoices.filter(client_id__in=client_ids)
+            items = items.filter(invoice__client_id__in=client_ids)
+
+        # Totals per client
+        values = {}
+        for row in invoices.values('client_id').annotate(
+            invoice_count=Count('id'),
+            paid_count=Count('id', filter=Q(status='paid')),
+            spent=Sum('total_amount'),
+            paid=Sum('paid_amount'),
+            average=Avg('total_amount'),
+            first_date=Min('issue_date'),
+            last_date=Max('issue_date'),
+        ).order_by():
+            values[row['client_id']] = {
+                'total_invoices': row['invoice_count'],
+                'paid_invoices': row['paid_count'],
+                'total_spent': row['spent'] or Decimal('0.00'),
+                'total_paid': row['paid'] or Decimal('0.00'),
+                'avg_order_value': Decimal(row['average'] or 0).quantize(Decimal('0.01')),
+                'first_order_date': row['first_date'],
+                'last_order_date': row['last_date'],
+                'favorite_products': [],
+            }
+
+        # Top 5 products per client by quantity
+        for row in items.values('invoice__client_id', 'product__name').annotate(
+            quantity_total=Sum('quantity'),
+            spent_total=Sum('total'),
+            item_count=Count('id'),
+        ).order_by('invoice__client_id', '-quantity_total', 'product__name'):
+            client_values = values.get(row['invoice__client_id'])
+            if client_values is None or len(client_values['favorite_products']) >= 5:
+                continue
+            client_values['favorite_products'].append({
+                'name': row['product__name'],
+                'quantity': float(row['quantity_total'] or 0),
+                'total_spent': float(row['spent_total'] or 0),
+                'count': row['item_count'],
+            })
+
+        # Lead times between consecutive invoices, streamed in date order
+        lead_times = defaultdict(list)
+        previous_client, previous_date = None, None
+        for client_id, issue_date in invoices.order_by(
+            'client_id', 'issue_date', 'id'
+        ).values_list('client_id', 'issue_date').iterator():
+            if client_id == previous_client:
+                lead_times[client_id].append((issue_date - previous_date).days)
+            previous_client, previous_date = client_id, issue_date
+
+        for client_id, days in lead_times.items():
+            values[client_id].update({
+                'avg_lead_time': Decimal(sum(days) / len(days)).quantize(Decimal('0.1')),
+                'min_lead_time': min(days),
+                'max_lead_time': max(days),
+            })
+
+        return values
+
+
+class DailySalesFact(models.Model):
+    """
+    Sales for one day, payment method and product.
+    Rows without a product hold the payments received (amount and count);
+    rows with a product hold the invoice lines of the invoices those
+    payments were made against (quantity, sales and VAT), matching what the
+    sales report has always attributed to a payment day.
+
+    Rebuilt for the affected days whenever a payment or invoice item changes
+    (see core.signals), and in bulk by the rebuild_sales_facts command.
+    """
+    date = models.DateField()
+    payment_method = models.CharField(max_length=20)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, null=True, blank=True, related_name='sales_facts')
+
+    # Payments (product rows leave these at zero)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+
+    # Invoice lines (payment rows leave these at zero)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    vat_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    line_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['date', 'payment_method', 'product']
+        ordering = ['date', 'payment_method']
+        verbose_name = 'Daily Sales Fact'
+        verbose_name_plural = 'Daily Sales Facts'
+
+    def __str__(self):
+        return f"{self.date} {self.payment_method} {self.product or 'payments'}"
+
+    # Fields compared by the consistency check
+    FACT_FIELDS = ['amount', 'payment_count', 'quantity', 'sales_total', 'vat_amount', 'line_count']
+
+    @classmethod
+    def compute(cls, **payment_filters):
+        """
+        Unsaved facts for the payments matching payment_filters (lookups on
+        Payment, e.g. payment_date__in=[...]) in two grouped queries.
+        """
+        from .models import Payment, InvoiceItem
+
+        payments = Payment.objects.filter(**payment_filters)
+        items = InvoiceItem.objects.filter(**{
+            f"invoice__payments__{lookup}": value
+            for lookup, value in payment_filters.items()
+        })
+
+        facts = [
+            cls(
+                date=row['payment_date'],
+                payment_method=row['payment_method'],
+                amount=row['total'] or Decimal('0.00'),
+                payment_count=row['count'],
+            )
+            for row in payments.values('payment_date', 'payment_method').annotate(
+                total=Sum('amount'),
+                count=Count('id'),
+            ).order_by()
+        ]
+        facts.extend(
+            cls(
+                date=row['invoice__payments__payment_date'],
+                payment_method=row['invoice__payments__payment_method'],
+                product_id=row['product_id'],
+                quantity=row['quantity_total'] or Decimal('0.00'),
+                sales_total=row['sales'] or Decimal('0.00'),
+                vat_amount=Decimal(row['vat'] or 0).quantize(Decimal('0.01')),
+                line_count=row['lines'],
+            )
+            for row in items.values(
+                'invoice__payments__payment_date', 'invoice__payments__payment_method', 'product_id'
+            ).annotate(
+                quantity_total=Sum('quantity'),
+                sales=Sum('total'),
+                vat=Sum('tax_amount'),
+                lines=Count('id'),
+            ).order_by()
+        )
+        return facts
+
+    @classmethod
+    def rebuild(cls, **payment_filters):
+        """
+        Replace the stored facts for the days covered by payment_filters,
+        which must select whole days (payment_date lookups only).
+        """
+        date_filters = {
+            lookup.replace('payment_date', 'date', 1): value
+            for lookup, value in payment_filters.items()
+        }
+        facts = cls.compute(**payment_filters)
+        with transaction.atomic():
+            cls.objects.filter(**date_filters).delete()
+            cls.objects.bulk_create(facts)
+        return facts
+
+    @classmethod
+    def refresh_dates(cls, dates):
+        """Recompute the facts for the given payment days"""
+        dates = {day for day in dates if day}
+        if dates:
+            cls.rebuild(payment_date__in=sorted(dates))
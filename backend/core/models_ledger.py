@@ -0,0 +1,129 @@
+"""
+General ledger models.
+JournalLine is one debit or credit of a JournalEntry against an account in
+the chart of accounts. AccountBalanceSnapshot stores each account's
+cumulative debits and credits at every month end, so a balance is the
+latest snapshot plus the lines posted after it (see core.services.ledger)
+rather than a scan of every journal line ever posted.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncMonth
+
+
+ZERO = Decimal('0.00')
+
+
+def month_end(day):
+    """Last day of day's month"""
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+class JournalLine(models.Model):
+    """One debit or credit of a journal entry"""
+    entry = models.ForeignKey('JournalEntry', on_delete=models.CASCADE, related_name='lines')
+    account = models.ForeignKey('AccountType', on_delete=models.PROTECT, related_name='journal_lines')
+    # Copied from the entry so ledger queries filter and order without a join
+    date = models.DateField()
+    description = models.CharField(max_length=255, blank=True)
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date', 'id']
+        indexes = [
+            models.Index(fields=['account', 'date', 'id']),
+            models.Index(fields=['date', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_id} {self.account_id} Dr {self.debit} Cr {self.credit}"
+
+    def save(self, *args, **kwargs):
+        if self.entry_id and not self.date:
+            self.date = self.entry.date
+        super().save(*args, **kwargs)
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    An account's cumulative posted debits and credits through a month end.
+    Snapshots for a month and every later month are deleted when a line
+    dated in that month changes, and rebuilt by rebuild(). Closing a
+    TaxPeriod writes a snapshot at its end linked to the period.
+    """
+    account = models.ForeignKey('AccountType', on_delete=models.CASCADE, related_name='balance_snapshots')
+    month = models.DateField(help_text="Month end the totals run through")
+    debit_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Set on the closing balances of a closed TaxPeriod, which are never invalidated
+    period = models.ForeignKey(
+        'TaxPeriod', on_delete=models.SET_NULL, null=True, blank=True, related_name='account_balances'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month', 'account']
+        unique_together = [('account', 'month')]
+        verbose_name = 'Account Balance Snapshot'
+        verbose_name_plural = 'Account Balance Snapshots'
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.month}: Dr {self.debit_total} Cr {self.credit_total}"
+
+    @classmethod
+    def invalidate(cls, day):
+        """Drop the snapshots a change to a line dated day makes stale, once the transaction commits"""
+        if day:
+            transaction.on_commit(lambda: cls.objects.filter(month__gte=day, period__isnull=True).delete())
+
+    @classmethod
+    def rebuild(cls, through=None):
+        """
+        Write snapshots for every month end after the latest valid snapshot
+        up to through (default: the last complete month). Returns the number
+        of snapshot rows written.
+        """
+        through = month_end(through) if through else date.today().replace(day=1) - timedelta(days=1)
+        last_month = cls.objects.aggregate(month=Max('month'))['month']
+        if last_month and last_month >= through:
+            return 0
+
+        totals = defaultdict(lambda: [ZERO, ZERO])
+        if last_month:
+            for account_id, debit, credit in cls.objects.filter(month=last_month).values_list(
+                'account_id', 'debit_total', 'credit_total'
+            ):
+                totals[account_id] = [debit, credit]
+
+        lines = JournalLine.objects.filter(entry__status='posted', date__lte=through)
+        if last_month:
+            lines = lines.filter(date__gt=last_month)
+        movements = defaultdict(list)
+        for row in lines.annotate(month=TruncMonth('date')).values('month', 'account_id').annotate(
+            debit=Sum('debit'), credit=Sum('credit'),
+        ).order_by('month'):
+            movements[month_end(row['month'])].append(row)
+        if not movements and not totals:
+            return 0
+
+        month = month_end(last_month + timedelta(days=1)) if last_month else min(movements)
+        snapshots = []
+        while month <= through:
+            for row in movements.get(month, ()):
+                account_totals = totals[row['account_id']]
+                account_totals[0] += Decimal(row['debit'] or 0).quantize(ZERO)
+                account_totals[1] += Decimal(row['credit'] or 0).quantize(ZERO)
+            snapshots.extend(
+                cls(account_id=account_id, month=month, debit_total=debit, credit_total=credit)
+                for account_id, (debit, credit) in totals.items()
+            )
+            month = month_end(month + timedelta(days=1))
+
+        cls.objects.bulk_create(snapshots, batch_size=5000, ignore_conflicts=True)
+        return len(snapshots)
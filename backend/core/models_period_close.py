@@ -0,0 +1,100 @@
+"""
+Period close models.
+Closing a TaxPeriod freezes every client's balance and every cylinder
+size's stock on hand at the period end (account balances are frozen as
+AccountBalanceSnapshot rows linked to the period). Invoices, payments,
+credit notes, expenses, stock purchases, stock movements and journals
+dated on or before the end of a closed period can no longer be changed,
+so reports start from the closing balances and only read the open period
+after them (see core.services.period_close).
+"""
+from django.core.exceptions import PermissionDenied
+from django.db import models
+from django.db.models import Max
+
+from .utils_transaction import cached
+
+
+# TaxPeriod statuses whose dates are locked
+CLOSED_STATUSES = ('closed', 'filed')
+
+# Transaction cache name of locked_through()
+LOCKED_THROUGH = 'period_close:locked_through'
+
+
+class PeriodClosedError(PermissionDenied):
+    """A change to a record dated in a closed TaxPeriod"""
+
+
+def _latest_closed_end():
+    from .models_accounting import TaxPeriod
+
+    return TaxPeriod.objects.filter(status__in=CLOSED_STATUSES).aggregate(end=Max('end_date'))['end']
+
+
+def locked_through():
+    """
+    End of the latest closed TaxPeriod, or None. Looked up once per
+    transaction, so the lock checks on every row a save touches share one
+    query; saving or deleting a TaxPeriod forgets it.
+    """
+    return cached(LOCKED_THROUGH, _latest_closed_end)
+
+
+def closed_period_for(*days):
+    """
+    The earliest closed TaxPeriod ending on or after the earliest of the
+    days, or None. Closing balances are cumulative, so closing a period
+    locks every date up to its end, not just the dates inside it.
+    """
+    from .models_accounting import TaxPeriod
+
+    days = [day for day in days if day]
+    end = locked_through() if days else None
+    if not end or min(days) > end:
+        return None
+    return TaxPeriod.objects.filter(
+        status__in=CLOSED_STATUSES, end_date__gte=min(days),
+    ).order_by('end_date').first()
+
+
+def check_period_open(label, *days):
+    """Raise PeriodClosedError if any of the days is locked by a closed TaxPeriod"""
+    period = closed_period_for(*days)
+    if period:
+        raise PeriodClosedError(
+            f'{label} is dated on or before the end of {period.name} ({period.end_date}), '
+            f'which is {period.get_status_display().lower()}'
+        )
+
+
+class ClientClosingBalance(models.Model):
+    """A client's balance (invoiced less paid and credited) at the end of a closed period"""
+    period = models.ForeignKey('TaxPeriod', on_delete=models.CASCADE, related_name='client_balances')
+    client = models.ForeignKey('Client', on_delete=models.CASCADE, related_name='closing_balances')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'client']
+        unique_together = [('period', 'client')]
+        verbose_name = 'Client Closing Balance'
+        verbose_name_plural = 'Client Closing Balances'
+
+    def __str__(self):
+        return f"{self.client_id} @ {self.period_id}: {self.balance}"
+
+
+class StockClosingBalance(models.Model):
+    """Cylinders of a size on hand (sum of stock movements) at the end of a closed period"""
+    period = models.ForeignKey('TaxPeriod', on_delete=models.CASCADE, related_name='stock_balances')
+    cylinder_size = models.ForeignKey('CylinderSize', on_delete=models.CASCADE, related_name='closing_balances')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['period', 'cylinder_size']
+        unique_together = [('period', 'cylinder_size')]
+        verbose_name = 'Stock Closing Balance'
+        verbose_name_plural = 'Stock Closing Balances'
+
+    def __str__(self):
+        return f"{self.cylinder_size_id} @ {self.period_id}: {self.quantity}"
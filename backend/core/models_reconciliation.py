@@ -0,0 +1,168 @@
+"""
+EFT reconciliation models.
+An uploaded bank statement becomes a ReconciliationBatch with one
+ReconciliationLine per EFT row. Matching runs in the background (see
+core.tasks) and the review page reads the stored matches, so large
+statements stay out of the session and out of the upload request.
+PayerAlias remembers which client a payer reference belongs to once a
+match has been accepted, so recurring payers score higher for that client
+and, once accepted a few times, match without fuzzy scoring.
+"""
+import re
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+
+class ReconciliationBatch(models.Model):
+    """One uploaded bank statement"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('matching', 'Matching'),
+        ('ready', 'Ready for Review'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_lines = models.IntegerField(default=0)
+    processed_lines = models.IntegerField(default=0)
+    matched_lines = models.IntegerField(default=0)
+    skipped_rows = models.IntegerField(default=0, help_text="Non-EFT rows left out of the batch")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='reconciliation_batches')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Reconciliation Batch'
+        verbose_name_plural = 'Reconciliation Batches'
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if not self.total_lines:
+            return 100
+        return int(self.processed_lines * 100 / self.total_lines)
+
+
+class ReconciliationLine(models.Model):
+    """
+    One EFT row of a bank statement and its candidate invoices.
+    matches holds [{'invoice_id', 'match_score', 'match_reasons',
+    'amount_match'}, ...] best first.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('accepted', 'Accepted'),
+        ('rejected', 'Rejected'),
+    ]
+
+    batch = models.ForeignKey(ReconciliationBatch, on_delete=models.CASCADE, related_name='lines')
+    row_num = models.IntegerField()
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.TextField()
+    matches = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True, blank=True, related_name='reconciliation_lines')
+
+    class Meta:
+        ordering = ['row_num']
+        unique_together = [('batch', 'row_num')]
+
+    def __str__(self):
+        return f"Row {self.row_num}: R{self.amount} {self.description}"
+
+
+class PayerAlias(models.Model):
+    """
+    A bank payer reference known to belong to a client.
+    Learned from accepted EFT matches; references are stored normalized
+    (see normalize) so the same payer matches from month to month.
+    """
+    # Invoice numbers, dates and transaction ids change between payments
+    VOLATILE = re.compile(r'INV[- ]?\d+|#\s*\d+|\d{4,}')
+    NON_WORD = re.compile(r'[^A-Z0-9]+')
+    # Bank names and transfer wording shared by many payers' references
+    BOILERPLATE = frozenset('''
+        ABSA ACB AFRICAN BANK BANKING CAPITEC DISCOVERY FNB INVESTEC NEDBANK
+        STANDARD TYMEBANK ACC ACCOUNT APP CELL CR CREDIT DEPOSIT DIGITAL DR EFT
+        FROM FT FUNDS IB IMMEDIATE INSTANT INTERNET INV INVOICE MAGTAPE MOBILE
+        ONLINE PAYMENT PAYMENTS PMT RECEIVED REF REFERENCE SEND TO TRANSFER
+    '''.split())
+    # What is left of a reference once boilerplate is removed must be this
+    # long, or it says too little about the payer to be learned
+    MIN_LENGTH = 6
+
+    reference = models.CharField(max_length=255, unique=True, help_text="Normalized bank description")
+    client = models.ForeignKey('Client', on_delete=models.CASCADE, related_name='payer_aliases')
+    times_matched = models.PositiveIntegerField(default=0)
+    last_matched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['reference']
+        verbose_name = 'Payer Alias'
+        verbose_name_plural = 'Payer Aliases'
+
+    def __str__(self):
+        return f"{self.reference} -> {self.client}"
+
+    @classmethod
+    def normalize(cls, description):
+        """
+        Upper case words of a bank description without invoice numbers, long
+        digit runs or bank boilerplate; empty when too little is left.
+        """
+        text = cls.VOLATILE.sub(' ', (description or '').upper())
+        words = [word for word in cls.NON_WORD.sub(' ', text).split() if word not in cls.BOILERPLATE]
+        reference = ' '.join(words)[:255]
+        return reference if len(reference) >= cls.MIN_LENGTH else ''
+
+    @classmethod
+    def learn(cls, pairs):
+        """
+        Record accepted (description, client_id) pairs in bulk. A reference
+        accepted for a different client than before is moved to that client.
+        """
+        counts = Counter()
+        clients = {}
+        for description, client_id in pairs:
+            reference = cls.normalize(description)
+            if not reference or not client_id:
+                continue
+            counts[reference] += 1
+            clients[reference] = client_id
+        if not counts:
+            return
+
+        now = timezone.now()
+        existing = cls.objects.in_bulk(list(counts), field_name='reference')
+        to_create, to_update = [], []
+        for reference, count in counts.items():
+            alias = existing.get(reference)
+            if alias is None:
+                to_create.append(cls(
+                    reference=reference, client_id=clients[reference],
+                    times_matched=count, last_matched_at=now,
+                ))
+                continue
+            if alias.client_id != clients[reference]:
+                alias.client_id = clients[reference]
+                alias.times_matched = 0
+            alias.times_matched += count
+            alias.last_matched_at = now
+            alias.updated_at = now
+            to_update.append(alias)
+
+        # A concurrent review may have added the same reference
+        cls.objects.bulk_create(to_create, ignore_conflicts=True)
+        cls.objects.bulk_update(to_update, ['client', 'times_matched', 'last_matched_at', 'updated_at'])
@@ -0,0 +1,205 @@
+"""
+Document numbering models.
+Hands out INV/QT/PAY/CN/SM/PO/EXP/JE numbers from a locked counter row per
+sequence instead of scanning the document tables on every save.
+"""
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import models, transaction, IntegrityError
+
+
+# Document types: code -> (model label, number field, numbered per day, sequence digits)
+DOCUMENT_TYPES = {
+    'INV': ('core.Invoice', 'invoice_number', False, 6),
+    'QT': ('core.Quote', 'quote_number', True, 3),
+    'PAY': ('core.Payment', 'payment_number', True, 3),
+    'CN': ('core.CreditNote', 'credit_note_number', True, 3),
+    'SM': ('core.StockMovement', 'movement_number', True, 3),
+    'PO': ('core.StockPurchase', 'purchase_number', True, 3),
+    'EXP': ('core.Expense', 'expense_number', True, 3),
+    'JE': ('core.JournalEntry', 'entry_number', True, 3),
+}
+
+# Sequential invoices continue from the old system's last number (INV-004240)
+INVOICE_NUMBER_FLOOR = 4240
+
+
+class DocumentSequence(models.Model):
+    """
+    Last number issued for one sequence.
+    Invoices use a single 'INV' sequence; daily-numbered documents use one
+    sequence per prefix (e.g. 'QT-20240115').
+    """
+    key = models.CharField(max_length=50, unique=True, help_text="Sequence key, e.g. INV or QT-20240115")
+    document_type = models.CharField(max_length=10, help_text="Document code, e.g. INV, QT, PAY")
+    start_value = models.PositiveIntegerField(default=0, help_text="Numbers at or below this value are never issued")
+    last_value = models.PositiveIntegerField(default=0, help_text="Last number issued")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['document_type', 'key']
+        verbose_name = 'Document Sequence'
+        verbose_name_plural = 'Document Sequences'
+
+    def __str__(self):
+        return f"{self.key}: {self.last_value}"
+
+    # -- Key and number formatting -------------------------------------------
+
+    @staticmethod
+    def sequence_key(code, day=None):
+        """Sequence key for a document code (and issue day for daily types)"""
+        if DOCUMENT_TYPES[code][2]:
+            from datetime import date
+            day = day or date.today()
+            return f"{code}-{day.strftime('%Y%m%d')}"
+        return code
+
+    @staticmethod
+    def format_number(code, key, value):
+        """Render a sequence value as a document number"""
+        digits = DOCUMENT_TYPES[code][3]
+        return f"{key}-{value:0{digits}d}"
+
+    @staticmethod
+    def parse_number(key, number):
+        """Extract the sequence value from a document number, or None"""
+        if not number or not number.startswith(f"{key}-"):
+            return None
+        try:
+            return int(number[len(key) + 1:])
+        except ValueError:
+            return None
+
+    # -- Allocation ----------------------------------------------------------
+
+    @classmethod
+    def next_number(cls, code, day=None):
+        """Allocate the next document number for a document code"""
+        key = cls.sequence_key(code, day)
+        value = cls._allocate(code, key)
+        return cls.format_number(code, key, value)
+
+    @classmethod
+    @contextmanager
+    def numbering(cls, instance, code):
+        """
+        Atomic block for saving a document: an unnumbered document gets the
+        next number inside it, so a save that fails (e.g. a closed period
+        check) rolls its number back instead of burning it, and the number
+        is cleared again for a retry.
+        """
+        field = DOCUMENT_TYPES[code][1]
+        allocated = not getattr(instance, field)
+        try:
+            with transaction.atomic():
+                if allocated:
+                    setattr(instance, field, cls.next_number(code))
+                yield
+        except Exception:
+            if allocated:
+                setattr(instance, field, '')
+            raise
+
+    @classmethod
+    def reserve_numbers(cls, code, count, day=None):
+        """
+        Allocate a block of consecutive document numbers in one round trip.
+        Used by importers and bulk posting that create many documents at once.
+        """
+        if count <= 0:
+            return []
+        key = cls.sequence_key(code, day)
+        last_value = cls._allocate(code, key, count)
+        return [
+            cls.format_number(code, key, value)
+            for value in range(last_value - count + 1, last_value + 1)
+        ]
+
+    @classmethod
+    def _allocate(cls, code, key, count=1):
+        """
+        Advance the sequence row by count under a row lock and return the new
+        last value. The lock is held until the surrounding transaction
+        commits, so two concurrent saves can never receive the same number,
+        and a rolled back save also rolls back its number.
+        """
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(key=key).first()
+            if sequence is None:
+                sequence = cls._create_sequence(code, key)
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value', 'updated_at'])
+            return sequence.last_value
+
+    @classmethod
+    def _create_sequence(cls, code, key):
+        """Create a missing sequence row, seeded from existing documents"""
+        start_value = INVOICE_NUMBER_FLOOR if code == 'INV' else 0
+        last_value = max(start_value, cls.scan_last_value(code, key))
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    key=key,
+                    document_type=code,
+                    start_value=start_value,
+                    last_value=last_value,
+                )
+        except IntegrityError:
+            # Another transaction created it first; wait for its lock
+            return cls.objects.select_for_update().get(key=key)
+
+    # -- Seeding and auditing ------------------------------------------------
+
+    @classmethod
+    def _used_values(cls, code, key):
+        """Sequence values already present in the document table"""
+        label, field, _, _ = DOCUMENT_TYPES[code]
+        model = apps.get_model(label)
+        numbers = model.objects.filter(
+            **{f"{field}__startswith": f"{key}-"}
+        ).values_list(field, flat=True).iterator()
+        values = set()
+        for number in numbers:
+            value = cls.parse_number(key, number)
+            if value is not None:
+                values.add(value)
+        return values
+
+    @classmethod
+    def scan_last_value(cls, code, key):
+        """Highest number already used for a key (full scan, used for seeding only)"""
+        return max(cls._used_values(code, key), default=0)
+
+    @classmethod
+    def reseed(cls, code, key):
+        """Reset a sequence to the highest number in the document table"""
+        start_value = INVOICE_NUMBER_FLOOR if code == 'INV' else 0
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(
+                key=key,
+                defaults={'document_type': code, 'start_value': start_value},
+            )
+            sequence.last_value = max(sequence.start_value, cls.scan_last_value(code, key))
+            sequence.save(update_fields=['last_value', 'updated_at'])
+        return sequence
+
+    def find_gaps(self):
+        """
+        Numbers issued by this sequence that no longer exist in the document
+        table (e.g. deleted documents), as a list of (first, last) ranges.
+        """
+        used = self._used_values(self.document_type, self.key)
+        gaps = []
+        gap_start = None
+        for value in range(self.start_value + 1, self.last_value + 1):
+            if value in used:
+                if gap_start is not None:
+                    gaps.append((gap_start, value - 1))
+                    gap_start = None
+            elif gap_start is None:
+                gap_start = value
+        if gap_start is not None:
+            gaps.append((gap_start, self.last_value))
+        return gaps
@@ -7,6 +7,9 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from .models_period_close import check_period_open
+from .models_sequence import DocumentSequence
+
 
 class CylinderSize(models.Model):
     """Standard cylinder sizes available (5kg, 9kg, 14kg, 19kg, 48kg)"""
@@ -105,33 +108,20 @@ class StockMovement(models.Model):
         return f"{self.movement_number}: {direction}{self.quantity} x {self.cylinder_size.name}"
     
     def save(self, *args, **kwargs):
-        # Auto-generate movement number
-        if not self.movement_number:
-            from datetime import date
-            today = date.today()
-            prefix = f"SM-{today.strftime('%Y%m%d')}"
-            
-            last_movement = StockMovement.objects.filter(
-                movement_number__startswith=prefix
-            ).order_by('movement_number').last()
-            
-            if last_movement:
-                try:
-                    last_seq = int(last_movement.movement_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.movement_number = f"{prefix}-{new_seq:03d}"
-        
-        # Update stock levels
-        is_new = self.pk is None
-        if is_new:
-            self._update_stock()
+        # Nothing dated in a closed period may change, including stock levels
+        stored_date = None
+        if self.pk:
+            stored_date = StockMovement.objects.filter(pk=self.pk).values_list('date', flat=True).first()
+        check_period_open('Stock movement', self.date, stored_date)
         
-        super().save(*args, **kwargs)
+        # Auto-generate movement number; stock levels change in the same transaction
+        with DocumentSequence.numbering(self, 'SM'):
+            # Update stock levels
+            is_new = self.pk is None
+            if is_new:
+                self._update_stock()
+            
+            super().save(*args, **kwargs)
     
     def _update_stock(self):
         """Update GasStock levels based on movement"""
@@ -184,27 +174,8 @@ class StockPurchase(models.Model):
     
     def save(self, *args, **kwargs):
         # Auto-generate purchase number
-        if not self.purchase_number:
-            from datetime import date
-            today = date.today()
-            prefix = f"PO-{today.strftime('%Y%m%d')}"
-            
-            last_purchase = StockPurchase.objects.filter(
-                purchase_number__startswith=prefix
-            ).order_by('purchase_number').last()
-            
-            if last_purchase:
-                try:
-                    last_seq = int(last_purchase.purchase_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.purchase_number = f"{prefix}-{new_seq:03d}"
-        
-        super().save(*args, **kwargs)
+        with DocumentSequence.numbering(self, 'PO'):
+            super().save(*args, **kwargs)
     
     def calculate_totals(self):
         """Calculate totals from purchase items"""
@@ -4,9 +4,20 @@ Handles VAT returns, SARS tax returns, CIPC annual returns, and financial statem
 """
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-from datetime import date
+from datetime import date, timedelta
+
+
+def _year_start(year_end):
+    """First day of the twelve months ending year_end"""
+    day_after = year_end + timedelta(days=1)
+    try:
+        return day_after.replace(year=day_after.year - 1)
+    except ValueError:
+        # A year ending 28 February of a leap year starts on 1 March
+        return day_after.replace(year=day_after.year - 1, month=3, day=1)
 
 
 class AccountType(models.Model):
@@ -75,28 +86,10 @@ class AccountType(models.Model):
         return f"{self.code} - {self.name}"
     
     def get_balance(self, start_date=None, end_date=None):
-        """Calculate account balance for a period"""
-        from django.db.models import Sum
-        from .models_accounting import JournalEntry
-        
-        entries = JournalEntry.objects.filter(status='posted')
+        """Calculate account balance for a period from its posted journal lines"""
+        from .services import ledger
         
-        if start_date:
-            entries = entries.filter(date__gte=start_date)
-        if end_date:
-            entries = entries.filter(date__lte=end_date)
-        
-        # Calculate based on account category
-        if self.category in ['asset', 'expense']:
-            # Debit increases, credit decreases
-            debits = entries.aggregate(total=Sum('debit_amount'))['total'] or 0
-            credits = entries.aggregate(total=Sum('credit_amount'))['total'] or 0
-            return debits - credits
-        else:
-            # Credit increases, debit decreases (liability, equity, revenue)
-            debits = entries.aggregate(total=Sum('debit_amount'))['total'] or 0
-            credits = entries.aggregate(total=Sum('credit_amount'))['total'] or 0
-            return credits - debits
+        return ledger.account_balances([self], start_date, end_date)[self.pk]
 
 
 class VATReturn(models.Model):
@@ -185,33 +178,22 @@ class VATReturn(models.Model):
     
     def calculate_vat(self):
         """Auto-calculate VAT from invoices and expenses"""
-        from .models import Invoice
-        from .models_accounting import Expense
+        from .services import period_totals
         
         # Output tax (sales)
-        invoices = Invoice.objects.filter(
-            issue_date__gte=self.period_start,
-            issue_date__lte=self.period_end,
-            status__in=['paid', 'partially_paid', 'sent']
+        sales = period_totals.sales_totals(
+            self.period_start, self.period_end, ['paid', 'partially_paid', 'sent']
         )
+        self.box1_output_tax = sales['tax']
+        self.total_sales_incl_vat = sales['total']
         
-        self.box1_output_tax = sum(inv.tax_amount for inv in invoices)
-        self.total_sales_incl_vat = sum(inv.total_amount for inv in invoices)
-        
-        # Input tax (purchases)
-        expenses = Expense.objects.filter(
-            date__gte=self.period_start,
-            date__lte=self.period_end,
-            payment_status__in=['paid', 'partial']
+        # Input tax (purchases), capital goods separated from other expenses
+        purchases = period_totals.purchase_totals(
+            self.period_start, self.period_end, ['paid', 'partial']
         )
-        
-        # Separate capital goods from other expenses
-        capital_expenses = expenses.filter(category__name__icontains='capital')
-        other_expenses = expenses.exclude(category__name__icontains='capital')
-        
-        self.box4_capital_goods = sum(exp.vat_amount for exp in capital_expenses)
-        self.box5_other_input_tax = sum(exp.vat_amount for exp in other_expenses)
-        self.total_purchases_incl_vat = sum(exp.total_amount for exp in expenses)
+        self.box4_capital_goods = purchases['capital_tax']
+        self.box5_other_input_tax = purchases['other_tax']
+        self.total_purchases_incl_vat = purchases['total']
         
         # Calculate totals
         self.box3_total_output_tax = self.box1_output_tax + self.box2_output_tax_other
@@ -320,8 +302,18 @@ class CIPCAnnualReturn(models.Model):
             self.registered_address = settings.address
             self.postal_address = settings.address
         
-        # Get financial data from balance sheet and income statement
-        # This will be populated when we generate the statements
+        # Financial figures for the year ending financial_year_end
+        from .services import financial_statements
+        
+        balance_sheet, _ = financial_statements.balance_sheet(self.financial_year_end)
+        income, _ = financial_statements.income_statement(
+            _year_start(self.financial_year_end), self.financial_year_end
+        )
+        self.total_assets = balance_sheet['assets']['total_assets']
+        self.total_liabilities = balance_sheet['liabilities']['total_liabilities']
+        self.total_equity = balance_sheet['equity']['total_equity']
+        self.total_revenue = income['revenue']['total_revenue']
+        self.profit_loss = income['profit']['net_profit']
 
 
 class SARSTaxReturn(models.Model):
@@ -420,6 +412,18 @@ class SARSTaxReturn(models.Model):
         
         super().save(*args, **kwargs)
     
+    def populate_from_financial_statements(self):
+        """Fill income and deductions from the ledger's income statement for the tax year"""
+        from .services import financial_statements
+        
+        income, _ = financial_statements.income_statement(self.tax_year_start, self.tax_year_end)
+        self.gross_income = income['revenue']['total_revenue']
+        self.cost_of_sales = income['expenses']['cost_of_sales']
+        self.operating_expenses = (
+            income['expenses']['operating_expenses'] + income['expenses']['administrative_expenses']
+        )
+        self.interest_expense = income['expenses']['finance_costs']
+    
     def calculate_tax(self):
         """Auto-calculate tax from financial data"""
         # Calculate total income
@@ -478,13 +482,13 @@ class FinancialStatement(models.Model):
     period_start = models.DateField()
     period_end = models.DateField()
     
-    # Statement data (stored as JSON for flexibility)
-    statement_data = models.JSONField(default=dict, help_text="Structured financial data")
+    # Statement data (stored as JSON for flexibility; amounts as decimal strings)
+    statement_data = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="Structured financial data")
     
     # Comparative period
     comparative_period_start = models.DateField(null=True, blank=True)
     comparative_period_end = models.DateField(null=True, blank=True)
-    comparative_data = models.JSONField(default=dict, blank=True)
+    comparative_data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
     
     # Generated files
     pdf_file = models.FileField(upload_to='financial_statements/pdf/%Y/', blank=True, null=True)
@@ -538,89 +542,35 @@ class FinancialStatement(models.Model):
         super().save(*args, **kwargs)
     
     def generate_balance_sheet(self):
-        """Generate Balance Sheet data"""
+        """Generate Balance Sheet data, with the comparative period end if set"""
         if self.statement_type != 'balance_sheet':
             return
         
-        # Get all account balances
-        assets = self._get_accounts_by_category('asset')
-        liabilities = self._get_accounts_by_category('liability')
-        equity = self._get_accounts_by_category('equity')
+        from .services import financial_statements
         
-        self.statement_data = {
-            'assets': {
-                'current_assets': self._get_subcategory_total('asset', 'current_asset'),
-                'fixed_assets': self._get_subcategory_total('asset', 'fixed_asset'),
-                'intangible_assets': self._get_subcategory_total('asset', 'intangible_asset'),
-                'other_assets': self._get_subcategory_total('asset', 'other_asset'),
-                'total_assets': sum(acc.get_balance(end_date=self.period_end) for acc in assets),
-            },
-            'liabilities': {
-                'current_liabilities': self._get_subcategory_total('liability', 'current_liability'),
-                'long_term_liabilities': self._get_subcategory_total('liability', 'long_term_liability'),
-                'total_liabilities': sum(acc.get_balance(end_date=self.period_end) for acc in liabilities),
-            },
-            'equity': {
-                'capital': self._get_subcategory_total('equity', 'capital'),
-                'retained_earnings': self._get_subcategory_total('equity', 'retained_earnings'),
-                'total_equity': sum(acc.get_balance(end_date=self.period_end) for acc in equity),
-            }
-        }
+        self.statement_data, comparative = financial_statements.balance_sheet(
+            self.period_end, self.comparative_period_end
+        )
+        self.comparative_data = comparative or {}
         
         self.status = 'generated'
         self.save()
     
     def generate_income_statement(self):
-        """Generate Income Statement data"""
+        """Generate Income Statement data, with the comparative period if set"""
         if self.statement_type != 'income_statement':
             return
         
-        revenue = self._get_accounts_by_category('revenue')
-        expenses = self._get_accounts_by_category('expense')
+        from .services import financial_statements
         
-        total_revenue = sum(acc.get_balance(self.period_start, self.period_end) for acc in revenue)
-        total_expenses = sum(acc.get_balance(self.period_start, self.period_end) for acc in expenses)
-        
-        self.statement_data = {
-            'revenue': {
-                'sales_revenue': self._get_subcategory_total('revenue', 'sales_revenue'),
-                'service_revenue': self._get_subcategory_total('revenue', 'service_revenue'),
-                'other_income': self._get_subcategory_total('revenue', 'other_income'),
-                'total_revenue': total_revenue,
-            },
-            'expenses': {
-                'cost_of_sales': self._get_subcategory_total('expense', 'cost_of_sales'),
-                'operating_expenses': self._get_subcategory_total('expense', 'operating_expense'),
-                'administrative_expenses': self._get_subcategory_total('expense', 'administrative_expense'),
-                'finance_costs': self._get_subcategory_total('expense', 'finance_cost'),
-                'total_expenses': total_expenses,
-            },
-            'profit': {
-                'gross_profit': total_revenue - self._get_subcategory_total('expense', 'cost_of_sales'),
-                'operating_profit': total_revenue - total_expenses,
-                'net_profit': total_revenue - total_expenses,
-            }
-        }
+        self.statement_data, comparative = financial_statements.income_statement(
+            self.period_start, self.period_end,
+            self.comparative_period_start, self.comparative_period_end,
+        )
+        self.comparative_data = comparative or {}
         
         self.status = 'generated'
         self.save()
-    
-    def _get_accounts_by_category(self, category):
-        """Helper to get accounts by category"""
-        return AccountType.objects.filter(category=category, is_active=True)
-    
-    def _get_subcategory_total(self, category, subcategory):
-        """Helper to get total for a subcategory"""
-        accounts = AccountType.objects.filter(
-            category=category,
-            subcategory=subcategory,
-            is_active=True
-        )
-        
-        if self.statement_type == 'balance_sheet':
-            return sum(acc.get_balance(end_date=self.period_end) for acc in accounts)
-        else:
-            return sum(acc.get_balance(self.period_start, self.period_end) for acc in accounts)
 
 
 class TaxConfiguration(models.Model):
@@ -1,3 +1,6 @@
+import copy
+import os
+import time
 from django.http import HttpResponse
 from django.template.loader import get_template
 from io import BytesIO
@@ -19,94 +22,272 @@ def get_company_settings():
         return None
 
 
+class PDFContext:
+    """
+    Everything the PDF generators share between documents: company details,
+    the sample style sheet and custom paragraph styles, table style templates
+    and the decoded logo. Built once per process by get_pdf_context() and
+    dropped when CompanySettings is saved (see core.signals); other processes
+    pick up the change once their copy is older than MAX_AGE seconds.
+    """
+    MAX_AGE = 300
+
+    def __init__(self):
+        from django.conf import settings
+
+        self.built_at = time.monotonic()
+
+        company = get_company_settings()
+        self.company = company
+        # Part of cached PDF fingerprints (core.services.pdf_cache)
+        self.version = company.updated_at.isoformat() if company else 'default'
+        self.company_name = company.company_name if company else "Alpha LPGas"
+        self.company_reg = company.registration_number if company else "2023/822513/07"
+        self.company_vat = company.vat_number if company else "9415233222"
+        self.company_phone = company.phone if company else "074 454 5665"
+        self.company_email = company.email if company else "info@alphalpgas.co.za"
+        self.company_address = company.address if company else "Sunny Acres Shopping Centre, Sunnyacres, Western Cape"
+
+        self.bank_name = company.bank_name if company else "Nedbank"
+        self.account_name = company.account_name if company else "Alpha LPGas"
+        self.account_number = company.account_number if company else "1101466707"
+        self.account_type = company.account_type if company else "Current"
+        self.branch_code = company.branch_code if company else "125009"
+        self.payment_ref = company.payment_reference_note if company else "Please use your address as reference"
+        self.statement_footer = company.statement_footer_text if company and company.statement_footer_text else "Should you have any enquiries concerning this statement, please contact us."
+
+        self.styles = getSampleStyleSheet()
+        self._build_paragraph_styles()
+        self._build_table_styles()
+
+        self.logo_path = os.path.join(settings.BASE_DIR, 'static', 'alpha-lpgas-logo.png')
+        self._logos = {}
+
+    def is_stale(self):
+        return time.monotonic() - self.built_at > self.MAX_AGE
+
+    def _build_paragraph_styles(self):
+        normal = self.styles['Normal']
+
+        self.company_name_style = ParagraphStyle(
+            'CompanyName',
+            parent=normal,
+            fontSize=18,
+            textColor=colors.HexColor('#0033CC'),
+            fontName='Helvetica-Bold',
+            spaceAfter=2
+        )
+        self.small_text_style = ParagraphStyle(
+            'SmallText',
+            parent=normal,
+            fontSize=8,
+            textColor=colors.HexColor('#333333'),
+        )
+        self.heading_style = ParagraphStyle(
+            'SectionHeading',
+            parent=normal,
+            fontSize=10,
+            textColor=colors.HexColor('#0033CC'),
+            fontName='Helvetica-Bold',
+            spaceAfter=4
+        )
+        self.company_details_style = ParagraphStyle(
+            'CompanyDetails',
+            parent=normal,
+            fontSize=9,
+            textColor=colors.HexColor('#333333'),
+            leading=14,
+        )
+        self.invoice_title_style = ParagraphStyle(
+            'InvoiceTitle',
+            parent=normal,
+            fontSize=20,
+            fontName='Helvetica-Bold',
+            alignment=TA_CENTER,
+            spaceAfter=10
+        )
+        self.quote_title_style = ParagraphStyle(
+            'QuoteTitle',
+            parent=normal,
+            fontSize=20,
+            fontName='Helvetica-Bold',
+            alignment=TA_CENTER,
+            spaceAfter=10
+        )
+        self.invoice_footer_style = ParagraphStyle(
+            'Footer',
+            parent=normal,
+            fontSize=10,
+            textColor=colors.HexColor('#CC0066'),
+            alignment=TA_CENTER,
+            fontName='Helvetica-Oblique'
+        )
+        self.statement_title_style = ParagraphStyle(
+            'StatementTitle',
+            parent=normal,
+            fontSize=16,
+            fontName='Helvetica-Bold',
+            textColor=colors.HexColor('#0033CC'),
+            alignment=TA_RIGHT,
+            spaceAfter=10
+        )
+        self.statement_info_style = ParagraphStyle(
+            'StatementInfo',
+            parent=normal,
+            fontSize=8,
+            alignment=TA_RIGHT,
+        )
+        self.statement_footer_style = ParagraphStyle(
+            'Footer',
+            parent=normal,
+            fontSize=9,
+            textColor=colors.HexColor('#0033CC'),
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        self.thank_you_style = ParagraphStyle(
+            'ThankYou',
+            parent=normal,
+            fontSize=9,
+            textColor=colors.black,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Oblique'
+        )
+        self.contact_style = ParagraphStyle(
+            'Contact',
+            parent=normal,
+            fontSize=8,
+            textColor=colors.HexColor('#666666'),
+            alignment=TA_CENTER
+        )
+
+    def _build_table_styles(self):
+        self.header_table_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ])
+        self.info_table_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ])
+        self.items_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
+        ])
+        self.totals_table_style = TableStyle([
+            ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (4, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (4, 0), (-1, -1), 10),
+            ('LINEABOVE', (4, 0), (-1, 0), 1, colors.black),
+            ('LINEABOVE', (4, 1), (-1, 1), 2, colors.black),
+        ])
+        self.notes_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ])
+        self.summary_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (0, -2), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('LINEABOVE', (0, 4), (-1, 4), 1, colors.black),
+            ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 4), (-1, 4), 11),
+            ('TEXTCOLOR', (0, 4), (-1, 4), colors.HexColor('#0033CC')),
+        ])
+        self.transactions_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+            ('TOPPADDING', (0, 0), (-1, 0), 6),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
+        ])
+
+    def logo(self, width, height):
+        """
+        Logo flowable at the given size, or None if the logo is missing or
+        unreadable. The image is decoded once per size; each call returns a
+        copy sharing the decoded image.
+        """
+        key = (width, height)
+        if key not in self._logos:
+            logo = None
+            if os.path.exists(self.logo_path):
+                try:
+                    logo = Image(self.logo_path, width=width, height=height, lazy=0)
+                except:
+                    logo = None
+            self._logos[key] = logo
+        template = self._logos[key]
+        return copy.copy(template) if template is not None else None
+
+
+_pdf_context = None
+
+
+def get_pdf_context():
+    """This process's PDFContext, rebuilt when invalidated or stale"""
+    global _pdf_context
+    if _pdf_context is None or _pdf_context.is_stale():
+        _pdf_context = PDFContext()
+    return _pdf_context
+
+
+def invalidate_pdf_context():
+    """Drop the cached PDFContext so the next PDF picks up new company settings"""
+    global _pdf_context
+    _pdf_context = None
+
+
 def generate_invoice_pdf(invoice):
     """Generate PDF for an invoice"""
-    import os
-    from django.conf import settings
+    ctx = get_pdf_context()
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=15*mm, bottomMargin=15*mm, leftMargin=15*mm, rightMargin=15*mm)
     
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    company_name_style = ParagraphStyle(
-        'CompanyName',
-        parent=styles['Normal'],
-        fontSize=18,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=2
-    )
-    
-    small_text_style = ParagraphStyle(
-        'SmallText',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#333333'),
-    )
-    
-    heading_style = ParagraphStyle(
-        'SectionHeading',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=4
-    )
-    
-    # Get company settings
-    company = get_company_settings()
-    company_name = company.company_name if company else "Alpha LPGas"
-    company_reg = company.registration_number if company else "2023/822513/07"
-    company_vat = company.vat_number if company else "9415233222"
-    company_phone = company.phone if company else "074 454 5665"
-    company_email = company.email if company else "info@alphalpgas.co.za"
+    small_text_style = ctx.small_text_style
+    heading_style = ctx.heading_style
     
     # Header with logo and invoice details
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'alpha-lpgas-logo.png')
-    
     header_data = []
-    if os.path.exists(logo_path):
-        try:
-            logo = Image(logo_path, width=90*mm, height=17.5*mm)
-            company_details_style = ParagraphStyle(
-                'CompanyDetails',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.HexColor('#333333'),
-                leading=14,
-            )
-            # Left: Logo and company info, Right: Invoice details
-            header_data = [[
-                [logo, 
-                 Paragraph(f"{company_name}<br/>Reg No: {company_reg}<br/>VAT No: {company_vat}<br/>Tel: {company_phone}<br/>Email: {company_email}", company_details_style)],
-                [Paragraph(f"<b>Invoice No:</b><br/>{invoice.invoice_number}<br/><br/><b>Issue Date:</b><br/>{invoice.issue_date.strftime('%B %d, %Y')}<br/><br/><b>Due Date:</b><br/>{invoice.due_date.strftime('%B %d, %Y')}<br/><br/><b>Status:</b><br/>{invoice.get_status_display().upper()}", small_text_style)]
-            ]]
-        except:
-            pass
+    logo = ctx.logo(90*mm, 17.5*mm)
+    if logo:
+        # Left: Logo and company info, Right: Invoice details
+        header_data = [[
+            [logo, 
+             Paragraph(f"{ctx.company_name}<br/>Reg No: {ctx.company_reg}<br/>VAT No: {ctx.company_vat}<br/>Tel: {ctx.company_phone}<br/>Email: {ctx.company_email}", ctx.company_details_style)],
+            [Paragraph(f"<b>Invoice No:</b><br/>{invoice.invoice_number}<br/><br/><b>Issue Date:</b><br/>{invoice.issue_date.strftime('%B %d, %Y')}<br/><br/><b>Due Date:</b><br/>{invoice.due_date.strftime('%B %d, %Y')}<br/><br/><b>Status:</b><br/>{invoice.get_status_display().upper()}", small_text_style)]
+        ]]
     
     if header_data:
         header_table = Table(header_data, colWidths=[110*mm, 70*mm])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ]))
+        header_table.setStyle(ctx.header_table_style)
         elements.append(header_table)
     
     elements.append(Spacer(1, 10*mm))
     
     # INVOICE title centered
-    invoice_title_style = ParagraphStyle(
-        'InvoiceTitle',
-        parent=styles['Normal'],
-        fontSize=20,
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=10
-    )
-    elements.append(Paragraph("INVOICE", invoice_title_style))
+    elements.append(Paragraph("INVOICE", ctx.invoice_title_style))
     elements.append(Spacer(1, 8*mm))
     
     # Client Information and Banking Details side by side
@@ -116,20 +297,13 @@ def generate_invoice_pdf(invoice):
     <b>Phone:</b> {invoice.client.phone}<br/>
     <b>Email:</b> {invoice.client.email if invoice.client.email else 'No email provided'}"""
     
-    bank_name = company.bank_name if company else "Nedbank"
-    account_name = company.account_name if company else "Alpha LPGas"
-    account_number = company.account_number if company else "1101466707"
-    account_type = company.account_type if company else "Current"
-    branch_code = company.branch_code if company else "125009"
-    payment_ref = company.payment_reference_note if company else "Please use your address as reference"
-    
     banking_info = f"""<b>Banking Details</b><br/>
-    <b>Name:</b> {account_name}<br/>
-    <b>Bank:</b> {bank_name}<br/>
-    <b>Acc No:</b> {account_number}<br/>
-    <b>Acc Type:</b> {account_type}<br/>
-    <b>Branch Code:</b> {branch_code}<br/>
-    <font color='#CC0066'><i>{payment_ref}</i></font>"""
+    <b>Name:</b> {ctx.account_name}<br/>
+    <b>Bank:</b> {ctx.bank_name}<br/>
+    <b>Acc No:</b> {ctx.account_number}<br/>
+    <b>Acc Type:</b> {ctx.account_type}<br/>
+    <b>Branch Code:</b> {ctx.branch_code}<br/>
+    <font color='#CC0066'><i>{ctx.payment_ref}</i></font>"""
     
     info_data = [[
         Paragraph(client_info, small_text_style),
@@ -137,11 +311,7 @@ def generate_invoice_pdf(invoice):
     ]]
     
     info_table = Table(info_data, colWidths=[90*mm, 90*mm])
-    info_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    info_table.setStyle(ctx.info_table_style)
     elements.append(info_table)
     elements.append(Spacer(1, 10*mm))
     
@@ -162,20 +332,7 @@ def generate_invoice_pdf(invoice):
         ])
     
     items_table = Table(items_data, colWidths=[20*mm, 70*mm, 25*mm, 30*mm, 20*mm, 25*mm])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
-    ]))
+    items_table.setStyle(ctx.items_table_style)
     
     elements.append(items_table)
     elements.append(Spacer(1, 5*mm))
@@ -187,13 +344,7 @@ def generate_invoice_pdf(invoice):
     ]
     
     totals_table = Table(totals_data, colWidths=[20*mm, 70*mm, 25*mm, 30*mm, 20*mm, 25*mm])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (4, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (4, 0), (-1, -1), 10),
-        ('LINEABOVE', (4, 0), (-1, 0), 1, colors.black),
-        ('LINEABOVE', (4, 1), (-1, 1), 2, colors.black),
-    ]))
+    totals_table.setStyle(ctx.totals_table_style)
     
     elements.append(totals_table)
     elements.append(Spacer(1, 10*mm))
@@ -202,8 +353,9 @@ def generate_invoice_pdf(invoice):
     elements.append(Paragraph("Customer Notes", heading_style))
     
     # Get payment info from invoice
-    payments = invoice.payments.all()
-    payment_method = payments.first().get_payment_method_display() if payments.exists() else 'Not specified'
+    # Read through all() so payments prefetched by bulk exports are reused
+    payments = list(invoice.payments.all())
+    payment_method = payments[0].get_payment_method_display() if payments else 'Not specified'
     cylinders_collected = 'Not specified'  # This would come from invoice data if available
     
     notes_data = [
@@ -213,25 +365,12 @@ def generate_invoice_pdf(invoice):
     ]
     
     notes_table = Table(notes_data, colWidths=[40*mm, 140*mm])
-    notes_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
+    notes_table.setStyle(ctx.notes_table_style)
     elements.append(notes_table)
     elements.append(Spacer(1, 15*mm))
     
     # Footer message
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#CC0066'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
-    elements.append(Paragraph("Always striving for customer satisfaction!", footer_style))
+    elements.append(Paragraph("Always striving for customer satisfaction!", ctx.invoice_footer_style))
     
     # Build PDF
     doc.build(elements)
@@ -243,101 +382,46 @@ def generate_invoice_pdf(invoice):
     return pdf
 
 
+def _add_quote_page_footer(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica-Oblique', 10)
+    canvas.setFillColor(colors.HexColor('#CC0066'))
+    page_width = A4[0]
+    canvas.drawCentredString(page_width / 2, 10*mm, "Always striving for customer satisfaction!")
+    canvas.restoreState()
+
+
 def generate_quote_pdf(quote):
     """Generate PDF for a quote"""
-    import os
-    from django.conf import settings
+    ctx = get_pdf_context()
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=15*mm, bottomMargin=20*mm, leftMargin=15*mm, rightMargin=15*mm)
     
     elements = []
-    styles = getSampleStyleSheet()
-    
-    def add_page_footer(canvas, doc):
-        canvas.saveState()
-        canvas.setFont('Helvetica-Oblique', 10)
-        canvas.setFillColor(colors.HexColor('#CC0066'))
-        page_width = A4[0]
-        canvas.drawCentredString(page_width / 2, 10*mm, "Always striving for customer satisfaction!")
-        canvas.restoreState()
-    
-    # Custom styles
-    company_name_style = ParagraphStyle(
-        'CompanyName',
-        parent=styles['Normal'],
-        fontSize=18,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=2
-    )
-    
-    small_text_style = ParagraphStyle(
-        'SmallText',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#333333'),
-    )
-    
-    heading_style = ParagraphStyle(
-        'SectionHeading',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=4
-    )
-    
-    # Get company settings
-    company = get_company_settings()
-    company_name = company.company_name if company else "Alpha LPGas"
-    company_reg = company.registration_number if company else "2023/822513/07"
-    company_vat = company.vat_number if company else "9415233222"
-    company_phone = company.phone if company else "074 454 5665"
-    company_email = company.email if company else "info@alphalpgas.co.za"
+    styles = ctx.styles
+    small_text_style = ctx.small_text_style
+    heading_style = ctx.heading_style
     
     # Header with logo and quote details
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'alpha-lpgas-logo.png')
-    
     header_data = []
-    if os.path.exists(logo_path):
-        try:
-            logo = Image(logo_path, width=90*mm, height=17.5*mm)
-            company_details_style = ParagraphStyle(
-                'CompanyDetails',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.HexColor('#333333'),
-                leading=14,
-            )
-            header_data = [[
-                [logo, 
-                 Paragraph(f"{company_name}<br/>Reg No: {company_reg}<br/>VAT No: {company_vat}<br/>Tel: {company_phone}<br/>Email: {company_email}", company_details_style)],
-                [Paragraph(f"<b>Quote No:</b><br/>{quote.quote_number}<br/><br/><b>Issue Date:</b><br/>{quote.issue_date.strftime('%B %d, %Y')}<br/><br/><b>Valid Until:</b><br/>{quote.expiry_date.strftime('%B %d, %Y')}<br/><br/><b>Status:</b><br/>{quote.get_status_display().upper()}", small_text_style)]
-            ]]
-        except:
-            pass
+    logo = ctx.logo(90*mm, 17.5*mm)
+    if logo:
+        header_data = [[
+            [logo, 
+             Paragraph(f"{ctx.company_name}<br/>Reg No: {ctx.company_reg}<br/>VAT No: {ctx.company_vat}<br/>Tel: {ctx.company_phone}<br/>Email: {ctx.company_email}", ctx.company_details_style)],
+            [Paragraph(f"<b>Quote No:</b><br/>{quote.quote_number}<br/><br/><b>Issue Date:</b><br/>{quote.issue_date.strftime('%B %d, %Y')}<br/><br/><b>Valid Until:</b><br/>{quote.expiry_date.strftime('%B %d, %Y')}<br/><br/><b>Status:</b><br/>{quote.get_status_display().upper()}", small_text_style)]
+        ]]
     
     if header_data:
         header_table = Table(header_data, colWidths=[160*mm, 20*mm])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ]))
+        header_table.setStyle(ctx.header_table_style)
         elements.append(header_table)
     
     elements.append(Spacer(1, 10*mm))
     
     # QUOTATION title centered
-    quote_title_style = ParagraphStyle(
-        'QuoteTitle',
-        parent=styles['Normal'],
-        fontSize=20,
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=10
-    )
-    elements.append(Paragraph("QUOTATION", quote_title_style))
+    elements.append(Paragraph("QUOTATION", ctx.quote_title_style))
     elements.append(Spacer(1, 8*mm))
     
     # Client Information
@@ -367,20 +451,7 @@ def generate_quote_pdf(quote):
         ])
     
     items_table = Table(items_data, colWidths=[20*mm, 70*mm, 25*mm, 30*mm, 20*mm, 25*mm])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
-    ]))
+    items_table.setStyle(ctx.items_table_style)
     
     elements.append(items_table)
     elements.append(Spacer(1, 5*mm))
@@ -392,13 +463,7 @@ def generate_quote_pdf(quote):
     ]
     
     totals_table = Table(totals_data, colWidths=[20*mm, 70*mm, 25*mm, 30*mm, 20*mm, 25*mm])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (4, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (4, 0), (-1, -1), 10),
-        ('LINEABOVE', (4, 0), (-1, 0), 1, colors.black),
-        ('LINEABOVE', (4, 1), (-1, 1), 2, colors.black),
-    ]))
+    totals_table.setStyle(ctx.totals_table_style)
     
     elements.append(totals_table)
     elements.append(Spacer(1, 10*mm))
@@ -414,7 +479,7 @@ def generate_quote_pdf(quote):
         elements.append(Paragraph(quote.notes, styles['Normal']))
     
     # Build PDF
-    doc.build(elements, onFirstPage=add_page_footer, onLaterPages=add_page_footer)
+    doc.build(elements, onFirstPage=_add_quote_page_footer, onLaterPages=_add_quote_page_footer)
     
     pdf = buffer.getvalue()
     buffer.close()
@@ -423,115 +488,59 @@ def generate_quote_pdf(quote):
 
 
 def download_invoice_pdf(request, invoice_number):
-    """View to download invoice as PDF"""
+    """View to download invoice as PDF, served from the PDF cache"""
     from django.shortcuts import get_object_or_404
     from .models import Invoice
+    from .services.pdf_cache import pdf_response
     
-    invoice = get_object_or_404(Invoice, invoice_number=invoice_number)
-    pdf = generate_invoice_pdf(invoice)
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
-    
-    return response
+    invoice = get_object_or_404(Invoice.objects.select_related('client'), invoice_number=invoice_number)
+    return pdf_response(request, 'invoice', invoice, f'invoice_{invoice.invoice_number}.pdf')
 
 
 def download_quote_pdf(request, pk):
-    """View to download quote as PDF"""
+    """View to download quote as PDF, served from the PDF cache"""
     from django.shortcuts import get_object_or_404
     from .models import Quote
+    from .services.pdf_cache import pdf_response
     
-    quote = get_object_or_404(Quote, pk=pk)
-    pdf = generate_quote_pdf(quote)
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="quote_{quote.quote_number}.pdf"'
-    
-    return response
+    quote = get_object_or_404(Quote.objects.select_related('client'), pk=pk)
+    return pdf_response(request, 'quote', quote, f'quote_{quote.quote_number}.pdf')
 
 
-def generate_client_statement_pdf(client, start_date, end_date):
-    """Generate PDF statement for a client with date range"""
-    from .models import Invoice, Payment, CreditNote
-    from django.db.models import Q, Sum
-    import os
-    from django.conf import settings
+def generate_client_statement_pdf(client, start_date, end_date, balance_bf=None):
+    """
+    Generate PDF statement for a client with date range.
+    Statement runs pass balance_bf precomputed in bulk to skip its queries.
+    """
+    from .services.statement_service import StatementService
+    ctx = get_pdf_context()
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=15*mm, bottomMargin=15*mm, leftMargin=15*mm, rightMargin=15*mm)
     
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    company_name_style = ParagraphStyle(
-        'CompanyName',
-        parent=styles['Normal'],
-        fontSize=18,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=2
-    )
-    
-    small_text_style = ParagraphStyle(
-        'SmallText',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#333333'),
-    )
-    
-    heading_style = ParagraphStyle(
-        'SectionHeading',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#0033CC'),
-        fontName='Helvetica-Bold',
-        spaceAfter=4
-    )
-    
-    # Get company settings
-    company = get_company_settings()
-    company_name = company.company_name if company else "Alpha LPGas"
-    company_reg = company.registration_number if company else "2023/822513/07"
-    company_vat = company.vat_number if company else "9415233222"
-    company_phone = company.phone if company else "074 454 5665"
-    company_email = company.email if company else "info@alphalpgas.co.za"
-    company_address = company.address if company else "Sunny Acres Shopping Centre, Sunnyacres, Western Cape"
+    company_name_style = ctx.company_name_style
+    small_text_style = ctx.small_text_style
+    heading_style = ctx.heading_style
     
     # Header with logo
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'alpha-lpgas-logo.png')
-    
-    if os.path.exists(logo_path):
-        try:
-            logo = Image(logo_path, width=40*mm, height=15*mm)
-            elements.append(logo)
-            elements.append(Paragraph(company_name, company_name_style))
-        except:
-            elements.append(Paragraph(company_name, company_name_style))
-    else:
-        elements.append(Paragraph(company_name, company_name_style))
+    logo = ctx.logo(40*mm, 15*mm)
+    if logo:
+        elements.append(logo)
+    elements.append(Paragraph(ctx.company_name, company_name_style))
     
     # Company details
-    company_info = f"Company Reg No: {company_reg}<br/>"
-    company_info += f"Company VAT No: {company_vat}<br/>"
-    company_info += f"{company_address}<br/>"
-    company_info += f"Cell: {company_phone}<br/>"
-    company_info += f"Email: {company_email}"
+    company_info = f"Company Reg No: {ctx.company_reg}<br/>"
+    company_info += f"Company VAT No: {ctx.company_vat}<br/>"
+    company_info += f"{ctx.company_address}<br/>"
+    company_info += f"Cell: {ctx.company_phone}<br/>"
+    company_info += f"Email: {ctx.company_email}"
     
     elements.append(Paragraph(company_info, small_text_style))
     elements.append(Spacer(1, 10*mm))
     
     # STATEMENT title - right aligned
-    statement_title_style = ParagraphStyle(
-        'StatementTitle',
-        parent=styles['Normal'],
-        fontSize=16,
-        fontName='Helvetica-Bold',
-        textColor=colors.HexColor('#0033CC'),
-        alignment=TA_RIGHT,
-        spaceAfter=10
-    )
-    elements.append(Paragraph('STATEMENT', statement_title_style))
+    elements.append(Paragraph('STATEMENT', ctx.statement_title_style))
     
     # Statement details - right aligned
     statement_info = f"""<b>Date:</b> {end_date.strftime('%d.%m.%Y')}<br/>
@@ -541,13 +550,7 @@ def generate_client_statement_pdf(client, start_date, end_date):
     <b>End Date:</b> {end_date.strftime('%d.%m.%Y')}<br/>
     <b>Page:</b> 1 of 1"""
     
-    statement_info_style = ParagraphStyle(
-        'StatementInfo',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_RIGHT,
-    )
-    elements.append(Paragraph(statement_info, statement_info_style))
+    elements.append(Paragraph(statement_info, ctx.statement_info_style))
     elements.append(Spacer(1, 8*mm))
     
     # Client information - "To:" section
@@ -563,63 +566,12 @@ def generate_client_statement_pdf(client, start_date, end_date):
     # Account Summary section (right side box)
     elements.append(Paragraph("Account Summary", heading_style))
     
-    # Calculate balance brought forward - sum all transactions before start_date
-    # Get invoices issued before start date
-    bf_invoices = Invoice.objects.filter(
-        client=client,
-        issue_date__lt=start_date
-    )
-    
-    # Get payments made before start date
-    from django.db.models import Q
-    bf_payments = Payment.objects.filter(
-        Q(invoice__client=client) | Q(client=client, invoice__isnull=True),
-        payment_date__lt=start_date
-    )
-    
-    # Get credit notes issued before start date
-    bf_credit_notes = CreditNote.objects.filter(
-        client=client,
-        issue_date__lt=start_date
-    )
-    
-    # Calculate balance brought forward
-    balance_bf = Decimal('0.00')
-    
-    # Add invoice totals
-    for inv in bf_invoices:
-        balance_bf += inv.total_amount
-    
-    # Subtract payments
-    for pmt in bf_payments:
-        balance_bf -= pmt.amount
-    
-    # Subtract credit notes
-    for cn in bf_credit_notes:
-        balance_bf -= cn.total_amount
-    
-    # Calculate totals first for summary
-    invoices = Invoice.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    )
-    
-    payments = Payment.objects.filter(
-        Q(invoice__client=client) | Q(client=client, invoice__isnull=True),
-        payment_date__gte=start_date,
-        payment_date__lte=end_date
-    )
-    
-    credit_notes = CreditNote.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    )
-    
-    total_credits = sum(inv.total_amount for inv in invoices)
-    total_debits = sum(pmt.amount for pmt in payments) + sum(cn.total_amount for cn in credit_notes)
-    current_balance = balance_bf + total_credits - total_debits
+    statement = StatementService(client, start_date, end_date, balance_bf=balance_bf).build()
+    balance_bf = statement['balance_bf']
+    # The summary box shows invoices as credits and receipts as debits
+    total_credits = statement['total_debits']
+    total_debits = statement['total_credits']
+    current_balance = statement['closing_balance']
     
     # Summary box
     summary_data = [
@@ -634,15 +586,7 @@ def generate_client_statement_pdf(client, start_date, end_date):
     ]
     
     summary_table = Table(summary_data, colWidths=[40*mm, 40*mm])
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -2), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEABOVE', (0, 4), (-1, 4), 1, colors.black),
-        ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 4), (-1, 4), 11),
-        ('TEXTCOLOR', (0, 4), (-1, 4), colors.HexColor('#0033CC')),
-    ]))
+    summary_table.setStyle(ctx.summary_table_style)
     
     elements.append(summary_table)
     elements.append(Spacer(1, 10*mm))
@@ -651,7 +595,6 @@ def generate_client_statement_pdf(client, start_date, end_date):
     transactions_data = [['Date', 'Invoice #', 'Description', 'Debit', 'Credit', 'Balance']]
     
     # Add balance brought forward
-    running_balance = balance_bf
     if balance_bf != 0:
         transactions_data.append([
             start_date.strftime('%Y-%m-%d'),
@@ -659,71 +602,11 @@ def generate_client_statement_pdf(client, start_date, end_date):
             'Balance b/f (unpaid invoices from previous period(s))',
             '',
             '',
-            f"R{running_balance:,.2f}"
+            f"R{balance_bf:,.2f}"
         ])
     
-    # Get all transactions in the period
-    # Invoices
-    invoices = Invoice.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    ).order_by('issue_date')
-    
-    # Payments
-    payments = Payment.objects.filter(
-        invoice__client=client,
-        payment_date__gte=start_date,
-        payment_date__lte=end_date
-    ).order_by('payment_date')
-    
-    # Credit Notes
-    credit_notes = CreditNote.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    ).order_by('issue_date')
-    
-    # Combine and sort all transactions
-    transactions = []
-    
-    for inv in invoices:
-        transactions.append({
-            'date': inv.issue_date,
-            'type': 'invoice',
-            'description': f'Invoice',
-            'reference': inv.invoice_number,
-            'debit': inv.total_amount,
-            'credit': Decimal('0.00')
-        })
-    
-    for pmt in payments:
-        transactions.append({
-            'date': pmt.payment_date,
-            'type': 'payment',
-            'description': f'Payment - {pmt.get_payment_method_display()}',
-            'reference': pmt.payment_number,
-            'debit': Decimal('0.00'),
-            'credit': pmt.amount
-        })
-    
-    for cn in credit_notes:
-        transactions.append({
-            'date': cn.issue_date,
-            'type': 'credit_note',
-            'description': 'Credit Note',
-            'reference': cn.credit_note_number,
-            'debit': Decimal('0.00'),
-            'credit': cn.total_amount
-        })
-    
-    # Sort by date
-    transactions.sort(key=lambda x: x['date'])
-    
     # Add transactions to table
-    for trans in transactions:
-        running_balance += trans['debit'] - trans['credit']
-        
+    for trans in statement['transactions']:
         debit_str = f"R{trans['debit']:,.2f}" if trans['debit'] > 0 else ''
         credit_str = f"R{trans['credit']:,.2f}" if trans['credit'] > 0 else ''
         
@@ -740,64 +623,27 @@ def generate_client_statement_pdf(client, start_date, end_date):
             description,
             debit_str,
             credit_str,
-            f"R{running_balance:,.2f}"
+            f"R{trans['balance']:,.2f}"
         ])
     
     # Create transactions table
     trans_table = Table(transactions_data, colWidths=[25*mm, 30*mm, 60*mm, 20*mm, 20*mm, 25*mm])
-    trans_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8E8E8')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('TOPPADDING', (0, 0), (-1, 0), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9F9F9')]),
-    ]))
+    trans_table.setStyle(ctx.transactions_table_style)
     
     elements.append(trans_table)
     elements.append(Spacer(1, 15*mm))
     
     # Footer messages
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#0033CC'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    elements.append(Paragraph(f"Make all EFT's payable to {company_name}", footer_style))
+    elements.append(Paragraph(f"Make all EFT's payable to {ctx.company_name}", ctx.statement_footer_style))
     elements.append(Spacer(1, 3*mm))
     
-    thank_you_style = ParagraphStyle(
-        'ThankYou',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.black,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
-    elements.append(Paragraph("Thank you for your business!", thank_you_style))
+    elements.append(Paragraph("Thank you for your business!", ctx.thank_you_style))
     elements.append(Spacer(1, 5*mm))
     
-    contact_style = ParagraphStyle(
-        'Contact',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#666666'),
-        alignment=TA_CENTER
-    )
-    statement_footer = company.statement_footer_text if company and company.statement_footer_text else "Should you have any enquiries concerning this statement, please contact us."
-    contact_text = statement_footer.replace('\n', '<br/>') + "<br/>"
-    contact_text += f"{company_address}<br/>"
-    contact_text += f"Tel: {company_phone} | Email: {company_email}"
-    elements.append(Paragraph(contact_text, contact_style
-        ))
+    contact_text = ctx.statement_footer.replace('\n', '<br/>') + "<br/>"
+    contact_text += f"{ctx.company_address}<br/>"
+    contact_text += f"Tel: {ctx.company_phone} | Email: {ctx.company_email}"
+    elements.append(Paragraph(contact_text, ctx.contact_style))
     
     # Build PDF
     doc.build(elements)
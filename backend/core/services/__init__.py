@@ -1,4 +1,6 @@
 from .whatsapp_ai_service import WhatsAppAIService
 from .whatsapp_service import WhatsAppService
+from .statement_service import StatementService
+from .statement_run import StatementRun
 
-__all__ = ['WhatsAppAIService', 'WhatsAppService']
+__all__ = ['WhatsAppAIService', 'WhatsAppService', 'StatementService', 'StatementRun']
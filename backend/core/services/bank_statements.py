@@ -0,0 +1,422 @@
+"""
+Bank statement parsers.
+Each parser turns an uploaded statement into StatementTransaction records
+with Decimal amounts. Files are read line by line, never loaded whole, so
+year-long statements can be reconciled in one upload. The format is
+detected from the first lines of the file; register_parser adds new banks.
+
+Usage:
+    parser, transactions = read_statement(uploaded_file)
+    for txn in transactions:
+        ...
+"""
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+
+
+# Lines read up front to recognise the format
+DETECT_LINES = 20
+
+CENTS = Decimal('0.01')
+
+
+class StatementFormatError(ValueError):
+    """The file does not look like any supported bank statement"""
+
+
+class StatementTransaction:
+    """One transaction line from a bank statement"""
+    __slots__ = ('row_num', 'date', 'amount', 'description', 'balance')
+
+    def __init__(self, row_num, date, amount, description, balance=None):
+        self.row_num = row_num
+        self.date = date
+        self.amount = amount
+        self.description = description
+        self.balance = balance
+
+    def __repr__(self):
+        return f"<StatementTransaction {self.row_num} {self.date} {self.amount} {self.description!r}>"
+
+
+def parse_amount(text):
+    """
+    Parse a statement amount as Decimal rounded to cents, or None.
+    Handles currency symbols, thousands separators, (negative) brackets and
+    trailing CR/DR markers.
+    """
+    if text is None:
+        return None
+    text = text.strip().upper().replace(',', '').replace(' ', '')
+
+    sign = 1
+    if text.endswith('DR'):
+        sign, text = -1, text[:-2]
+    elif text.endswith('CR'):
+        text = text[:-2]
+    text = text.replace('ZAR', '').replace('R', '')
+    if text.startswith('(') and text.endswith(')'):
+        sign, text = -sign, text[1:-1]
+    if not text:
+        return None
+
+    try:
+        return (Decimal(text) * sign).quantize(CENTS)
+    except InvalidOperation:
+        return None
+
+
+def parse_date(text, formats):
+    """Parse a statement date with the first matching format, or None"""
+    text = text.strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def iter_lines(uploaded_file):
+    """
+    Decoded lines of an uploaded file, read in chunks.
+    Lines that are not UTF-8 are read as Latin-1, which older bank exports use.
+    """
+    first = True
+    for raw in uploaded_file:
+        try:
+            line = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            line = raw.decode('latin-1')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+class StatementParser:
+    """
+    Base class for a bank statement format.
+    Subclasses set name/label/extensions and implement detect and parse.
+    """
+    name = ''
+    label = ''
+    extensions = ('.csv',)
+
+    def detect(self, head):
+        """Whether the first lines of a file (a list of str) are in this format"""
+        raise NotImplementedError
+
+    def parse(self, lines):
+        """Yield StatementTransaction records from an iterator of lines"""
+        raise NotImplementedError
+
+
+class CSVStatementParser(StatementParser):
+    """
+    CSV statement with a column header row.
+    Columns are found by name, so reordered or extra columns are fine. A
+    statement either has a signed amount column or separate debit and credit
+    columns.
+    """
+    # Text in the preamble that identifies the bank
+    markers = ()
+    # Header names per field, lower case
+    columns = {
+        'date': ('date', 'transaction date', 'posting date', 'value date'),
+        'description': ('description', 'transaction description', 'details', 'narrative', 'reference'),
+        'amount': ('amount', 'transaction amount'),
+        'debit': ('debit', 'debit amount', 'money out'),
+        'credit': ('credit', 'credit amount', 'money in'),
+        'balance': ('balance', 'running balance'),
+    }
+    date_formats = ('%Y/%m/%d', '%Y-%m-%d', '%d/%m/%Y', '%d %b %Y', '%Y%m%d')
+
+    def detect(self, head):
+        text = '\n'.join(head).lower()
+        return any(marker in text for marker in self.markers)
+
+    def header_map(self, row):
+        """{field: column index} if row is this format's header row, else None"""
+        cells = [cell.strip().lower() for cell in row]
+        found = {}
+        for field, names in self.columns.items():
+            for index, cell in enumerate(cells):
+                if cell in names:
+                    found[field] = index
+                    break
+        has_amount = 'amount' in found or ('debit' in found and 'credit' in found)
+        if 'date' in found and 'description' in found and has_amount:
+            return found
+        return None
+
+    def parse(self, lines):
+        columns = None
+        for row_num, row in enumerate(csv.reader(lines), start=1):
+            if columns is None:
+                columns = self.header_map(row)
+                continue
+            txn = self.parse_row(row_num, row, columns)
+            if txn is not None:
+                yield txn
+
+        if columns is None:
+            raise StatementFormatError(f'No column header row found in the {self.label} statement.')
+
+    def parse_row(self, row_num, row, columns):
+        def cell(field):
+            index = columns.get(field)
+            if index is None or index >= len(row):
+                return ''
+            return row[index]
+
+        date = parse_date(cell('date'), self.date_formats)
+        if date is None:
+            return None
+
+        if 'amount' in columns:
+            amount = parse_amount(cell('amount'))
+        else:
+            credit = parse_amount(cell('credit')) or Decimal('0.00')
+            debit = parse_amount(cell('debit')) or Decimal('0.00')
+            amount = credit - abs(debit)
+        if amount is None:
+            return None
+
+        return StatementTransaction(
+            row_num=row_num,
+            date=date,
+            amount=amount,
+            description=cell('description').strip(),
+            balance=parse_amount(cell('balance')),
+        )
+
+
+class NedbankCSVParser(CSVStatementParser):
+    """
+    Nedbank statement enquiry export: a four line preamble (account number,
+    description, statement number) followed by Date, Description, Amount,
+    Balance rows without a header.
+    """
+    name = 'nedbank'
+    label = 'Nedbank CSV'
+    markers = ('statement enquiry',)
+    date_formats = ('%d%b%Y', '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y')
+    nedbank_date = re.compile(r'^\d{2}[A-Za-z]{3}\d{4}$')
+
+    def detect(self, head):
+        if super().detect(head):
+            return True
+        # Data rows start with a DDMonYYYY date
+        return any(row and self.nedbank_date.match(row[0].strip()) for row in csv.reader(head))
+
+    def parse(self, lines):
+        # No header row; the preamble rows have no date and are skipped
+        columns = {'date': 0, 'description': 1, 'amount': 2, 'balance': 3}
+        for row_num, row in enumerate(csv.reader(lines), start=1):
+            txn = self.parse_row(row_num, row, columns)
+            if txn is not None:
+                yield txn
+
+
+class FNBCSVParser(CSVStatementParser):
+    """FNB online banking export: Date, Amount, Balance, Description"""
+    name = 'fnb'
+    label = 'FNB CSV'
+    markers = ('fnb', 'first national bank')
+    date_formats = ('%Y/%m/%d', '%d %b %Y', '%d/%m/%Y', '%Y-%m-%d')
+
+
+class ABSACSVParser(CSVStatementParser):
+    """ABSA internet banking export: Date, Transaction Description, Amount, Balance"""
+    name = 'absa'
+    label = 'ABSA CSV'
+    markers = ('absa',)
+    date_formats = ('%Y%m%d', '%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d')
+
+
+class StandardBankCSVParser(CSVStatementParser):
+    """
+    Standard Bank export. Older exports are record based (ACC-NO, OPEN,
+    HIST rows of type, date, blank, amount, description, reference); newer
+    ones have a Date, Description, Amount, Balance header.
+    """
+    name = 'standard_bank'
+    label = 'Standard Bank CSV'
+    markers = ('standard bank',)
+    record_types = ('acc-no', 'open', 'hist', 'close')
+    date_formats = ('%Y%m%d', '%d/%m/%Y', '%Y/%m/%d', '%d %b %Y', '%Y-%m-%d')
+
+    def is_record_based(self, head):
+        return any(row and row[0].strip().lower() in self.record_types for row in csv.reader(head))
+
+    def detect(self, head):
+        return super().detect(head) or self.is_record_based(head)
+
+    def parse(self, lines):
+        lines = iter(lines)
+        head = list(islice(lines, DETECT_LINES))
+        if not self.is_record_based(head):
+            yield from super().parse(chain(head, lines))
+            return
+
+        columns = {'date': 1, 'amount': 3, 'description': 4}
+        for row_num, row in enumerate(csv.reader(chain(head, lines)), start=1):
+            if not row or row[0].strip().lower() != 'hist':
+                continue
+            txn = self.parse_row(row_num, row, columns)
+            if txn is None:
+                continue
+            if len(row) > 5 and row[5].strip():
+                txn.description = f'{txn.description} {row[5].strip()}'.strip()
+            yield txn
+
+
+class GenericCSVParser(CSVStatementParser):
+    """Any other bank's CSV export with a recognisable column header row"""
+    name = 'csv'
+    label = 'CSV with a header row'
+
+    def detect(self, head):
+        return any(self.header_map(row) for row in csv.reader(head))
+
+
+class OFXParser(StatementParser):
+    """
+    OFX (SGML or XML). Tags are tokenised line by line, so files with one
+    tag per line and files with everything on a few long lines both work.
+    """
+    name = 'ofx'
+    label = 'OFX'
+    extensions = ('.ofx', '.qfx')
+    tag = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+    def detect(self, head):
+        text = '\n'.join(head).upper()
+        return 'OFXHEADER' in text or '<OFX>' in text
+
+    def parse(self, lines):
+        current = None
+        row_num = 0
+        for line in lines:
+            for closing, tag, value in self.tag.findall(line):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    if not closing:
+                        current = {}
+                        continue
+                    if current is not None:
+                        row_num += 1
+                        txn = self.build(row_num, current)
+                        if txn is not None:
+                            yield txn
+                    current = None
+                elif current is not None and not closing:
+                    current[tag] = value.strip()
+
+    def build(self, row_num, fields):
+        # DTPOSTED is YYYYMMDD, optionally followed by a time and time zone
+        date = parse_date(fields.get('DTPOSTED', '')[:8], ('%Y%m%d',))
+        amount = parse_amount(fields.get('TRNAMT'))
+        if date is None or amount is None:
+            return None
+        description = ' '.join(
+            value for value in (fields.get('NAME'), fields.get('MEMO')) if value
+        )
+        return StatementTransaction(row_num=row_num, date=date, amount=amount, description=description)
+
+
+class QIFParser(StatementParser):
+    """QIF bank export: one field per line (D date, T amount, P payee, M memo), records end with ^"""
+    name = 'qif'
+    label = 'QIF'
+    extensions = ('.qif',)
+    date_formats = ('%d/%m/%Y', '%d/%m/%y', '%Y/%m/%d', '%Y-%m-%d', '%d-%m-%Y')
+
+    def detect(self, head):
+        return any(line.strip().lower().startswith('!type:') for line in head)
+
+    def parse(self, lines):
+        fields = {}
+        row_num = 0
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('!'):
+                continue
+            if line == '^':
+                row_num += 1
+                txn = self.build(row_num, fields)
+                if txn is not None:
+                    yield txn
+                fields = {}
+                continue
+            fields.setdefault(line[0].upper(), line[1:].strip())
+
+    def build(self, row_num, fields):
+        # Quicken writes the year after an apostrophe, e.g. 15/01'24
+        date = parse_date(fields.get('D', '').replace("'", '/').replace(' ', ''), self.date_formats)
+        amount = parse_amount(fields.get('T') or fields.get('U'))
+        if date is None or amount is None:
+            return None
+        description = ' '.join(value for value in (fields.get('P'), fields.get('M')) if value)
+        return StatementTransaction(row_num=row_num, date=date, amount=amount, description=description)
+
+
+# Registered parsers by name, tried in order during detection; the generic
+# CSV parser comes last so bank specific layouts win
+PARSERS = {}
+
+
+def register_parser(parser):
+    """Add a parser instance to the registry, replacing any parser with the same name"""
+    PARSERS[parser.name] = parser
+    return parser
+
+
+for _parser in (OFXParser(), QIFParser(), NedbankCSVParser(), FNBCSVParser(),
+                ABSACSVParser(), StandardBankCSVParser(), GenericCSVParser()):
+    register_parser(_parser)
+
+
+def parser_choices():
+    """(name, label) pairs for a bank selection field"""
+    return [(parser.name, parser.label) for parser in PARSERS.values()]
+
+
+def supported_extensions():
+    return sorted({ext for parser in PARSERS.values() for ext in parser.extensions})
+
+
+def detect_parser(head, filename=''):
+    """The parser for a file's first lines, or raise StatementFormatError"""
+    filename = filename.lower()
+    candidates = [p for p in PARSERS.values() if filename.endswith(p.extensions)] or list(PARSERS.values())
+    for parser in candidates:
+        if parser.detect(head):
+            return parser
+    raise StatementFormatError(
+        'Could not recognise the bank statement format. Supported formats: '
+        + ', '.join(parser.label for parser in PARSERS.values()) + '.'
+    )
+
+
+def read_statement(uploaded_file, bank=None):
+    """
+    (parser, transactions) for an uploaded statement. The format is detected
+    unless bank names a registered parser; transactions is a lazy iterator.
+    """
+    lines = iter_lines(uploaded_file)
+    head = list(islice(lines, DETECT_LINES))
+
+    if bank:
+        try:
+            parser = PARSERS[bank]
+        except KeyError:
+            raise StatementFormatError(f'Unknown bank statement format: {bank}')
+    else:
+        parser = detect_parser(head, getattr(uploaded_file, 'name', '') or '')
+
+    return parser, parser.parse(chain(head, lines))
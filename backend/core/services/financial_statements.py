@@ -0,0 +1,200 @@
+"""
+Financial statement figures from the general ledger.
+Every period of a statement (the current one and an optional comparative)
+is totalled in the same grouped query over journal lines, one row per
+(category, subcategory) with a conditional Sum per period boundary. Each
+boundary starts from its latest month-end AccountBalanceSnapshot, so only
+the lines after it are summed. Subcategory, category and profit figures
+are then derived in memory.
+
+Used by FinancialStatement and by the CIPC and SARS return helpers.
+"""
+import operator
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+
+from django.db.models import Q, Sum
+
+from .ledger import signed_balance
+
+
+ZERO = Decimal('0.00')
+
+# Statement line -> (category, subcategory)
+BALANCE_SHEET_LINES = {
+    'assets': {
+        'current_assets': ('asset', 'current_asset'),
+        'fixed_assets': ('asset', 'fixed_asset'),
+        'intangible_assets': ('asset', 'intangible_asset'),
+        'other_assets': ('asset', 'other_asset'),
+    },
+    'liabilities': {
+        'current_liabilities': ('liability', 'current_liability'),
+        'long_term_liabilities': ('liability', 'long_term_liability'),
+    },
+    'equity': {
+        'capital': ('equity', 'capital'),
+        'retained_earnings': ('equity', 'retained_earnings'),
+    },
+}
+INCOME_STATEMENT_LINES = {
+    'revenue': {
+        'sales_revenue': ('revenue', 'sales_revenue'),
+        'service_revenue': ('revenue', 'service_revenue'),
+        'other_income': ('revenue', 'other_income'),
+    },
+    'expenses': {
+        'cost_of_sales': ('expense', 'cost_of_sales'),
+        'operating_expenses': ('expense', 'operating_expense'),
+        'administrative_expenses': ('expense', 'administrative_expense'),
+        'finance_costs': ('expense', 'finance_cost'),
+    },
+}
+
+
+def _cents(value):
+    # SQLite sums decimals as floats
+    return Decimal(value or 0).quantize(ZERO)
+
+
+class GroupTotals:
+    """An account group's period balances, by (category, subcategory)"""
+
+    def __init__(self, balances):
+        self.balances = balances
+
+    def subcategory(self, category, subcategory):
+        return self.balances.get((category, subcategory), ZERO)
+
+    def category(self, category):
+        return sum(
+            (balance for (group_category, _), balance in self.balances.items() if group_category == category),
+            ZERO,
+        )
+
+
+def cumulative_totals(boundaries):
+    """
+    {boundary: {(category, subcategory): [debit, credit]}} posted on active
+    accounts through each boundary date (None for the empty ledger). Each
+    boundary starts from its own latest snapshot, so only the lines after
+    that month end are summed: three queries however many boundaries.
+    """
+    from ..models_ledger import AccountBalanceSnapshot, JournalLine
+
+    boundaries = sorted({boundary for boundary in boundaries if boundary})
+    totals = {boundary: defaultdict(lambda: [ZERO, ZERO]) for boundary in boundaries}
+    if not boundaries:
+        return totals
+
+    months = list(AccountBalanceSnapshot.objects.filter(
+        month__lte=boundaries[-1]
+    ).values_list('month', flat=True).distinct().order_by('month'))
+    base = {
+        boundary: max((month for month in months if month <= boundary), default=None)
+        for boundary in boundaries
+    }
+
+    snapshot_months = {month for month in base.values() if month}
+    if snapshot_months:
+        for row in AccountBalanceSnapshot.objects.filter(
+            month__in=snapshot_months, account__is_active=True,
+        ).values('month', 'account__category', 'account__subcategory').annotate(
+            debit=Sum('debit_total'), credit=Sum('credit_total'),
+        ).order_by():
+            group = (row['account__category'], row['account__subcategory'])
+            for boundary in boundaries:
+                if base[boundary] == row['month']:
+                    group_totals = totals[boundary][group]
+                    group_totals[0] += _cents(row['debit'])
+                    group_totals[1] += _cents(row['credit'])
+
+    windows = [
+        Q(date__gt=base[boundary], date__lte=boundary) if base[boundary] else Q(date__lte=boundary)
+        for boundary in boundaries
+    ]
+    sums = {}
+    for i, window in enumerate(windows):
+        sums[f'debit_{i}'] = Sum('debit', filter=window)
+        sums[f'credit_{i}'] = Sum('credit', filter=window)
+    lines = JournalLine.objects.filter(
+        reduce(operator.or_, windows), entry__status='posted', account__is_active=True,
+    )
+    for row in lines.values('account__category', 'account__subcategory').annotate(**sums).order_by():
+        group = (row['account__category'], row['account__subcategory'])
+        for i, boundary in enumerate(boundaries):
+            group_totals = totals[boundary][group]
+            group_totals[0] += _cents(row[f'debit_{i}'])
+            group_totals[1] += _cents(row[f'credit_{i}'])
+
+    return totals
+
+
+def period_totals(periods, cumulative=False):
+    """
+    One GroupTotals per (start_date, end_date) period, over the active
+    accounts' posted journal lines. With cumulative the balances run from
+    the beginning of the ledger to each end date and start_date is ignored.
+    All periods are totalled in the same three queries.
+    """
+    periods = [(None if cumulative else start, end) for start, end in periods]
+    openings = {start: start - timedelta(days=1) for start, _ in periods if start}
+    totals = cumulative_totals([end for _, end in periods] + list(openings.values()))
+
+    results = []
+    for start, end in periods:
+        closing = totals[end]
+        opening = totals[openings[start]] if start else {}
+        balances = {}
+        for group, (debit, credit) in closing.items():
+            opening_debit, opening_credit = opening.get(group, (ZERO, ZERO))
+            balances[group] = signed_balance(group[0], debit - opening_debit, credit - opening_credit)
+        results.append(GroupTotals(balances))
+    return results
+
+
+def balance_sheet_data(totals):
+    """Balance sheet statement_data from a period's GroupTotals"""
+    data = {
+        section: {name: totals.subcategory(*group) for name, group in lines.items()}
+        for section, lines in BALANCE_SHEET_LINES.items()
+    }
+    data['assets']['total_assets'] = totals.category('asset')
+    data['liabilities']['total_liabilities'] = totals.category('liability')
+    data['equity']['total_equity'] = totals.category('equity')
+    return data
+
+
+def income_statement_data(totals):
+    """Income statement statement_data from a period's GroupTotals"""
+    data = {
+        section: {name: totals.subcategory(*group) for name, group in lines.items()}
+        for section, lines in INCOME_STATEMENT_LINES.items()
+    }
+    total_revenue = totals.category('revenue')
+    total_expenses = totals.category('expense')
+    data['revenue']['total_revenue'] = total_revenue
+    data['expenses']['total_expenses'] = total_expenses
+    data['profit'] = {
+        'gross_profit': total_revenue - data['expenses']['cost_of_sales'],
+        'operating_profit': total_revenue - total_expenses,
+        'net_profit': total_revenue - total_expenses,
+    }
+    return data
+
+
+def balance_sheet(end_date, comparative_end=None):
+    """Balance sheet data at end_date, and at comparative_end (or None)"""
+    periods = [(None, end_date)] + ([(None, comparative_end)] if comparative_end else [])
+    data = [balance_sheet_data(totals) for totals in period_totals(periods, cumulative=True)]
+    return data[0], (data[1] if comparative_end else None)
+
+
+def income_statement(start_date, end_date, comparative_start=None, comparative_end=None):
+    """Income statement data for the period, and for the comparative period (or None)"""
+    comparative = comparative_start and comparative_end
+    periods = [(start_date, end_date)] + ([(comparative_start, comparative_end)] if comparative else [])
+    data = [income_statement_data(totals) for totals in period_totals(periods)]
+    return data[0], (data[1] if comparative else None)
@@ -0,0 +1,176 @@
+"""
+Bulk invoice PDF export.
+Renders the selected invoices in batches across worker processes, with each
+batch's clients, items, products and payments fetched in bulk. Each batch is
+merged into one chunk file on disk, then the chunks are concatenated into the
+final PDF one at a time: a chunk's objects are written out as soon as it is
+read, so memory holds one chunk plus the file offsets, however many invoices
+are exported. The final PDF is also on disk and is streamed to the browser.
+"""
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject,
+)
+
+from .process_pool import map_batches
+
+
+# Page attributes a page may inherit from its page tree nodes
+INHERITED_PAGE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+# Object numbers of the concatenated PDF's catalog and page tree
+CATALOG, PAGES = 1, 2
+
+
+def _render_chunk(invoice_ids, chunk_path):
+    """Render a batch of invoices, in the given order, into one PDF at chunk_path"""
+    from ..models import Invoice
+    from . import pdf_cache
+
+    invoices = Invoice.objects.filter(pk__in=invoice_ids).select_related(
+        'client'
+    ).prefetch_related('items__product', 'payments').in_bulk()
+
+    writer = PdfWriter()
+    for invoice_id in invoice_ids:
+        invoice = invoices.get(invoice_id)
+        if invoice is not None:
+            writer.append(BytesIO(pdf_cache.get_pdf('invoice', invoice)))
+    with open(chunk_path, 'wb') as chunk:
+        writer.write(chunk)
+    return chunk_path
+
+
+class _PDFConcatenator:
+    """
+    Writes the pages of several PDFs into one file, copying each file's
+    objects under new object numbers as soon as it is read.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.offsets = [None, None, None]  # by object number; catalog and page tree come last
+        self.kids = []
+        out.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def add(self, path):
+        """Append every page of the PDF at path"""
+        reader = PdfReader(path)
+        numbers = {}
+        pending = []
+
+        def ref(indirect):
+            key = (indirect.idnum, indirect.generation)
+            if key not in numbers:
+                numbers[key] = len(self.offsets)
+                self.offsets.append(None)
+                pending.append(indirect)
+            return IndirectObject(numbers[key], 0, None)
+
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                return ref(obj)
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(remap(item) for item in obj)
+            if isinstance(obj, DictionaryObject):
+                return DictionaryObject({key: remap(value) for key, value in obj.items()})
+            return obj
+
+        for page in reader.pages:
+            self.kids.append(ref(page.indirect_reference))
+
+        while pending:
+            indirect = pending.pop()
+            obj = indirect.get_object()
+            if isinstance(obj, StreamObject):
+                copy = StreamObject()
+                copy._data = obj._data  # still encoded, written as is
+                copy.update({key: remap(value) for key, value in obj.items() if key != '/Length'})
+            elif isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Page':
+                copy = DictionaryObject({key: value for key, value in obj.items() if key != '/Parent'})
+                for key in INHERITED_PAGE_KEYS:
+                    if key not in copy:
+                        value = self._inherited(obj, key)
+                        if value is not None:
+                            copy[NameObject(key)] = value
+                copy = remap(copy)
+                copy[NameObject('/Parent')] = IndirectObject(PAGES, 0, None)
+            else:
+                copy = remap(obj)
+            self._write(numbers[(indirect.idnum, indirect.generation)], copy)
+
+    def finish(self):
+        """Write the page tree, catalog and cross-reference table"""
+        self._write(PAGES, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self.kids),
+            NameObject('/Count'): NumberObject(len(self.kids)),
+        }))
+        self._write(CATALOG, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(PAGES, 0, None),
+        }))
+        xref = self.out.tell()
+        self.out.write(f'xref\n0 {len(self.offsets)}\n0000000000 65535 f \n'.encode())
+        for offset in self.offsets[1:]:
+            self.out.write(f'{offset:010d} 00000 n \n'.encode())
+        self.out.write(
+            f'trailer\n<< /Size {len(self.offsets)} /Root {CATALOG} 0 R >>\n'
+            f'startxref\n{xref}\n%%EOF\n'.encode()
+        )
+
+    def _write(self, number, obj):
+        self.offsets[number] = self.out.tell()
+        self.out.write(f'{number} 0 obj\n'.encode())
+        obj.write_to_stream(self.out)
+        self.out.write(b'\nendobj\n')
+
+    @staticmethod
+    def _inherited(page, key):
+        node = page.get('/Parent')
+        while node is not None:
+            node = node.get_object()
+            if key in node:
+                return node[key]
+            node = node.get('/Parent')
+        return None
+
+
+class InvoicePDFExport:
+    """
+    One merged PDF of many invoices.
+
+    Usage:
+        pdf_file = InvoicePDFExport(invoice_ids).build()
+        return FileResponse(pdf_file, filename='invoices.pdf')
+    """
+
+    def __init__(self, invoice_ids, workers=None, batch_size=50):
+        self.invoice_ids = list(invoice_ids)
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def build(self):
+        """The merged PDF as an open, rewound temporary file, deleted when closed"""
+        workdir = tempfile.mkdtemp(prefix='invoice_export_')
+        try:
+            batches = [
+                (self.invoice_ids[i:i + self.batch_size], os.path.join(workdir, f'{n:05d}.pdf'))
+                for n, i in enumerate(range(0, len(self.invoice_ids), self.batch_size))
+            ]
+
+            merged = tempfile.TemporaryFile()
+            concatenator = _PDFConcatenator(merged)
+            for chunk_path in map_batches(_render_chunk, batches, workers=self.workers, ordered=True):
+                concatenator.add(chunk_path)
+                os.remove(chunk_path)
+            concatenator.finish()
+            merged.seek(0)
+            return merged
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
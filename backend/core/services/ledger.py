@@ -0,0 +1,193 @@
+"""
+Account balances, the trial balance and account ledger pages from the
+general ledger.
+A cumulative balance is the latest month-end AccountBalanceSnapshot on or
+before the date plus the posted journal lines after it, so every query
+here costs the same few round trips however many accounts or years of
+history there are.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Max, Q, Sum, Window
+
+
+ZERO = Decimal('0.00')
+
+# Categories whose balance is debits minus credits; the rest are credit balances
+DEBIT_CATEGORIES = ('asset', 'expense')
+
+
+def _cents(value):
+    # SQLite sums decimals as floats
+    return Decimal(value or 0).quantize(ZERO)
+
+
+def cumulative_totals(as_of=None, account_ids=None):
+    """{account_id: (debit, credit)} posted through as_of (all time when None)"""
+    from ..models_ledger import AccountBalanceSnapshot, JournalLine
+
+    snapshots = AccountBalanceSnapshot.objects.all()
+    if as_of:
+        snapshots = snapshots.filter(month__lte=as_of)
+    snapshot_month = snapshots.aggregate(month=Max('month'))['month']
+
+    totals = defaultdict(lambda: [ZERO, ZERO])
+    if snapshot_month:
+        rows = AccountBalanceSnapshot.objects.filter(month=snapshot_month)
+        if account_ids is not None:
+            rows = rows.filter(account_id__in=account_ids)
+        for account_id, debit, credit in rows.values_list('account_id', 'debit_total', 'credit_total'):
+            totals[account_id] = [debit, credit]
+
+    lines = JournalLine.objects.filter(entry__status='posted')
+    if as_of:
+        lines = lines.filter(date__lte=as_of)
+    if snapshot_month:
+        lines = lines.filter(date__gt=snapshot_month)
+    if account_ids is not None:
+        lines = lines.filter(account_id__in=account_ids)
+    for row in lines.values('account_id').annotate(debit=Sum('debit'), credit=Sum('credit')).order_by():
+        account_totals = totals[row['account_id']]
+        account_totals[0] += _cents(row['debit'])
+        account_totals[1] += _cents(row['credit'])
+
+    return {account_id: tuple(values) for account_id, values in totals.items()}
+
+
+def movement_totals(start_date=None, end_date=None, account_ids=None):
+    """{account_id: (debit, credit)} posted between start_date and end_date inclusive"""
+    totals = cumulative_totals(end_date, account_ids)
+    if not start_date:
+        return totals
+
+    opening = cumulative_totals(start_date - timedelta(days=1), account_ids)
+    return {
+        account_id: (debit - opening.get(account_id, (ZERO, ZERO))[0],
+                     credit - opening.get(account_id, (ZERO, ZERO))[1])
+        for account_id, (debit, credit) in totals.items()
+    }
+
+
+def signed_balance(category, debit, credit):
+    """Balance in the account's natural direction"""
+    if category in DEBIT_CATEGORIES:
+        return debit - credit
+    return credit - debit
+
+
+def account_balances(accounts, start_date=None, end_date=None):
+    """{account.pk: balance} for the given accounts over a period"""
+    accounts = list(accounts)
+    totals = movement_totals(start_date, end_date, [account.pk for account in accounts])
+    return {
+        account.pk: signed_balance(account.category, *totals.get(account.pk, (ZERO, ZERO)))
+        for account in accounts
+    }
+
+
+def trial_balance(as_of=None):
+    """
+    [{'account', 'debit', 'credit'}] for every account with a balance
+    through as_of, the net balance on the side it falls. Sorted by code.
+    """
+    from ..models_tax_reporting import AccountType
+
+    totals = cumulative_totals(as_of)
+    rows = []
+    for account in AccountType.objects.filter(pk__in=totals).order_by('code'):
+        debit, credit = totals[account.pk]
+        net = debit - credit
+        if net:
+            rows.append({
+                'account': account,
+                'debit': net if net > 0 else ZERO,
+                'credit': -net if net < 0 else ZERO,
+            })
+    return rows
+
+
+def format_cursor(after):
+    """Keyset cursor string for a ledger_page (date, id) position"""
+    day, line_id = after
+    return f'{day.isoformat()}.{line_id}'
+
+
+def parse_cursor(cursor):
+    """(date, id) from a cursor made by format_cursor; ValueError if malformed"""
+    day, _, line_id = cursor.partition('.')
+    return date.fromisoformat(day), int(line_id)
+
+
+def balance_through(account, day, line_id=None):
+    """
+    Account balance through day, or through line line_id on day: the
+    snapshot-based balance to the day before plus that day's lines up to it.
+    """
+    from ..models_ledger import JournalLine
+
+    balance = account_balances([account], end_date=day - timedelta(days=1))[account.pk]
+    lines = JournalLine.objects.filter(account=account, entry__status='posted', date=day)
+    if line_id is not None:
+        lines = lines.filter(id__lte=line_id)
+    totals = lines.aggregate(debit=Sum('debit'), credit=Sum('credit'))
+    return balance + signed_balance(account.category, _cents(totals['debit']), _cents(totals['credit']))
+
+
+def ledger_page(account, start_date=None, end_date=None, after=None, limit=100):
+    """
+    One page of an account's posted journal lines in (date, id) order.
+    after is the (date, id) of the last line of the previous page; paging
+    by keyset on the (account, date, id) index costs the same on page 1000
+    as on page 1. Each line carries running_balance, the account balance
+    after it: a window Sum over the page added to the balance at the
+    start of the page.
+    Returns (opening_balance, lines, next_after) with next_after None on
+    the last page.
+    """
+    from ..models_ledger import JournalLine
+
+    lines = JournalLine.objects.filter(account=account, entry__status='posted')
+    if start_date:
+        lines = lines.filter(date__gte=start_date)
+    if end_date:
+        lines = lines.filter(date__lte=end_date)
+
+    if after:
+        after_date, after_id = after
+        lines = lines.filter(Q(date__gt=after_date) | Q(date=after_date, id__gt=after_id))
+        opening = balance_through(account, after_date, after_id)
+    elif start_date:
+        opening = account_balances([account], end_date=start_date - timedelta(days=1))[account.pk]
+    else:
+        opening = ZERO
+
+    if account.category in DEBIT_CATEGORIES:
+        movement = F('debit') - F('credit')
+    else:
+        movement = F('credit') - F('debit')
+    page = list(lines.select_related('entry').annotate(
+        page_balance=Window(
+            Sum(movement, output_field=DecimalField(max_digits=16, decimal_places=2)),
+            order_by=[F('date').asc(), F('id').asc()],
+        ),
+    ).order_by('date', 'id')[:limit + 1])
+
+    next_after = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_after = (page[-1].date, page[-1].pk)
+    for line in page:
+        line.running_balance = opening + _cents(line.page_balance)
+    return opening, page, next_after
+
+
+def iter_ledger(account, start_date=None, end_date=None, chunk_size=2000):
+    """Every line of ledger_page's pages in turn, for exports"""
+    after = None
+    while True:
+        _, lines, after = ledger_page(account, start_date, end_date, after, chunk_size)
+        yield from lines
+        if after is None:
+            return
@@ -0,0 +1,131 @@
+"""
+Rendered PDF cache.
+Invoice and quote PDFs are stored under a fingerprint of everything they
+print: the document's updated_at (touched by core.signals whenever an item,
+payment or credit note changes it), the client's updated_at and the company
+settings version. An edit changes the fingerprint, so a stale PDF is never
+served; the fingerprint doubles as the download's ETag.
+
+Storage is a FileSystemStorage under PDF_CACHE_ROOT (default media/pdf_cache),
+or any storage class named by the PDF_CACHE_STORAGE setting.
+"""
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.functional import LazyObject
+from django.utils.http import parse_etags, quote_etag
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# kind -> (model, PDF generator) by dotted path, imported when first used
+DOCUMENT_KINDS = {
+    'invoice': ('core.models.Invoice', 'core.pdf_generator.generate_invoice_pdf'),
+    'quote': ('core.models.Quote', 'core.pdf_generator.generate_quote_pdf'),
+}
+
+
+class PDFCacheStorage(LazyObject):
+    def _setup(self):
+        storage_class = getattr(settings, 'PDF_CACHE_STORAGE', None)
+        if storage_class:
+            self._wrapped = import_string(storage_class)()
+        else:
+            self._wrapped = FileSystemStorage(location=settings.PDF_CACHE_ROOT)
+
+
+pdf_cache_storage = PDFCacheStorage()
+
+
+def fingerprint(kind, document):
+    """Hash of everything the document's PDF depends on"""
+    from ..pdf_generator import get_pdf_context
+
+    parts = [
+        kind,
+        str(document.pk),
+        document.updated_at.isoformat(),
+        document.client.updated_at.isoformat(),
+        get_pdf_context().version,
+    ]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+
+def _path(kind, pk, key=''):
+    return f'{kind}/{pk}/{key}.pdf' if key else f'{kind}/{pk}'
+
+
+def get_pdf(kind, document, key=None):
+    """The document's PDF from the cache, rendering and storing it on a miss"""
+    key = key or fingerprint(kind, document)
+    path = _path(kind, document.pk, key)
+
+    try:
+        if pdf_cache_storage.exists(path):
+            with pdf_cache_storage.open(path, 'rb') as cached:
+                return cached.read()
+    except Exception as e:
+        logger.warning(f'PDF cache read failed for {path}: {e}')
+
+    pdf = import_string(DOCUMENT_KINDS[kind][1])(document)
+    try:
+        pdf_cache_storage.save(path, ContentFile(pdf))
+    except Exception as e:
+        logger.warning(f'PDF cache write failed for {path}: {e}')
+    return pdf
+
+
+def pdf_response(request, kind, document, filename):
+    """
+    PDF download that answers If-None-Match with 304 and otherwise serves
+    the cached PDF, rendering it only on a cache miss.
+    """
+    key = fingerprint(kind, document)
+    etag = quote_etag(key)
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_pdf(kind, document, key), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = etag
+    # Let browsers keep the file but revalidate it on every open
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def invalidate(kind, pk):
+    """Delete the document's cached PDFs; best effort, stale keys are never read anyway"""
+    directory = _path(kind, pk)
+    try:
+        _, files = pdf_cache_storage.listdir(directory)
+        for name in files:
+            pdf_cache_storage.delete(f'{directory}/{name}')
+    except Exception:
+        pass
+
+
+def _warm(kind, pk):
+    try:
+        model = import_string(DOCUMENT_KINDS[kind][0])
+        document = model.objects.select_related('client').filter(pk=pk).first()
+        if document is not None:
+            get_pdf(kind, document)
+    except Exception:
+        logger.exception(f'Pre-warming {kind} {pk} PDF failed')
+    finally:
+        connection.close()
+
+
+def prewarm(kind, pk):
+    """Render the document's PDF in the background once the current transaction commits"""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_warm, args=(kind, pk), daemon=True).start()
+    )
@@ -0,0 +1,187 @@
+"""
+Closing TaxPeriods, and balances that start from the closing snapshots.
+close_period() freezes every account, client and stock balance at the
+period end. client_balances() and stock_on_hand() then read the latest
+closing balances before a date plus the rows dated after that period, so
+their cost follows the open period rather than all history; account
+balances get the same from the AccountBalanceSnapshot rows a close writes.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+ZERO = Decimal('0.00')
+
+
+def latest_closed_period(through):
+    """
+    The closed TaxPeriod with closing balances and the latest end on or
+    before through, or None. Periods marked closed before closing balances
+    existed have no closed_at until snapshot_period() has run for them.
+    """
+    from ..models_accounting import TaxPeriod
+    from ..models_period_close import CLOSED_STATUSES
+
+    return TaxPeriod.objects.filter(
+        status__in=CLOSED_STATUSES, closed_at__isnull=False, end_date__lte=through,
+    ).order_by('-end_date').first()
+
+
+def client_balances(through, client_ids=None):
+    """
+    {client_id: invoiced less paid and credited} through a date: the
+    closing balances of the latest closed period before it plus the
+    invoices, payments and credit notes dated after that period.
+    Clients without history are omitted.
+    """
+    from ..models import Invoice, Payment, CreditNote
+
+    period = latest_closed_period(through)
+    balances = {}
+    if period:
+        closing = period.client_balances.all()
+        if client_ids is not None:
+            closing = closing.filter(client_id__in=client_ids)
+        balances.update(closing.values_list('client_id', 'balance'))
+
+    def open_rows(queryset, date_field):
+        queryset = queryset.filter(**{f'{date_field}__lte': through})
+        if period:
+            queryset = queryset.filter(**{f'{date_field}__gt': period.end_date})
+        return queryset
+
+    invoices = open_rows(Invoice.objects.all(), 'issue_date')
+    payments = open_rows(Payment.objects.all(), 'payment_date').annotate(
+        payer_id=Coalesce('invoice__client_id', 'client_id')
+    )
+    credit_notes = open_rows(CreditNote.objects.all(), 'issue_date')
+    if client_ids is not None:
+        invoices = invoices.filter(client_id__in=client_ids)
+        payments = payments.filter(payer_id__in=client_ids)
+        credit_notes = credit_notes.filter(client_id__in=client_ids)
+
+    for client_id, total in invoices.values('client_id').annotate(
+        total=Sum('total_amount')
+    ).values_list('client_id', 'total'):
+        balances[client_id] = balances.get(client_id, ZERO) + (total or ZERO)
+    for client_id, total in payments.values('payer_id').annotate(
+        total=Sum('amount')
+    ).values_list('payer_id', 'total'):
+        if client_id is not None:
+            balances[client_id] = balances.get(client_id, ZERO) - (total or ZERO)
+    for client_id, total in credit_notes.values('client_id').annotate(
+        total=Sum('total_amount')
+    ).values_list('client_id', 'total'):
+        balances[client_id] = balances.get(client_id, ZERO) - (total or ZERO)
+    return balances
+
+
+def stock_on_hand(through):
+    """
+    {cylinder_size_id: cylinders} through a date: the latest closing stock
+    balances before it plus the stock movements dated after that period.
+    """
+    from ..models_stock import StockMovement
+
+    period = latest_closed_period(through)
+    quantities = {}
+    movements = StockMovement.objects.filter(date__lte=through)
+    if period:
+        quantities.update(period.stock_balances.values_list('cylinder_size_id', 'quantity'))
+        movements = movements.filter(date__gt=period.end_date)
+    for cylinder_size_id, quantity in movements.values('cylinder_size_id').annotate(
+        quantity=Sum('quantity')
+    ).values_list('cylinder_size_id', 'quantity'):
+        quantities[cylinder_size_id] = quantities.get(cylinder_size_id, 0) + (quantity or 0)
+    return quantities
+
+
+def snapshot_period(period):
+    """Write the period's account, client and stock closing balances at its end"""
+    from ..models_ledger import AccountBalanceSnapshot
+    from ..models_period_close import ClientClosingBalance, StockClosingBalance
+    from . import ledger
+
+    end = period.end_date
+    with transaction.atomic():
+        AccountBalanceSnapshot.objects.filter(month=end).delete()
+        AccountBalanceSnapshot.objects.bulk_create([
+            AccountBalanceSnapshot(
+                account_id=account_id, month=end, period=period,
+                debit_total=debit, credit_total=credit,
+            )
+            for account_id, (debit, credit) in ledger.cumulative_totals(end).items()
+        ], batch_size=5000)
+
+        period.client_balances.all().delete()
+        ClientClosingBalance.objects.bulk_create([
+            ClientClosingBalance(period=period, client_id=client_id, balance=balance)
+            for client_id, balance in client_balances(end).items()
+        ], batch_size=5000)
+
+        period.stock_balances.all().delete()
+        StockClosingBalance.objects.bulk_create([
+            StockClosingBalance(period=period, cylinder_size_id=cylinder_size_id, quantity=quantity)
+            for cylinder_size_id, quantity in stock_on_hand(end).items()
+        ])
+
+
+def close_period(period, user=None):
+    """
+    Recalculate the period's tax totals, freeze every account, client and
+    stock balance at its end and mark it closed. From then on nothing dated
+    on or before the end can be changed.
+    """
+    from ..models_accounting import TaxPeriod
+
+    with transaction.atomic():
+        period = TaxPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.status != 'open':
+            raise ValueError(f'{period.name} is already {period.get_status_display().lower()}')
+
+        period.calculate_totals()
+        snapshot_period(period)
+
+        period.status = 'closed'
+        period.closed_at = timezone.now()
+        period.closed_by = user
+        period.save(update_fields=['status', 'closed_at', 'closed_by', 'updated_at'])
+    return period
+
+
+def reopen_period(period):
+    """
+    Reopen the latest closed period for corrections. Its client and stock
+    closing balances are dropped; its account snapshot stays as an ordinary
+    month-end snapshot that later edits invalidate.
+    """
+    from ..models_accounting import TaxPeriod
+    from ..models_ledger import AccountBalanceSnapshot
+    from ..models_period_close import CLOSED_STATUSES
+
+    with transaction.atomic():
+        period = TaxPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.status != 'closed':
+            raise ValueError(f'{period.name} is {period.get_status_display().lower()}, not closed')
+        if TaxPeriod.objects.filter(status__in=CLOSED_STATUSES, end_date__gt=period.end_date).exists():
+            raise ValueError(f'Reopen the periods closed after {period.name} first')
+
+        AccountBalanceSnapshot.objects.filter(period=period).update(period=None)
+        period.client_balances.all().delete()
+        period.stock_balances.all().delete()
+
+        period.status = 'open'
+        period.closed_at = None
+        period.closed_by = None
+        period.save(update_fields=['status', 'closed_at', 'closed_by', 'updated_at'])
+    return period
+
+
+def balance_brought_forward(start_date, client_ids=None):
+    """client_balances() for everything dated before start_date"""
+    return client_balances(start_date - timedelta(days=1), client_ids)
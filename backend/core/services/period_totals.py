@@ -0,0 +1,66 @@
+"""
+Sales and purchase totals for a tax period.
+Shared by VATReturn.calculate_vat and TaxPeriod.calculate_totals. Totals
+are Sum aggregates in the database, one query over invoices and one over
+expenses, with capital goods input tax split out by a conditional Sum
+instead of a second scan.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+ZERO = Decimal('0.00')
+CENTS = Decimal('0.01')
+
+# Expense categories whose VAT is claimed as capital goods
+CAPITAL_GOODS = Q(category__name__icontains='capital')
+
+
+def _total(field, filter=None):
+    return Coalesce(
+        Sum(field, filter=filter),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _to_cents(totals):
+    # SQLite sums decimals as floats; totals of cent amounts are exact in cents
+    return {key: value.quantize(CENTS) for key, value in totals.items()}
+
+
+def sales_totals(start_date, end_date, statuses):
+    """{'total', 'tax'} over invoices issued in the period with one of the statuses"""
+    from ..models import Invoice
+
+    return _to_cents(Invoice.objects.filter(
+        issue_date__gte=start_date,
+        issue_date__lte=end_date,
+        status__in=statuses,
+    ).aggregate(
+        total=_total('total_amount'),
+        tax=_total('tax_amount'),
+    ))
+
+
+def purchase_totals(start_date, end_date, payment_statuses):
+    """
+    {'total', 'tax', 'capital_tax', 'other_tax'} over expenses dated in the
+    period with one of the payment statuses. other_tax is every expense that
+    is not capital goods, including uncategorised ones.
+    """
+    from ..models_accounting import Expense
+
+    totals = _to_cents(Expense.objects.filter(
+        date__gte=start_date,
+        date__lte=end_date,
+        payment_status__in=payment_statuses,
+    ).aggregate(
+        total=_total('total_amount'),
+        tax=_total('vat_amount'),
+        capital_tax=_total('vat_amount', filter=CAPITAL_GOODS),
+    ))
+    totals['other_tax'] = totals['tax'] - totals['capital_tax']
+    return totals
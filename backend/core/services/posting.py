@@ -0,0 +1,313 @@
+"""
+Automatic journal posting from invoices, payments, expenses and stock purchases.
+Saving or deleting one of these documents queues it, once the transaction
+commits, for a Celery worker, or posts it in-process when BACKGROUND_WORKER
+is off. Documents saved several times in one transaction are posted once.
+Posting works out each document's balanced journal lines and writes the
+entries and lines with bulk_create.
+
+Every automatic entry has a posting key: its source (e.g. invoice:42) plus a
+digest of its date and lines. A document whose figures have not changed
+already has an entry with that key and is skipped. A document whose figures
+changed, or that was deleted, has its old entry replaced or removed. So
+posting the same document twice, or replaying a queued task, is harmless.
+Documents dated on or before the end of a closed TaxPeriod are left alone and
+reported back (see post_documents), so the backfill command and the admin's
+"Post journal entries" action can list them. Until the chart of accounts is
+set up, queued postings are skipped with a warning; run post_journal_entries
+once it exists.
+"""
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+# Posting role -> chart of accounts code (see setup_chart_of_accounts)
+POSTING_ACCOUNTS = {
+    'cash': '1000',
+    'bank': '1010',
+    'receivable': '1100',
+    'inventory': '1210',
+    'vat_input': '1260',
+    'payable': '2000',
+    'vat_output': '2100',
+    'sales': '4000',
+    'expense': '5600',
+}
+
+# Payment methods settled from the cash account rather than the bank
+CASH_METHODS = ('cash', 'petty_cash')
+
+# Documents posted per transaction by the backfill command
+CHUNK_SIZE = 10000
+
+# A failed publish takes seconds, so after one, post in-process for this long
+BROKER_RETRY_SECONDS = 60
+_broker_down_until = 0.0
+
+
+def _cents(value):
+    return Decimal(value or 0).quantize(ZERO)
+
+
+def _money_account(accounts, payment_method):
+    return accounts['cash'] if payment_method in CASH_METHODS else accounts['bank']
+
+
+def _invoice_posting(invoice, accounts):
+    """Receivable for the total against sales and output VAT"""
+    total = _cents(invoice.total_amount)
+    vat = _cents(invoice.tax_amount)
+    return {
+        'date': invoice.issue_date,
+        'entry_type': 'income',
+        'description': f'Invoice {invoice.invoice_number} - {invoice.client.name}',
+        'reference': invoice.invoice_number,
+        'lines': [
+            (accounts['receivable'], total),
+            (accounts['sales'], -(total - vat)),
+            (accounts['vat_output'], -vat),
+        ],
+    }
+
+
+def _payment_posting(payment, accounts):
+    """Cash or bank against the receivable"""
+    amount = _cents(payment.amount)
+    return {
+        'date': payment.payment_date,
+        'entry_type': 'transfer',
+        'description': f'Payment {payment.payment_number}',
+        'reference': payment.payment_number,
+        'lines': [
+            (_money_account(accounts, payment.payment_method), amount),
+            (accounts['receivable'], -amount),
+        ],
+    }
+
+
+def _expense_posting(expense, accounts):
+    """Category expense account and input VAT against cash, bank or payables"""
+    total = _cents(expense.total_amount)
+    vat = _cents(expense.vat_amount)
+    expense_account = (expense.category and expense.category.account_id) or accounts['expense']
+    if expense.payment_status == 'paid':
+        settled_from = _money_account(accounts, expense.payment_method)
+    else:
+        settled_from = accounts['payable']
+    return {
+        'date': expense.date,
+        'entry_type': 'expense',
+        'description': f'Expense {expense.expense_number} - {expense.description[:100]}',
+        'reference': expense.expense_number,
+        'lines': [
+            (expense_account, total - vat),
+            (accounts['vat_input'], vat),
+            (settled_from, -total),
+        ],
+    }
+
+
+def _stock_purchase_posting(purchase, accounts):
+    """Gas stock against payables; a purchase linked to an expense is posted by the expense"""
+    if purchase.expense_id:
+        return None
+    total = _cents(purchase.total_cost)
+    return {
+        'date': purchase.date,
+        'entry_type': 'expense',
+        'description': f'Stock purchase {purchase.purchase_number}',
+        'reference': purchase.purchase_number,
+        'lines': [
+            (accounts['inventory'], total),
+            (accounts['payable'], -total),
+        ],
+    }
+
+
+# Document kind -> (model label, select_related, JournalEntry link field, posting builder)
+DOCUMENT_KINDS = {
+    'invoice': ('core.Invoice', ['client'], 'invoice', _invoice_posting),
+    'payment': ('core.Payment', [], 'payment', _payment_posting),
+    'expense': ('core.Expense', ['category'], 'expense', _expense_posting),
+    'stock_purchase': ('core.StockPurchase', [], None, _stock_purchase_posting),
+}
+
+
+def posting_accounts():
+    """{role: AccountType id} for POSTING_ACCOUNTS"""
+    from ..models_tax_reporting import AccountType
+
+    ids = dict(AccountType.objects.filter(
+        code__in=POSTING_ACCOUNTS.values()
+    ).values_list('code', 'pk'))
+    missing = sorted(set(POSTING_ACCOUNTS.values()) - set(ids))
+    if missing:
+        raise ImproperlyConfigured(
+            f'Accounts {", ".join(missing)} are missing from the chart of accounts; '
+            f'run setup_chart_of_accounts'
+        )
+    return {role: ids[code] for role, code in POSTING_ACCOUNTS.items()}
+
+
+def posting_key(source, posting):
+    """Idempotency key of a document's posting: its source plus a digest of the date and lines"""
+    payload = posting['date'].isoformat() + ''.join(
+        f'|{account_id}:{amount:.2f}' for account_id, amount in posting['lines']
+    )
+    return f'{source}:{hashlib.sha1(payload.encode()).hexdigest()[:16]}'
+
+
+def post_documents(kind, pks):
+    """
+    Bring the automatic journal entries of some documents of one kind in
+    line with the documents, in one transaction. The documents are locked
+    while they are posted, so concurrent workers cannot post one twice.
+    Returns (posted, removed, skipped): the number of entries written and
+    deleted, and the pks of documents left alone in a closed tax period.
+    Raises ImproperlyConfigured if the chart of accounts is incomplete.
+    """
+    from ..models_accounting import JournalEntry
+    from ..models_ledger import AccountBalanceSnapshot, JournalLine
+    from ..models_period_close import locked_through
+    from ..models_sequence import DocumentSequence
+
+    label, related, link_field, build = DOCUMENT_KINDS[kind]
+    model = apps.get_model(label)
+    sources = {pk: f'{kind}:{pk}' for pk in pks}
+    accounts = posting_accounts()
+    closed_through = locked_through()
+
+    with transaction.atomic():
+        wanted = {}
+        for document in model.objects.select_for_update(of=('self',)).select_related(*related).filter(pk__in=pks):
+            posting = build(document, accounts)
+            if posting:
+                posting['lines'] = [(account_id, amount) for account_id, amount in posting['lines'] if amount]
+            if posting and posting['lines']:
+                wanted[document.pk] = posting
+
+        existing = defaultdict(list)
+        for entry in JournalEntry.objects.filter(source__in=sources.values()).values(
+            'pk', 'source', 'posting_key', 'date'
+        ):
+            existing[entry['source']].append(entry)
+
+        stale, new, skipped = [], [], []
+        for pk, source in sources.items():
+            posting = wanted.get(pk)
+            key = posting_key(source, posting) if posting else None
+            entries = existing.get(source, [])
+            old = [entry for entry in entries if entry['posting_key'] != key]
+            missing = posting is not None and len(old) == len(entries)
+            if not old and not missing:
+                continue
+            dates = [entry['date'] for entry in old] + ([posting['date']] if missing else [])
+            if closed_through and min(dates) <= closed_through:
+                skipped.append(pk)
+                continue
+            stale.extend(entry['pk'] for entry in old)
+            if missing:
+                new.append((pk, source, key, posting))
+
+        if stale:
+            # Deleted one by one through the signals, which invalidate the balance snapshots
+            JournalEntry.objects.filter(pk__in=stale).delete()
+
+        if new:
+            now = timezone.now()
+            entries = []
+            for (pk, source, key, posting), number in zip(new, DocumentSequence.reserve_numbers('JE', len(new))):
+                entry = JournalEntry(
+                    entry_number=number,
+                    date=posting['date'],
+                    entry_type=posting['entry_type'],
+                    description=posting['description'],
+                    reference=posting['reference'],
+                    source=source,
+                    posting_key=key,
+                    debit_amount=sum((amount for _, amount in posting['lines'] if amount > 0), ZERO),
+                    credit_amount=-sum((amount for _, amount in posting['lines'] if amount < 0), ZERO),
+                    status='posted',
+                    posted_at=now,
+                )
+                if link_field:
+                    setattr(entry, f'{link_field}_id', pk)
+                entries.append(entry)
+            entries = JournalEntry.objects.bulk_create(entries, batch_size=5000)
+
+            JournalLine.objects.bulk_create([
+                JournalLine(
+                    entry=entry,
+                    account_id=account_id,
+                    date=entry.date,
+                    debit=amount if amount > 0 else ZERO,
+                    credit=-amount if amount < 0 else ZERO,
+                )
+                for entry, (_, _, _, posting) in zip(entries, new)
+                for account_id, amount in posting['lines']
+            ], batch_size=5000)
+            # bulk_create skips the signals that invalidate balance snapshots
+            AccountBalanceSnapshot.invalidate(min(entry.date for entry in entries))
+
+    if skipped:
+        logger.warning(f'Skipped posting {kind} {skipped}: dated in a closed tax period')
+    return len(new), len(stale), skipped
+
+
+def document_kind(model):
+    """The DOCUMENT_KINDS key of a document model"""
+    for kind, (label, *_) in DOCUMENT_KINDS.items():
+        if label == model._meta.label:
+            return kind
+    raise KeyError(model._meta.label)
+
+
+def queue(kind, pks):
+    """Post some documents once the current transaction commits, each document once"""
+    from ..utils_transaction import defer
+
+    defer(f'posting:{kind}', pks, lambda keys: _dispatch(kind, sorted(keys)))
+
+
+def post_queued(kind, pks):
+    """
+    Post documents queued by queue(), on the worker or in-process. Without
+    a chart of accounts there is nothing to post to, so this warns and
+    leaves the documents for the backfill command.
+    """
+    try:
+        post_documents(kind, pks)
+    except ImproperlyConfigured as e:
+        logger.warning(f'Not posting {kind} {pks}: {e}')
+
+
+def _dispatch(kind, pks):
+    """Queue a posting task, or post here without a worker or if the broker cannot be reached"""
+    global _broker_down_until
+    from ..tasks import post_journal_entries
+
+    if settings.BACKGROUND_WORKER and time.monotonic() >= _broker_down_until:
+        try:
+            # Fail fast instead of retrying the broker connection during the request
+            post_journal_entries.apply_async((kind, pks), retry=False)
+            return
+        except Exception as e:
+            logger.warning(f'Could not queue {kind} journal posting, posting in-process: {e}')
+            _broker_down_until = time.monotonic() + BROKER_RETRY_SECONDS
+    try:
+        post_queued(kind, pks)
+    except Exception:
+        logger.exception(f'Posting journal entries for {kind} {pks} failed')
@@ -0,0 +1,44 @@
+"""
+Process pool helper shared by the bulk PDF jobs (statement runs and invoice
+PDF exports). ReportLab rendering is CPU bound, so batches are spread over
+worker processes instead of threads.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def _init_worker():
+    """Set up Django in pool processes that were spawned rather than forked"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def map_batches(func, batches, workers=None, ordered=False):
+    """
+    Yield func(*args) for each args tuple in batches.
+
+    Runs in a process pool of up to workers processes (PDF_WORKERS by
+    default, never more than the CPU count) when there is more than one batch
+    and more than one worker, otherwise in this process. Results come back as they finish,
+    or in batch order when ordered is set. func must be a module-level
+    function so it can be sent to the workers.
+    """
+    from django.conf import settings
+    workers = min(workers or settings.PDF_WORKERS, os.cpu_count() or 1)
+    # Celery prefork workers are daemonic and may not start child processes
+    if workers <= 1 or len(batches) <= 1 or multiprocessing.current_process().daemon:
+        for args in batches:
+            yield func(*args)
+        return
+
+    # Forked workers must open their own database connections
+    from django.db import connections
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(func, *args) for args in batches]
+        for future in (futures if ordered else as_completed(futures)):
+            yield future.result()
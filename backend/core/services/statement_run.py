@@ -0,0 +1,140 @@
+"""
+Bulk statement run.
+Renders month-end PDF statements for every client with activity in a period.
+Balances brought forward are computed up front in grouped queries, rendering
+is spread over a process pool in batches, and the PDFs are written to the
+default storage either as one zip archive or as one file per client.
+Used by the generate_statements management command and Celery task.
+"""
+import os
+import tempfile
+import zipfile
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+from .process_pool import map_batches
+from .statement_service import StatementService, ZERO
+
+
+OUTPUT_ZIP = 'zip'
+OUTPUT_FILES = 'files'
+OUTPUT_CHOICES = [OUTPUT_ZIP, OUTPUT_FILES]
+
+
+def _render_batch(start_date, end_date, batch):
+    """
+    Render one batch of statements in a worker process.
+    Returns (rendered, failed) as lists of (client_id, filename, pdf) and
+    (client_id, error) so one bad client does not sink the whole batch.
+    """
+    from ..models import Client
+    from ..pdf_generator import generate_client_statement_pdf
+
+    balances = dict(batch)
+    rendered, failed = [], []
+    for client in Client.objects.filter(pk__in=balances).order_by('pk'):
+        try:
+            pdf = generate_client_statement_pdf(
+                client, start_date, end_date, balance_bf=balances[client.pk]
+            )
+        except Exception as e:
+            failed.append((client.pk, str(e)))
+            continue
+        rendered.append((client.pk, statement_filename(client, start_date, end_date), pdf))
+    return rendered, failed
+
+
+def statement_filename(client, start_date, end_date):
+    """Same name as a single statement downloaded from the client page"""
+    return get_valid_filename(f'statement_{client.customer_id}_{start_date}_{end_date}.pdf')
+
+
+class StatementRun:
+    """
+    Month-end statement run over all active clients.
+
+    Usage:
+        result = StatementRun(start_date, end_date, output='zip').run()
+    """
+
+    def __init__(self, start_date, end_date, output=OUTPUT_ZIP, workers=None,
+                 batch_size=50, client_ids=None, progress=None):
+        if output not in OUTPUT_CHOICES:
+            raise ValueError(f'output must be one of {", ".join(OUTPUT_CHOICES)}')
+        self.start_date = start_date
+        self.end_date = end_date
+        self.output = output
+        self.workers = workers
+        self.batch_size = batch_size
+        self.client_ids = client_ids
+        # Called as progress(done, total) after every batch
+        self.progress = progress
+
+    @property
+    def directory(self):
+        return f'statements/{self.start_date}_{self.end_date}'
+
+    def _batches(self):
+        """Client ids with their precomputed balance brought forward, in batches"""
+        client_ids = self.client_ids
+        if client_ids is None:
+            client_ids = StatementService.active_client_ids(self.start_date, self.end_date)
+        balances = StatementService.bulk_balances_brought_forward(self.start_date)
+
+        items = [(client_id, balances.get(client_id, ZERO)) for client_id in sorted(client_ids)]
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    def run(self):
+        """Render and store every statement; returns a summary of the run"""
+        batches = self._batches()
+        total = sum(len(batch) for batch in batches)
+
+        result = {
+            'start_date': str(self.start_date),
+            'end_date': str(self.end_date),
+            'output': self.output,
+            'total': total,
+            'rendered': 0,
+            'failed': [],
+            'files': [],
+        }
+        if not total:
+            return result
+
+        archive = None
+        if self.output == OUTPUT_ZIP:
+            spool = tempfile.TemporaryFile()
+            archive = zipfile.ZipFile(spool, 'w', compression=zipfile.ZIP_DEFLATED)
+
+        done = 0
+        for rendered, failed in map_batches(
+            _render_batch,
+            [(self.start_date, self.end_date, batch) for batch in batches],
+            workers=self.workers,
+        ):
+            for client_id, filename, pdf in rendered:
+                if archive is not None:
+                    archive.writestr(filename, pdf)
+                else:
+                    result['files'].append(
+                        default_storage.save(f'{self.directory}/{filename}', ContentFile(pdf))
+                    )
+            result['rendered'] += len(rendered)
+            result['failed'].extend(
+                {'client_id': client_id, 'error': error} for client_id, error in failed
+            )
+            done += len(rendered) + len(failed)
+            if self.progress:
+                self.progress(done, total)
+
+        if archive is not None:
+            archive.close()
+            spool.seek(0)
+            name = f'{self.directory}/statements_{self.start_date}_{self.end_date}.zip'
+            result['files'].append(default_storage.save(name, File(spool, name=os.path.basename(name))))
+            spool.close()
+
+        return result
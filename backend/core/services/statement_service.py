@@ -0,0 +1,225 @@
+"""
+Client statement service.
+Builds the statement shared by the statement preview page, the statement
+PDF and the client statement API: the balance brought forward, the period's
+invoices, payments and credit notes in date order with a running balance,
+and an aging analysis of the client's open invoices.
+"""
+import heapq
+from datetime import date, timedelta
+from decimal import Decimal
+from operator import itemgetter
+
+from django.db.models import Q, Sum
+
+
+ZERO = Decimal('0.00')
+
+# Aging buckets in display order: key -> (min, max) days past the due date
+AGING_BUCKETS = {
+    'current': (None, 0),
+    'days_1_30': (1, 30),
+    'days_31_60': (31, 60),
+    'days_61_90': (61, 90),
+    'over_90': (91, None),
+}
+
+
+class StatementService:
+    """
+    Statement for one client over an optional date range.
+
+    Usage:
+        statement = StatementService(client, start_date, end_date).build()
+    """
+
+    def __init__(self, client, start_date=None, end_date=None, balance_bf=None):
+        self.client = client
+        self.start_date = start_date
+        self.end_date = end_date
+        # Precomputed by bulk_balances_brought_forward() for statement runs
+        self._balance_bf = balance_bf
+
+    # -- Bulk helpers for statement runs -------------------------------------
+
+    @staticmethod
+    def active_client_ids(start_date, end_date):
+        """Ids of clients with an invoice, payment or credit note in the period"""
+        from ..models import Invoice, Payment, CreditNote
+
+        client_ids = set(Invoice.objects.filter(
+            issue_date__gte=start_date, issue_date__lte=end_date
+        ).values_list('client_id', flat=True).distinct())
+        client_ids.update(CreditNote.objects.filter(
+            issue_date__gte=start_date, issue_date__lte=end_date
+        ).values_list('client_id', flat=True).distinct())
+        for invoice_client_id, client_id in Payment.objects.filter(
+            payment_date__gte=start_date, payment_date__lte=end_date
+        ).values_list('invoice__client_id', 'client_id').distinct():
+            client_ids.add(invoice_client_id or client_id)
+        client_ids.discard(None)
+        return client_ids
+
+    @staticmethod
+    def bulk_balances_brought_forward(start_date):
+        """
+        Balance brought forward for every client as {client_id: balance},
+        starting from the latest closed period's client balances so only
+        the open period is summed. Clients without earlier history are omitted.
+        """
+        from . import period_close
+
+        return period_close.balance_brought_forward(start_date)
+
+    # -- Sources -------------------------------------------------------------
+
+    def invoices(self):
+        from ..models import Invoice
+        return Invoice.objects.filter(client=self.client)
+
+    def payments(self):
+        """Payments against the client's invoices plus unallocated client payments"""
+        from ..models import Payment
+        return Payment.objects.filter(
+            Q(invoice__client=self.client) | Q(client=self.client, invoice__isnull=True)
+        )
+
+    def credit_notes(self):
+        from ..models import CreditNote
+        return CreditNote.objects.filter(client=self.client)
+
+    def _in_period(self, queryset, date_field):
+        if self.start_date:
+            queryset = queryset.filter(**{f"{date_field}__gte": self.start_date})
+        if self.end_date:
+            queryset = queryset.filter(**{f"{date_field}__lte": self.end_date})
+        return queryset
+
+    # -- Balance brought forward ---------------------------------------------
+
+    def balance_brought_forward(self):
+        """Invoices less payments and credit notes before the start date, from the last closed period on"""
+        if not self.start_date:
+            return ZERO
+        if self._balance_bf is not None:
+            return self._balance_bf
+
+        from . import period_close
+
+        return period_close.balance_brought_forward(
+            self.start_date, [self.client.pk]
+        ).get(self.client.pk, ZERO)
+
+    # -- Transactions --------------------------------------------------------
+
+    def _invoice_rows(self):
+        invoices = self._in_period(self.invoices(), 'issue_date').order_by('issue_date', 'pk')
+        for invoice in invoices.iterator():
+            yield {
+                'date': invoice.issue_date,
+                'type': 'invoice',
+                'description': 'Invoice',
+                'reference': invoice.invoice_number,
+                'debit': invoice.total_amount,
+                'credit': ZERO,
+                'object': invoice,
+            }
+
+    def _payment_rows(self):
+        payments = self._in_period(self.payments(), 'payment_date').select_related(
+            'invoice'
+        ).order_by('payment_date', 'pk')
+        for payment in payments.iterator():
+            yield {
+                'date': payment.payment_date,
+                'type': 'payment',
+                'description': f'Payment - {payment.get_payment_method_display()}',
+                'reference': payment.payment_number,
+                'debit': ZERO,
+                'credit': payment.amount,
+                'object': payment,
+            }
+
+    def _credit_note_rows(self):
+        credit_notes = self._in_period(self.credit_notes(), 'issue_date').select_related(
+            'invoice'
+        ).order_by('issue_date', 'pk')
+        for credit_note in credit_notes.iterator():
+            yield {
+                'date': credit_note.issue_date,
+                'type': 'credit_note',
+                'description': 'Credit Note',
+                'reference': credit_note.credit_note_number,
+                'debit': ZERO,
+                'credit': credit_note.total_amount,
+                'object': credit_note,
+            }
+
+    def transactions(self, balance_bf=ZERO):
+        """
+        The period's transactions in date order with a running balance.
+        Merges the three date-ordered streams instead of loading and sorting
+        them; on the same day invoices come before payments and credit notes.
+        """
+        running_balance = balance_bf
+        for row in heapq.merge(
+            self._invoice_rows(),
+            self._payment_rows(),
+            self._credit_note_rows(),
+            key=itemgetter('date'),
+        ):
+            running_balance += row['debit'] - row['credit']
+            row['balance'] = running_balance
+            yield row
+
+    # -- Aging ---------------------------------------------------------------
+
+    def aging(self, today=None):
+        """
+        Outstanding balances of the client's open invoices by days past due,
+        in one query. Invoices due today are current; overpaid invoices are
+        reported separately as credit.
+        """
+        today = today or date.today()
+        owing = Q(balance__gt=0)
+
+        buckets = {}
+        for key, (min_days, max_days) in AGING_BUCKETS.items():
+            condition = owing
+            if min_days is not None:
+                condition &= Q(due_date__lte=today - timedelta(days=min_days))
+            if max_days is not None:
+                condition &= Q(due_date__gte=today - timedelta(days=max_days))
+            buckets[key] = Sum('balance', filter=condition)
+
+        totals = self.invoices().exclude(
+            status__in=['paid', 'cancelled', 'draft']
+        ).aggregate(
+            credit=Sum('balance', filter=Q(balance__lt=0)),
+            **buckets
+        )
+
+        aging = {key: totals[key] or ZERO for key in AGING_BUCKETS}
+        aging['credit'] = abs(totals['credit'] or ZERO)
+        aging['total'] = sum(aging[key] for key in AGING_BUCKETS) - aging['credit']
+        return aging
+
+    # -- Statement -----------------------------------------------------------
+
+    def build(self, today=None):
+        """Complete statement data for rendering"""
+        balance_bf = self.balance_brought_forward()
+        transactions = list(self.transactions(balance_bf))
+        closing_balance = transactions[-1]['balance'] if transactions else balance_bf
+
+        return {
+            'client': self.client,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'balance_bf': balance_bf,
+            'transactions': transactions,
+            'total_debits': sum((row['debit'] for row in transactions), ZERO),
+            'total_credits': sum((row['credit'] for row in transactions), ZERO),
+            'closing_balance': closing_balance,
+            'aging': self.aging(today),
+        }
@@ -1,4 +1,5 @@
-from django.db.models.signals import pre_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, pre_delete, post_save, post_delete
 from django.dispatch import receiver
 
 
@@ -18,3 +19,340 @@ def reverse_loyalty_on_invoice_delete(sender, instance, **kwargs):
         card.stamps = max(0, card.stamps - 1)
         card.save()
         txn.delete()
+
+
+def _flush_client_stats(keys):
+    from .models import Invoice
+    from .models_analytics import ClientStats
+
+    client_ids = {pk for kind, pk in keys if kind == 'client'}
+    invoice_ids = [pk for kind, pk in keys if kind == 'invoice']
+    if invoice_ids:
+        client_ids.update(Invoice.objects.filter(pk__in=invoice_ids).values_list('client_id', flat=True))
+    ClientStats.refresh_many(client_ids - {None})
+
+
+def _refresh_client_stats(client_id=None, invoice_id=None):
+    """
+    Refresh a client's analytics snapshot, given directly or through one of
+    its invoices, once per transaction after it commits.
+    """
+    from .utils_transaction import defer
+
+    if client_id:
+        defer('client_stats', [('client', client_id)], _flush_client_stats)
+    elif invoice_id:
+        defer('client_stats', [('invoice', invoice_id)], _flush_client_stats)
+
+
+@receiver(post_save, sender='core.Invoice')
+@receiver(post_delete, sender='core.Invoice')
+def refresh_client_stats_for_invoice(sender, instance, **kwargs):
+    """Keep the client's analytics snapshot in step with its invoices."""
+    _refresh_client_stats(instance.client_id)
+
+
+@receiver(post_save, sender='core.InvoiceItem')
+@receiver(post_delete, sender='core.InvoiceItem')
+def refresh_client_stats_for_invoice_item(sender, instance, **kwargs):
+    """Invoice items change the client's favourite products."""
+    _refresh_client_stats(invoice_id=instance.invoice_id)
+
+
+@receiver(post_save, sender='core.Payment')
+@receiver(post_delete, sender='core.Payment')
+def refresh_client_stats_for_payment(sender, instance, **kwargs):
+    """Payments change the client's paid totals and payment rate."""
+    _refresh_client_stats(instance.client_id, instance.invoice_id)
+
+
+def _flush_sales_facts(keys):
+    from .models import Payment
+    from .models_analytics import DailySalesFact
+
+    dates = {day for kind, day in keys if kind == 'date'}
+    invoice_ids = [pk for kind, pk in keys if kind == 'invoice']
+    if invoice_ids:
+        dates.update(Payment.objects.filter(invoice_id__in=invoice_ids).values_list('payment_date', flat=True))
+    DailySalesFact.refresh_dates(dates)
+
+
+def _refresh_sales_facts(dates=(), invoice_id=None):
+    """
+    Rebuild the daily sales facts for some payment days, or for every day an
+    invoice was paid on, once per transaction after it commits.
+    """
+    from .utils_transaction import defer
+
+    keys = [('date', day) for day in dates if day]
+    if invoice_id:
+        keys.append(('invoice', invoice_id))
+    defer('sales_facts', keys, _flush_sales_facts)
+
+
+@receiver(pre_save, sender='core.Payment')
+def remember_previous_payment_date(sender, instance, **kwargs):
+    """Note the stored payment date so moving a payment refreshes both days."""
+    instance._previous_payment_date = None
+    if instance.pk:
+        instance._previous_payment_date = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('payment_date', flat=True).first()
+
+
+@receiver(post_save, sender='core.Payment')
+@receiver(post_delete, sender='core.Payment')
+def refresh_sales_facts_for_payment(sender, instance, **kwargs):
+    """Payments are the sales facts' amounts and counts."""
+    _refresh_sales_facts([instance.payment_date, getattr(instance, '_previous_payment_date', None)])
+
+
+@receiver(post_save, sender='core.InvoiceItem')
+@receiver(post_delete, sender='core.InvoiceItem')
+def refresh_sales_facts_for_invoice_item(sender, instance, **kwargs):
+    """Invoice lines count towards every day the invoice was paid on."""
+    _refresh_sales_facts(invoice_id=instance.invoice_id)
+
+
+@receiver(post_save, sender='core.CompanySettings')
+@receiver(post_delete, sender='core.CompanySettings')
+def invalidate_pdf_context_for_company_settings(sender, instance, **kwargs):
+    """PDFs print the company details, so drop this process's cached PDF context."""
+    from .pdf_generator import invalidate_pdf_context
+    invalidate_pdf_context()
+
+
+def _touch_document(kind, pk):
+    """
+    Bump a document's updated_at so its cached PDF fingerprint changes, and
+    clear the old cached PDFs once the transaction commits.
+    """
+    if not pk:
+        return
+    from django.utils import timezone
+    from .models import Invoice, Quote
+    from .services import pdf_cache
+
+    model = {'invoice': Invoice, 'quote': Quote}[kind]
+    model.objects.filter(pk=pk).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: pdf_cache.invalidate(kind, pk))
+
+
+@receiver(post_save, sender='core.InvoiceItem')
+@receiver(post_delete, sender='core.InvoiceItem')
+@receiver(post_save, sender='core.Payment')
+@receiver(post_delete, sender='core.Payment')
+@receiver(post_save, sender='core.CreditNote')
+@receiver(post_delete, sender='core.CreditNote')
+def touch_invoice_pdf(sender, instance, **kwargs):
+    """Items, payments and credit notes change what the invoice PDF shows."""
+    _touch_document('invoice', instance.invoice_id)
+
+
+@receiver(post_save, sender='core.QuoteItem')
+@receiver(post_delete, sender='core.QuoteItem')
+def touch_quote_pdf(sender, instance, **kwargs):
+    """Quote items change what the quote PDF shows."""
+    _touch_document('quote', instance.quote_id)
+
+
+@receiver(post_save, sender='core.Invoice')
+@receiver(post_delete, sender='core.Invoice')
+@receiver(post_save, sender='core.Quote')
+@receiver(post_delete, sender='core.Quote')
+def clear_cached_document_pdfs(sender, instance, **kwargs):
+    """Edited or deleted documents leave no superseded PDFs in the cache."""
+    from .services import pdf_cache
+    kind = sender._meta.model_name
+    # delete() clears instance.pk before the transaction commits
+    pk = instance.pk
+    transaction.on_commit(lambda: pdf_cache.invalidate(kind, pk))
+
+
+def _invalidate_balance_snapshots(dates):
+    """Month-end balance snapshots from the earliest changed day on are stale."""
+    dates = [day for day in dates if day]
+    if dates:
+        from .models_ledger import AccountBalanceSnapshot
+        AccountBalanceSnapshot.invalidate(min(dates))
+
+
+@receiver(pre_save, sender='core.JournalLine')
+@receiver(pre_save, sender='core.JournalEntry')
+def remember_previous_ledger_date(sender, instance, **kwargs):
+    """Note the stored date so moving an entry or line invalidates from the earlier day."""
+    instance._previous_ledger_date = None
+    if instance.pk:
+        instance._previous_ledger_date = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('date', flat=True).first()
+
+
+@receiver(post_save, sender='core.JournalLine')
+@receiver(post_delete, sender='core.JournalLine')
+@receiver(post_save, sender='core.JournalEntry')
+@receiver(post_delete, sender='core.JournalEntry')
+def invalidate_balance_snapshots(sender, instance, **kwargs):
+    """Journal lines and entry status changes move account balances."""
+    _invalidate_balance_snapshots([instance.date, getattr(instance, '_previous_ledger_date', None)])
+
+
+# Invoice fields a closed period freezes; payments may still settle the invoice
+CLOSED_INVOICE_FIELDS = ('issue_date', 'client_id', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount')
+
+
+def _check_period_open(label, *days):
+    from .models_period_close import check_period_open
+    check_period_open(label, *days)
+
+
+@receiver(post_save, sender='core.TaxPeriod')
+@receiver(post_delete, sender='core.TaxPeriod')
+def forget_locked_through(sender, instance, **kwargs):
+    """Closing or reopening a period changes which dates the lock checks refuse."""
+    from .models_period_close import LOCKED_THROUGH
+    from .utils_transaction import forget
+    forget(LOCKED_THROUGH)
+
+
+def _stored_date(sender, instance, field):
+    if not instance.pk:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender='core.Invoice')
+def lock_invoice_in_closed_period(sender, instance, **kwargs):
+    """Closed periods freeze their invoices' dates, clients and amounts."""
+    stored = None
+    # The same fields are what the invoice posts to the ledger (see post_invoice_journal)
+    instance._posting_changed = True
+    if instance.pk:
+        stored = sender.objects.filter(pk=instance.pk).values(*CLOSED_INVOICE_FIELDS).first()
+        if stored and all(stored[field] == getattr(instance, field) for field in CLOSED_INVOICE_FIELDS):
+            instance._posting_changed = False
+            return
+    _check_period_open(f'Invoice {instance.invoice_number}', instance.issue_date, stored and stored['issue_date'])
+
+
+@receiver(pre_delete, sender='core.Invoice')
+def lock_invoice_delete_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(f'Invoice {instance.invoice_number}', instance.issue_date)
+
+
+@receiver(pre_save, sender='core.InvoiceItem')
+@receiver(pre_delete, sender='core.InvoiceItem')
+def lock_invoice_item_in_closed_period(sender, instance, **kwargs):
+    invoice = instance.invoice
+    _check_period_open(f'Invoice {invoice.invoice_number}', invoice.issue_date)
+
+
+@receiver(pre_save, sender='core.CreditNoteItem')
+@receiver(pre_delete, sender='core.CreditNoteItem')
+def lock_credit_note_item_in_closed_period(sender, instance, **kwargs):
+    credit_note = instance.credit_note
+    _check_period_open(f'Credit note {credit_note.credit_note_number}', credit_note.issue_date)
+
+
+@receiver(pre_save, sender='core.Payment')
+@receiver(pre_delete, sender='core.Payment')
+def lock_payment_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(
+        f'Payment {instance.payment_number or ""}'.strip(),
+        instance.payment_date, _stored_date(sender, instance, 'payment_date'),
+    )
+
+
+@receiver(pre_save, sender='core.CreditNote')
+@receiver(pre_delete, sender='core.CreditNote')
+def lock_credit_note_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(
+        f'Credit note {instance.credit_note_number or ""}'.strip(),
+        instance.issue_date, _stored_date(sender, instance, 'issue_date'),
+    )
+
+
+@receiver(pre_save, sender='core.JournalEntry')
+@receiver(pre_delete, sender='core.JournalEntry')
+def lock_journal_entry_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(
+        f'Journal entry {instance.entry_number or ""}'.strip(),
+        instance.date, _stored_date(sender, instance, 'date'),
+    )
+
+
+@receiver(pre_save, sender='core.JournalLine')
+@receiver(pre_delete, sender='core.JournalLine')
+def lock_journal_line_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(
+        'Journal line',
+        instance.date or instance.entry.date, _stored_date(sender, instance, 'date'),
+    )
+
+
+@receiver(pre_delete, sender='core.StockMovement')
+def lock_stock_movement_delete_in_closed_period(sender, instance, **kwargs):
+    """Saves are checked in StockMovement.save, before stock levels change."""
+    _check_period_open(f'Stock movement {instance.movement_number}', instance.date)
+
+
+@receiver(pre_save, sender='core.Expense')
+@receiver(pre_delete, sender='core.Expense')
+def lock_expense_in_closed_period(sender, instance, **kwargs):
+    """Expenses post to the ledger, so closed periods freeze them too."""
+    _check_period_open(
+        f'Expense {instance.expense_number or ""}'.strip(),
+        instance.date, _stored_date(sender, instance, 'date'),
+    )
+
+
+@receiver(pre_save, sender='core.StockPurchase')
+@receiver(pre_delete, sender='core.StockPurchase')
+def lock_stock_purchase_in_closed_period(sender, instance, **kwargs):
+    _check_period_open(
+        f'Stock purchase {instance.purchase_number or ""}'.strip(),
+        instance.date, _stored_date(sender, instance, 'date'),
+    )
+
+
+def _queue_posting(kind, pk):
+    from .services import posting
+    posting.queue(kind, [pk])
+
+
+@receiver(post_save, sender='core.Invoice')
+def post_invoice_journal(sender, instance, **kwargs):
+    """
+    Invoices post once their date, client or amounts change, not on payment
+    status updates, unless they have no entry yet (e.g. saved before the
+    chart of accounts existed).
+    """
+    from .models_accounting import JournalEntry
+
+    if getattr(instance, '_posting_changed', True) or not JournalEntry.objects.filter(
+        source=f'invoice:{instance.pk}'
+    ).exists():
+        _queue_posting('invoice', instance.pk)
+
+
+@receiver(post_delete, sender='core.Invoice')
+def remove_invoice_journal(sender, instance, **kwargs):
+    _queue_posting('invoice', instance.pk)
+
+
+@receiver(post_save, sender='core.Payment')
+@receiver(post_delete, sender='core.Payment')
+def post_payment_journal(sender, instance, **kwargs):
+    _queue_posting('payment', instance.pk)
+
+
+@receiver(post_save, sender='core.Expense')
+@receiver(post_delete, sender='core.Expense')
+def post_expense_journal(sender, instance, **kwargs):
+    _queue_posting('expense', instance.pk)
+
+
+@receiver(post_save, sender='core.StockPurchase')
+@receiver(post_delete, sender='core.StockPurchase')
+def post_stock_purchase_journal(sender, instance, **kwargs):
+    _queue_posting('stock_purchase', instance.pk)
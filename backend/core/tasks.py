@@ -0,0 +1,55 @@
+"""
+Celery tasks for the core app.
+"""
+from datetime import date
+
+from celery import shared_task
+
+
+@shared_task(bind=True)
+def generate_statements(self, start_date, end_date, output='zip', workers=None, batch_size=50):
+    """
+    Month-end statement run in the background.
+    Dates are ISO strings; progress is reported as a PROGRESS state with
+    done/total in its meta, and the run summary is the task result.
+    """
+    from .services.statement_run import StatementRun
+
+    def progress(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    return StatementRun(
+        date.fromisoformat(start_date),
+        date.fromisoformat(end_date),
+        output=output,
+        workers=workers,
+        batch_size=batch_size,
+        progress=progress,
+    ).run()
+
+
+@shared_task(ignore_result=True)
+def match_reconciliation_batch(batch_id):
+    """
+    Match an uploaded bank statement's EFT lines against the open invoices.
+    Progress is stored on the batch, so no task result is kept.
+    """
+    from .views_eft_reconciliation import match_batch
+
+    match_batch(batch_id)
+
+
+@shared_task(ignore_result=True)
+def rebuild_ledger_snapshots():
+    """Write month-end account balance snapshots through the last complete month."""
+    from .models_ledger import AccountBalanceSnapshot
+
+    AccountBalanceSnapshot.rebuild()
+
+
+@shared_task(ignore_result=True)
+def post_journal_entries(kind, pks):
+    """Post the automatic journal entries of some saved or deleted documents of one kind."""
+    from .services import posting
+
+    posting.post_queued(kind, pks)
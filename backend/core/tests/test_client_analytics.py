@@ -0,0 +1,194 @@
+"""
+Client.get_analytics() against a straightforward Python computation over
+every invoice and item, and its query count, which must not grow with the
+client's history.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.models import Client, Invoice, InvoiceItem, Payment, Product
+from core.models_analytics import ClientStats
+
+
+def month_starts(today):
+    """First days of the last 12 calendar months, oldest first"""
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(12):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def python_analytics(client):
+    """The analytics figures computed in Python, one invoice and item at a time"""
+    today = date.today()
+    invoices = list(client.invoices.order_by('issue_date', 'id'))
+
+    total_spent = sum((invoice.total_amount for invoice in invoices), Decimal('0.00'))
+    total_paid = sum((invoice.paid_amount for invoice in invoices), Decimal('0.00'))
+    paid_invoices = sum(1 for invoice in invoices if invoice.status == 'paid')
+
+    product_stats = defaultdict(lambda: {'quantity': 0, 'total_spent': Decimal('0.00'), 'count': 0})
+    for invoice in invoices:
+        for item in invoice.items.all():
+            product_stats[item.product.name]['quantity'] += float(item.quantity)
+            product_stats[item.product.name]['total_spent'] += item.total
+            product_stats[item.product.name]['count'] += 1
+    favorite_products = sorted(
+        [{'name': name, **values} for name, values in product_stats.items()],
+        key=lambda product: product['quantity'],
+        reverse=True,
+    )[:5]
+
+    monthly_data = []
+    starts = month_starts(today)
+    for month_start, next_start in zip(starts, starts[1:] + [today + timedelta(days=1)]):
+        in_month = [invoice for invoice in invoices if month_start <= invoice.issue_date < next_start]
+        monthly_data.append({
+            'month': month_start.strftime('%b %Y'),
+            'total': float(sum(invoice.total_amount for invoice in in_month)),
+            'count': len(in_month),
+        })
+
+    invoice_dates = []
+    lead_times = []
+    previous_date = None
+    for invoice in invoices:
+        lead_time = (invoice.issue_date - previous_date).days if previous_date else None
+        if lead_time is not None:
+            lead_times.append(lead_time)
+        invoice_dates.append({
+            'date': invoice.issue_date.isoformat(),
+            'invoice_number': invoice.invoice_number,
+            'total': float(invoice.total_amount),
+            'status': invoice.status,
+            'lead_time': lead_time,
+        })
+        previous_date = invoice.issue_date
+
+    return {
+        'total_invoices': len(invoices),
+        'total_spent': total_spent,
+        'total_paid': total_paid,
+        'outstanding_balance': total_spent - total_paid,
+        'avg_order_value': (total_spent / len(invoices)).quantize(Decimal('0.01')) if invoices else Decimal('0.00'),
+        'last_order_date': invoices[-1].issue_date if invoices else None,
+        'favorite_products': favorite_products,
+        'monthly_data': monthly_data,
+        'payment_rate': round(paid_invoices / len(invoices) * 100, 1) if invoices else 0,
+        'invoice_dates': invoice_dates,
+        'avg_lead_time': round(sum(lead_times) / len(lead_times), 1) if lead_times else 0,
+        'min_lead_time': min(lead_times) if lead_times else 0,
+        'max_lead_time': max(lead_times) if lead_times else 0,
+    }
+
+
+class ClientAnalyticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_record = Client.objects.create(name='Acme Holdings', email='acme@example.com', phone='0210000000')
+        cls.products = [
+            Product.objects.create(name='9kg Gas', sku='GAS9', unit_price=Decimal('350.00')),
+            Product.objects.create(name='19kg Gas', sku='GAS19', unit_price=Decimal('690.00')),
+            Product.objects.create(name='48kg Gas', sku='GAS48', unit_price=Decimal('1650.00')),
+        ]
+        today = date.today()
+        # Today, earlier this year, and a year and more ago (outside the trend)
+        for days_ago, quantities in [(0, (1, 0, 2)), (9, (3, 1, 0)), (45, (2, 0, 0)), (45, (0, 4, 0)),
+                                     (130, (5, 0, 1)), (400, (1, 1, 1))]:
+            cls.add_invoice(today - timedelta(days=days_ago), quantities)
+        paid = Invoice.objects.filter(client=cls.client_record, issue_date__lt=today - timedelta(days=30))
+        paid.update(status='paid', paid_amount=F('total_amount'))
+        Invoice.objects.filter(client=cls.client_record, issue_date=today).update(
+            status='partially_paid', paid_amount=Decimal('100.00'),
+        )
+        ClientStats.refresh(cls.client_record.pk)
+
+    @classmethod
+    def add_invoice(cls, issue_date, quantities):
+        invoice = Invoice.objects.create(
+            client=cls.client_record, issue_date=issue_date, due_date=issue_date + timedelta(days=30),
+        )
+        for product, quantity in zip(cls.products, quantities):
+            if quantity:
+                InvoiceItem.objects.create(
+                    invoice=invoice, product=product, quantity=quantity,
+                    unit_price=product.unit_price, tax_rate=Decimal('15'),
+                )
+        invoice.refresh_from_db()
+        invoice.calculate_totals()
+        return invoice
+
+    def test_matches_python_computation(self):
+        analytics = self.client_record.get_analytics()
+        expected = python_analytics(self.client_record)
+
+        for key, value in expected.items():
+            if key == 'avg_lead_time':
+                self.assertAlmostEqual(analytics[key], value, places=1)
+            else:
+                self.assertEqual(analytics[key], value, key)
+
+    def test_query_count_does_not_grow_with_history(self):
+        client = Client.objects.get(pk=self.client_record.pk)
+        with self.assertNumQueries(4):
+            client.get_analytics()
+
+        for days_ago in range(200, 300, 10):
+            self.add_invoice(date.today() - timedelta(days=days_ago), (1, 1, 1))
+        ClientStats.refresh(self.client_record.pk)
+
+        client = Client.objects.get(pk=self.client_record.pk)
+        with self.assertNumQueries(4):
+            client.get_analytics()
+
+    def test_api_view_query_count(self):
+        user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(user)
+        url = reverse('accounting_forms:client_analytics_api', args=[self.client_record.pk])
+
+        # Session, user, client, then get_analytics()
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_invoices'], 6)
+
+
+
+class ClientStatsRefreshTests(TransactionTestCase):
+    """The snapshot refresh after a commit, which TestCase never reaches"""
+
+    @mock.patch('core.services.posting.queue')
+    def test_snapshot_refreshed_once_per_transaction(self, queue):
+        client = Client.objects.create(name='Acme Holdings', email='acme@example.com', phone='0210000000')
+        product = Product.objects.create(name='9kg Gas', sku='GAS9', unit_price=Decimal('350.00'))
+
+        with mock.patch.object(ClientStats, 'refresh_many', wraps=ClientStats.refresh_many) as refresh_many:
+            with transaction.atomic():
+                invoice = Invoice.objects.create(client=client, issue_date=date.today(), due_date=date.today())
+                for quantity in (1, 2, 3):
+                    InvoiceItem.objects.create(
+                        invoice=invoice, product=product, quantity=quantity,
+                        unit_price=product.unit_price, tax_rate=Decimal('15'),
+                    )
+                invoice.refresh_from_db()
+                invoice.calculate_totals()
+                Payment.objects.create(
+                    invoice=invoice, client=client, payment_date=date.today(),
+                    amount=Decimal('50.00'), payment_method='eft',
+                )
+
+        refresh_many.assert_called_once_with({client.pk})
+        stats = ClientStats.objects.get(client=client)
+        self.assertEqual(stats.total_invoices, 1)
+        self.assertEqual(stats.total_paid, Decimal('50.00'))
@@ -0,0 +1,77 @@
+"""
+DailySalesFact refreshes after a commit, and the backfill migration that
+fills the table on deploy.
+"""
+import importlib
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from core.models import Client, DailySalesFact, Invoice, InvoiceItem, Payment, Product
+
+
+backfill = importlib.import_module('core.migrations.0047_backfill_daily_sales_facts')
+
+
+def fact_rows(facts):
+    return sorted(
+        (fact.date, fact.payment_method, fact.product_id or 0, *(getattr(fact, field) for field in DailySalesFact.FACT_FIELDS))
+        for fact in facts
+    )
+
+
+@mock.patch('core.services.posting.queue')
+class DailySalesFactTests(TransactionTestCase):
+
+    def setUp(self):
+        self.client_record = Client.objects.create(name='Acme Holdings', phone='0210000000')
+        self.products = [
+            Product.objects.create(name='9kg Gas', sku='GAS9', unit_price=Decimal('350.00')),
+            Product.objects.create(name='19kg Gas', sku='GAS19', unit_price=Decimal('690.00')),
+        ]
+
+    def add_paid_invoice(self, payments):
+        with transaction.atomic():
+            invoice = Invoice.objects.create(
+                client=self.client_record, issue_date=date(2026, 3, 2), due_date=date(2026, 4, 2),
+            )
+            for quantity, product in enumerate(self.products, start=1):
+                InvoiceItem.objects.create(
+                    invoice=invoice, product=product, quantity=quantity,
+                    unit_price=product.unit_price, tax_rate=Decimal('15'),
+                )
+            invoice.refresh_from_db()
+            invoice.calculate_totals()
+            for payment_date, method in payments:
+                Payment.objects.create(
+                    invoice=invoice, client=self.client_record, payment_date=payment_date,
+                    amount=Decimal('100.00'), payment_method=method,
+                )
+        return invoice
+
+    def test_days_refreshed_once_per_transaction(self, queue):
+        with mock.patch.object(DailySalesFact, 'refresh_dates', wraps=DailySalesFact.refresh_dates) as refresh_dates:
+            self.add_paid_invoice([(date(2026, 3, 3), 'eft'), (date(2026, 3, 4), 'cash')])
+
+        refresh_dates.assert_called_once_with({date(2026, 3, 3), date(2026, 3, 4)})
+        self.assertEqual(
+            fact_rows(DailySalesFact.objects.all()),
+            fact_rows(DailySalesFact.compute(payment_date__gte=date(2026, 3, 1))),
+        )
+
+    def test_backfill_matches_rebuild(self, queue):
+        self.add_paid_invoice([(date(2026, 3, 3), 'eft'), (date(2026, 3, 4), 'cash')])
+        self.add_paid_invoice([(date(2026, 3, 3), 'eft')])
+        Payment.objects.create(
+            client=self.client_record, payment_date=date(2026, 3, 5), amount=Decimal('20.00'), payment_method='eft',
+        )
+        expected = fact_rows(DailySalesFact.compute(payment_date__gte=date(2026, 3, 1)))
+        DailySalesFact.objects.all().delete()
+
+        backfill.backfill_daily_sales_facts(apps, None)
+
+        self.assertEqual(fact_rows(DailySalesFact.objects.all()), expected)
@@ -0,0 +1,50 @@
+"""
+Starting EFT statement matching without a background worker, and recovering
+a batch that was queued but never picked up.
+"""
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import views_eft_reconciliation
+from core.models import ReconciliationBatch, ReconciliationLine
+
+
+class BatchMatchingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='secret')
+        self.client.force_login(self.user)
+        self.batch = ReconciliationBatch.objects.create(filename='statement.csv', created_by=self.user, total_lines=1)
+        ReconciliationLine.objects.create(
+            batch=self.batch, row_num=1, date=date(2026, 3, 3), amount=Decimal('100.00'), description='ACME PAYMENT',
+        )
+
+    @override_settings(BACKGROUND_WORKER=False)
+    def test_matched_in_process_without_worker(self):
+        with mock.patch('core.tasks.match_reconciliation_batch.apply_async') as apply_async:
+            views_eft_reconciliation.start_batch_matching(self.batch.pk)
+
+        apply_async.assert_not_called()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, 'ready')
+        self.assertEqual(self.batch.processed_lines, 1)
+
+    def test_recent_pending_batch_is_left_to_the_worker(self):
+        response = self.client.get(reverse('accounting_forms:eft_reconciliation_status', args=[self.batch.pk]))
+
+        self.assertEqual(response.json()['status'], 'pending')
+
+    def test_stalled_pending_batch_matched_on_poll(self):
+        stalled_at = timezone.now() - views_eft_reconciliation.PENDING_TIMEOUT * 2
+        ReconciliationBatch.objects.filter(pk=self.batch.pk).update(updated_at=stalled_at)
+
+        response = self.client.get(reverse('accounting_forms:eft_reconciliation_status', args=[self.batch.pk]))
+
+        self.assertEqual(response.json()['status'], 'ready')
+        self.assertEqual(response.json()['processed'], 1)
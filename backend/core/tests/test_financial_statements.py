@@ -0,0 +1,153 @@
+"""
+Grouped balance sheet and income statement figures against per-account
+ledger balances summed by subcategory, with and without month-end balance
+snapshots, and the CIPC and SARS return helpers built on them.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import (
+    AccountBalanceSnapshot, AccountType, CIPCAnnualReturn, JournalEntry, JournalLine, SARSTaxReturn,
+)
+from core.services import financial_statements, ledger
+
+
+CURRENT = (date(2032, 3, 1), date(2033, 2, 28))
+COMPARATIVE = (date(2031, 3, 1), date(2032, 2, 29))
+
+# code, category, subcategory, is_active
+ACCOUNTS = [
+    ('T-A1', 'asset', 'current_asset', True),
+    ('T-A2', 'asset', 'fixed_asset', True),
+    ('T-L1', 'liability', 'current_liability', True),
+    ('T-L2', 'liability', 'long_term_liability', True),
+    ('T-E1', 'equity', 'capital', True),
+    ('T-E2', 'equity', 'drawings', True),
+    ('T-R1', 'revenue', 'sales_revenue', True),
+    ('T-R2', 'revenue', 'other_income', True),
+    ('T-X1', 'expense', 'cost_of_sales', True),
+    ('T-X2', 'expense', 'operating_expense', True),
+    ('T-X3', 'expense', 'finance_cost', True),
+    ('T-X4', 'expense', 'administrative_expense', False),
+]
+
+# date, debit account, credit account, amount, status
+ENTRIES = [
+    (date(2031, 3, 1), 'T-A1', 'T-E1', '100000.00', 'posted'),
+    (date(2031, 4, 15), 'T-A2', 'T-L2', '40000.00', 'posted'),
+    (date(2031, 6, 30), 'T-A1', 'T-R1', '12500.50', 'posted'),
+    (date(2031, 7, 10), 'T-X1', 'T-A1', '6200.25', 'posted'),
+    (date(2031, 11, 5), 'T-X2', 'T-L1', '850.00', 'posted'),
+    (date(2032, 2, 29), 'T-A1', 'T-R2', '300.00', 'posted'),
+    (date(2032, 3, 1), 'T-A1', 'T-R1', '15000.00', 'posted'),
+    (date(2032, 5, 20), 'T-X3', 'T-A1', '410.10', 'posted'),
+    (date(2032, 8, 31), 'T-X4', 'T-A1', '999.99', 'posted'),
+    (date(2032, 9, 1), 'T-X2', 'T-A1', '1200.00', 'draft'),
+    (date(2033, 2, 28), 'T-E2', 'T-A1', '5000.00', 'posted'),
+    (date(2033, 3, 1), 'T-A1', 'T-R1', '777.77', 'posted'),
+]
+
+TOTAL_LINES = {
+    'assets': ('total_assets', 'asset'),
+    'liabilities': ('total_liabilities', 'liability'),
+    'equity': ('total_equity', 'equity'),
+    'revenue': ('total_revenue', 'revenue'),
+    'expenses': ('total_expenses', 'expense'),
+}
+
+
+def per_account(start_date, end_date, statement_lines):
+    """Every statement line and category total from per-account ledger balances"""
+    accounts = list(AccountType.objects.filter(is_active=True))
+    balances = ledger.account_balances(accounts, start_date, end_date)
+    figures = {}
+    for section, lines in statement_lines.items():
+        for line, group in lines.items():
+            figures[(section, line)] = sum(
+                (balances[a.pk] for a in accounts if (a.category, a.subcategory) == group), Decimal('0.00'),
+            )
+        total_line, category = TOTAL_LINES[section]
+        figures[(section, total_line)] = sum(
+            (balances[a.pk] for a in accounts if a.category == category), Decimal('0.00'),
+        )
+    return figures
+
+
+def built_figures(data, statement_lines):
+    return {
+        (section, line): data[section][line]
+        for section, lines in statement_lines.items()
+        for line in (*lines, TOTAL_LINES[section][0])
+    }
+
+
+class FinancialStatementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        accounts = {
+            code: AccountType.objects.create(
+                code=code, name=code, category=category, subcategory=subcategory, is_active=is_active,
+            )
+            for code, category, subcategory, is_active in ACCOUNTS
+        }
+        for i, (day, debit_code, credit_code, amount, status) in enumerate(ENTRIES):
+            entry = JournalEntry.objects.create(
+                entry_number=f'TEST-JE-{i:03d}', date=day, entry_type='adjustment',
+                description='Test entry', status=status,
+            )
+            JournalLine.objects.bulk_create([
+                JournalLine(entry=entry, account=accounts[debit_code], date=day, debit=Decimal(amount)),
+                JournalLine(entry=entry, account=accounts[credit_code], date=day, credit=Decimal(amount)),
+            ])
+
+    def assert_match_per_account(self):
+        balance_sheet = financial_statements.balance_sheet(CURRENT[1], COMPARATIVE[1])
+        income = financial_statements.income_statement(*CURRENT, *COMPARATIVE)
+        for period, bs_data, is_data, (start_date, end_date) in zip(
+            ('current', 'comparative'), balance_sheet, income, (CURRENT, COMPARATIVE),
+        ):
+            with self.subTest(period=period):
+                self.assertEqual(
+                    built_figures(bs_data, financial_statements.BALANCE_SHEET_LINES),
+                    per_account(None, end_date, financial_statements.BALANCE_SHEET_LINES),
+                )
+                self.assertEqual(
+                    built_figures(is_data, financial_statements.INCOME_STATEMENT_LINES),
+                    per_account(start_date, end_date, financial_statements.INCOME_STATEMENT_LINES),
+                )
+
+    def test_figures_match_per_account_balances(self):
+        self.assert_match_per_account()
+
+    def test_figures_match_per_account_balances_from_snapshots(self):
+        AccountBalanceSnapshot.rebuild(date(2032, 12, 31))
+        self.assertTrue(AccountBalanceSnapshot.objects.exists())
+
+        self.assert_match_per_account()
+
+    def test_income_statement_figures(self):
+        income, comparative = financial_statements.income_statement(*CURRENT, *COMPARATIVE)
+
+        # Draft entries, inactive accounts and lines outside the period are left out
+        self.assertEqual(income['revenue']['total_revenue'], Decimal('15000.00'))
+        self.assertEqual(income['expenses']['total_expenses'], Decimal('410.10'))
+        self.assertEqual(income['profit']['net_profit'], Decimal('14589.90'))
+        self.assertEqual(comparative['revenue']['total_revenue'], Decimal('12800.50'))
+        self.assertEqual(comparative['profit']['gross_profit'], Decimal('6600.25'))
+        self.assertEqual(comparative['profit']['net_profit'], Decimal('5750.25'))
+
+    def test_returns_populated_without_saving(self):
+        tax_return = SARSTaxReturn(tax_year_start=CURRENT[0], tax_year_end=CURRENT[1], assessment_year=2033)
+        tax_return.populate_from_financial_statements()
+        cipc_return = CIPCAnnualReturn(financial_year_end=CURRENT[1], filing_year=2033)
+        cipc_return.populate_from_financial_statements()
+
+        self.assertIsNone(tax_return.pk)
+        self.assertIsNone(cipc_return.pk)
+        self.assertEqual(tax_return.gross_income, Decimal('15000.00'))
+        self.assertEqual(tax_return.interest_expense, Decimal('410.10'))
+        self.assertEqual(cipc_return.total_revenue, Decimal('15000.00'))
+        self.assertEqual(cipc_return.profit_loss, Decimal('14589.90'))
@@ -0,0 +1,152 @@
+"""
+Account ledger pages and month-end balance snapshots: running balances
+across page boundaries, snapshots invalidated by a backdated line, and
+rebuild() against a full recompute from the journal lines.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase, TransactionTestCase
+
+from core.models import AccountBalanceSnapshot, AccountType, JournalEntry, JournalLine
+from core.services import ledger
+
+
+# date, debit, credit, status of each line on the bank account
+BANK_LINES = [
+    (date(2031, 1, 5), '1000.00', '0', 'posted'),
+    (date(2031, 1, 5), '0', '120.40', 'posted'),
+    (date(2031, 1, 5), '35.00', '0', 'posted'),
+    (date(2031, 1, 28), '0', '500.00', 'draft'),
+    (date(2031, 2, 3), '250.25', '0', 'posted'),
+    (date(2031, 2, 3), '0', '80.00', 'posted'),
+    (date(2031, 3, 17), '0', '60.10', 'posted'),
+    (date(2031, 3, 31), '410.00', '0', 'posted'),
+    (date(2031, 4, 2), '0', '999.99', 'posted'),
+]
+
+
+def add_lines(bank, other, rows, prefix='TEST-JE'):
+    """One balanced entry per row, bank taking the row's side"""
+    start = JournalEntry.objects.count()
+    for i, (day, debit, credit, status) in enumerate(rows, start=start):
+        entry = JournalEntry.objects.create(
+            entry_number=f'{prefix}-{i:03d}', date=day, entry_type='adjustment',
+            description='Test entry', status=status,
+        )
+        JournalLine.objects.create(entry=entry, account=bank, date=day, debit=Decimal(debit), credit=Decimal(credit))
+        JournalLine.objects.create(entry=entry, account=other, date=day, debit=Decimal(credit), credit=Decimal(debit))
+
+
+def create_accounts():
+    bank = AccountType.objects.create(code='T-1000', name='Bank', category='asset', subcategory='current_asset')
+    sales = AccountType.objects.create(code='T-4000', name='Sales', category='revenue', subcategory='sales_revenue')
+    return bank, sales
+
+
+def recomputed_totals(through):
+    """{account_id: [debit, credit]} of every posted line through a date"""
+    totals = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+    for line in JournalLine.objects.filter(entry__status='posted', date__lte=through):
+        totals[line.account_id][0] += line.debit
+        totals[line.account_id][1] += line.credit
+    return dict(totals)
+
+
+def snapshot_totals(month):
+    return {
+        snapshot.account_id: [snapshot.debit_total, snapshot.credit_total]
+        for snapshot in AccountBalanceSnapshot.objects.filter(month=month)
+    }
+
+
+class LedgerPageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bank, cls.sales = create_accounts()
+        add_lines(cls.bank, cls.sales, BANK_LINES)
+
+    def expected_running_balances(self, account, start_date=None):
+        balance = Decimal('0.00')
+        expected = []
+        for line in JournalLine.objects.filter(account=account, entry__status='posted').order_by('date', 'id'):
+            balance += ledger.signed_balance(account.category, line.debit, line.credit)
+            if not start_date or line.date >= start_date:
+                expected.append((line.pk, balance))
+        return expected
+
+    def all_pages(self, account, start_date=None, limit=2):
+        rows = []
+        after = None
+        while True:
+            _, lines, after = ledger.ledger_page(account, start_date=start_date, after=after, limit=limit)
+            rows.extend((line.pk, line.running_balance) for line in lines)
+            if after is None:
+                return rows
+
+    def test_running_balance_carried_across_pages(self):
+        for account in (self.bank, self.sales):
+            for start_date in (None, date(2031, 2, 1)):
+                with self.subTest(account=account.code, start_date=start_date):
+                    self.assertEqual(
+                        self.all_pages(account, start_date),
+                        self.expected_running_balances(account, start_date),
+                    )
+
+    def test_running_balance_carried_across_pages_from_snapshots(self):
+        AccountBalanceSnapshot.rebuild(date(2031, 3, 31))
+
+        for limit in (1, 2, 3):
+            with self.subTest(limit=limit):
+                self.assertEqual(
+                    self.all_pages(self.bank, limit=limit),
+                    self.expected_running_balances(self.bank),
+                )
+
+    def test_page_boundary_inside_a_day(self):
+        # The first two of the three lines dated 5 January end the page
+        opening, lines, after = ledger.ledger_page(self.bank, limit=2)
+        self.assertEqual(opening, Decimal('0.00'))
+        self.assertEqual(after, (date(2031, 1, 5), lines[-1].pk))
+
+        opening, lines, _ = ledger.ledger_page(self.bank, after=after, limit=2)
+        self.assertEqual(opening, Decimal('879.60'))
+        self.assertEqual([line.running_balance for line in lines], [Decimal('914.60'), Decimal('1164.85')])
+
+
+class BalanceSnapshotTests(TransactionTestCase):
+
+    def setUp(self):
+        self.bank, self.sales = create_accounts()
+        add_lines(self.bank, self.sales, BANK_LINES)
+
+    def test_rebuild_matches_full_recompute(self):
+        # Built in two steps, continuing from the latest snapshot
+        AccountBalanceSnapshot.rebuild(date(2031, 2, 28))
+        AccountBalanceSnapshot.rebuild(date(2031, 4, 30))
+
+        for month in (date(2031, 1, 31), date(2031, 2, 28), date(2031, 3, 31), date(2031, 4, 30)):
+            with self.subTest(month=month):
+                self.assertEqual(snapshot_totals(month), recomputed_totals(month))
+
+    def test_backdated_line_invalidates_later_snapshots(self):
+        AccountBalanceSnapshot.rebuild(date(2031, 4, 30))
+
+        add_lines(self.bank, self.sales, [(date(2031, 2, 10), '12.34', '0', 'posted')], prefix='TEST-LATE')
+
+        self.assertEqual(
+            list(AccountBalanceSnapshot.objects.order_by('month').values_list('month', flat=True).distinct()),
+            [date(2031, 1, 31)],
+        )
+        for as_of in (date(2031, 2, 10), date(2031, 3, 31), date(2031, 4, 30)):
+            with self.subTest(as_of=as_of):
+                self.assertEqual(
+                    {account_id: list(totals) for account_id, totals in ledger.cumulative_totals(as_of).items()},
+                    recomputed_totals(as_of),
+                )
+
+        AccountBalanceSnapshot.rebuild(date(2031, 4, 30))
+        self.assertEqual(snapshot_totals(date(2031, 3, 31)), recomputed_totals(date(2031, 3, 31)))
+        self.assertEqual(snapshot_totals(date(2031, 4, 30)), recomputed_totals(date(2031, 4, 30)))
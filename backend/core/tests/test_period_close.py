@@ -0,0 +1,130 @@
+"""
+Closing and reopening TaxPeriods: the lock on records dated in a closed
+period, the closing balances written at its end, and the closed-period
+lookup shared by every lock check in a transaction.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    AccountBalanceSnapshot, AccountType, Client, Invoice, InvoiceItem, JournalEntry, JournalLine,
+    Payment, PeriodClosedError, Product, TaxPeriod,
+)
+from core.services import period_close
+
+
+class PeriodCloseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_record = Client.objects.create(name='Acme Holdings', phone='0210000000')
+        cls.other_client = Client.objects.create(name='Bay Traders', phone='0210000001')
+        cls.product = Product.objects.create(name='9kg Gas', sku='GAS9', unit_price=Decimal('350.00'))
+        cls.period = TaxPeriod.objects.create(
+            name='January 2031', period_type='monthly', start_date=date(2031, 1, 1), end_date=date(2031, 1, 31),
+        )
+
+        cls.invoice = cls.add_invoice(cls.client_record, date(2031, 1, 10), quantity=2)
+        cls.add_invoice(cls.other_client, date(2031, 1, 20), quantity=1)
+        cls.add_invoice(cls.client_record, date(2031, 2, 3), quantity=4)
+        Payment.objects.create(
+            invoice=cls.invoice, client=cls.client_record, payment_date=date(2031, 1, 15),
+            amount=Decimal('300.00'), payment_method='eft',
+        )
+
+        bank = AccountType.objects.create(code='T-1000', name='Bank', category='asset', subcategory='current_asset')
+        sales = AccountType.objects.create(code='T-4000', name='Sales', category='revenue', subcategory='sales_revenue')
+        for i, (day, amount, status) in enumerate([
+            (date(2031, 1, 5), '1000.00', 'posted'),
+            (date(2031, 1, 31), '250.50', 'posted'),
+            (date(2031, 1, 12), '75.00', 'draft'),
+            (date(2031, 2, 1), '400.00', 'posted'),
+        ]):
+            entry = JournalEntry.objects.create(
+                entry_number=f'TEST-JE-{i:03d}', date=day, entry_type='adjustment',
+                description='Test entry', status=status,
+            )
+            JournalLine.objects.create(entry=entry, account=bank, date=day, debit=Decimal(amount))
+            JournalLine.objects.create(entry=entry, account=sales, date=day, credit=Decimal(amount))
+
+    @classmethod
+    def add_invoice(cls, client, issue_date, quantity):
+        invoice = Invoice.objects.create(client=client, issue_date=issue_date, due_date=issue_date)
+        InvoiceItem.objects.create(
+            invoice=invoice, product=cls.product, quantity=quantity,
+            unit_price=cls.product.unit_price, tax_rate=Decimal('15'),
+        )
+        invoice.refresh_from_db()
+        invoice.calculate_totals()
+        return invoice
+
+    def test_save_in_closed_period_refused_until_reopened(self):
+        period_close.close_period(self.period)
+
+        self.invoice.refresh_from_db()
+        self.invoice.issue_date = date(2031, 1, 11)
+        with self.assertRaises(PeriodClosedError):
+            self.invoice.save()
+        with self.assertRaises(PeriodClosedError):
+            Payment.objects.create(
+                client=self.client_record, payment_date=date(2031, 1, 31),
+                amount=Decimal('10.00'), payment_method='cash',
+            )
+        # The open period after it is not locked
+        Payment.objects.create(
+            client=self.client_record, payment_date=date(2031, 2, 1), amount=Decimal('10.00'), payment_method='cash',
+        )
+
+        period_close.reopen_period(self.period)
+
+        self.invoice.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.issue_date, date(2031, 1, 11))
+
+    def test_closing_balances_match_ledger(self):
+        period_close.close_period(self.period)
+
+        expected_accounts = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+        for line in JournalLine.objects.filter(entry__status='posted', date__lte=self.period.end_date):
+            expected_accounts[line.account_id][0] += line.debit
+            expected_accounts[line.account_id][1] += line.credit
+        self.assertEqual(
+            {
+                snapshot.account_id: [snapshot.debit_total, snapshot.credit_total]
+                for snapshot in AccountBalanceSnapshot.objects.filter(period=self.period, month=self.period.end_date)
+            },
+            dict(expected_accounts),
+        )
+
+        expected_clients = defaultdict(lambda: Decimal('0.00'))
+        for invoice in Invoice.objects.filter(issue_date__lte=self.period.end_date):
+            expected_clients[invoice.client_id] += invoice.total_amount
+        for payment in Payment.objects.filter(payment_date__lte=self.period.end_date):
+            expected_clients[payment.client_id] -= payment.amount
+        self.assertEqual(
+            dict(self.period.client_balances.values_list('client_id', 'balance')),
+            dict(expected_clients),
+        )
+        # Later balances start from the closing balances plus the open period
+        self.assertEqual(
+            period_close.client_balances(date(2031, 2, 28))[self.client_record.pk],
+            expected_clients[self.client_record.pk] + Invoice.objects.get(issue_date=date(2031, 2, 3)).total_amount,
+        )
+
+    def test_closed_period_looked_up_once_per_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.add_invoice(self.client_record, date(2031, 3, 2), quantity=3)
+            self.add_invoice(self.client_record, date(2031, 3, 3), quantity=1)
+
+        period_queries = [query for query in queries if 'core_taxperiod' in query['sql']]
+        self.assertLessEqual(len(period_queries), 1)
+
+        # Closing a period inside the transaction is seen by the next check
+        period_close.close_period(self.period)
+        with self.assertRaises(PeriodClosedError):
+            self.add_invoice(self.client_record, date(2031, 1, 25), quantity=1)
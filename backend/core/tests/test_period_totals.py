@@ -0,0 +1,130 @@
+"""
+period_totals sales and purchase totals, and the VAT return and tax period
+totals built from them, against Python sums over every invoice and expense.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import Client, Expense, ExpenseCategory, Invoice, TaxPeriod, VATReturn
+from core.services import period_totals
+
+
+START = date(2031, 1, 1)
+PERIODS = [
+    (date(2031, 1, 1), date(2031, 1, 31)),
+    (date(2031, 2, 1), date(2031, 2, 28)),
+    (date(2031, 3, 1), date(2031, 3, 31)),
+    (date(2031, 1, 1), date(2031, 3, 31)),
+]
+
+
+def python_sales(start_date, end_date, statuses):
+    invoices = Invoice.objects.filter(issue_date__gte=start_date, issue_date__lte=end_date, status__in=statuses)
+    return {
+        'total': sum((invoice.total_amount for invoice in invoices), Decimal('0.00')),
+        'tax': sum((invoice.tax_amount for invoice in invoices), Decimal('0.00')),
+    }
+
+
+def python_purchases(start_date, end_date, payment_statuses):
+    expenses = Expense.objects.filter(date__gte=start_date, date__lte=end_date, payment_status__in=payment_statuses)
+    capital = expenses.filter(category__name__icontains='capital')
+    other = expenses.exclude(category__name__icontains='capital')
+    return {
+        'total': sum((expense.total_amount for expense in expenses), Decimal('0.00')),
+        'tax': sum((expense.vat_amount for expense in expenses), Decimal('0.00')),
+        'capital_tax': sum((expense.vat_amount for expense in capital), Decimal('0.00')),
+        'other_tax': sum((expense.vat_amount for expense in other), Decimal('0.00')),
+    }
+
+
+class PeriodTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        client = Client.objects.create(name='Acme Holdings', phone='0210000000')
+        categories = [
+            ExpenseCategory.objects.create(name='Capital Equipment'),
+            ExpenseCategory.objects.create(name='capital works'),
+            ExpenseCategory.objects.create(name='Fuel'),
+            None,
+        ]
+
+        invoices = []
+        for i in range(400):
+            total = Decimal(rng.randint(5000, 500000)) / 100
+            tax = (total - total / Decimal('1.15')).quantize(Decimal('0.01'))
+            # A few days either side of the quarter, which no period may count
+            issue_date = START + timedelta(days=rng.randrange(-5, 95))
+            invoices.append(Invoice(
+                invoice_number=f'TEST-{i:06d}', client=client, issue_date=issue_date, due_date=issue_date,
+                status=rng.choice(['unpaid', 'partially_paid', 'paid']),
+                subtotal=total - tax, tax_amount=tax, total_amount=total,
+            ))
+        Invoice.objects.bulk_create(invoices)
+
+        expenses = []
+        for i in range(200):
+            total = Decimal(rng.randint(1000, 200000)) / 100
+            vat = (total - total / Decimal('1.15')).quantize(Decimal('0.01'))
+            expenses.append(Expense(
+                expense_number=f'TEST-EXP-{i:06d}', date=START + timedelta(days=rng.randrange(-5, 95)),
+                category=rng.choice(categories), description='Test expense',
+                subtotal=total - vat, vat_amount=vat, vat_rate=Decimal('15'), total_amount=total,
+                payment_status=rng.choice(['pending', 'paid', 'partial']),
+            ))
+        Expense.objects.bulk_create(expenses)
+
+    def test_sales_totals_match_python_sums(self):
+        for start_date, end_date in PERIODS:
+            for statuses in (['paid', 'partially_paid'], ['paid', 'partially_paid', 'sent']):
+                with self.subTest(start=start_date, end=end_date, statuses=statuses):
+                    self.assertEqual(
+                        period_totals.sales_totals(start_date, end_date, statuses),
+                        python_sales(start_date, end_date, statuses),
+                    )
+
+    def test_purchase_totals_match_python_sums(self):
+        for start_date, end_date in PERIODS:
+            for statuses in (['paid'], ['paid', 'partial']):
+                with self.subTest(start=start_date, end=end_date, statuses=statuses):
+                    self.assertEqual(
+                        period_totals.purchase_totals(start_date, end_date, statuses),
+                        python_purchases(start_date, end_date, statuses),
+                    )
+
+    def test_empty_period_totals_are_zero(self):
+        self.assertEqual(
+            period_totals.sales_totals(date(2030, 1, 1), date(2030, 1, 31), ['paid']),
+            {'total': Decimal('0.00'), 'tax': Decimal('0.00')},
+        )
+        self.assertEqual(
+            period_totals.purchase_totals(date(2030, 1, 1), date(2030, 1, 31), ['paid'])['other_tax'],
+            Decimal('0.00'),
+        )
+
+    def test_vat_return_and_tax_period_totals(self):
+        for start_date, end_date in PERIODS:
+            with self.subTest(start=start_date, end=end_date):
+                vat_return = VATReturn(period_start=start_date, period_end=end_date, filing_period='TEST')
+                vat_return.calculate_vat()
+                sales = python_sales(start_date, end_date, ['paid', 'partially_paid', 'sent'])
+                purchases = python_purchases(start_date, end_date, ['paid', 'partial'])
+                self.assertEqual(vat_return.box1_output_tax, sales['tax'])
+                self.assertEqual(vat_return.total_sales_incl_vat, sales['total'])
+                self.assertEqual(vat_return.box4_capital_goods, purchases['capital_tax'])
+                self.assertEqual(vat_return.box5_other_input_tax, purchases['other_tax'])
+                self.assertEqual(vat_return.total_purchases_incl_vat, purchases['total'])
+
+                tax_period = TaxPeriod(name='Test', period_type='monthly', start_date=start_date, end_date=end_date)
+                tax_period.calculate_totals()
+                sales = python_sales(start_date, end_date, ['paid', 'partially_paid'])
+                purchases = python_purchases(start_date, end_date, ['paid'])
+                self.assertEqual(tax_period.total_income, sales['total'])
+                self.assertEqual(tax_period.output_vat, sales['tax'])
+                self.assertEqual(tax_period.total_expenses, purchases['total'])
+                self.assertEqual(tax_period.input_vat, purchases['tax'])
@@ -0,0 +1,53 @@
+"""
+Automatic journal posting after a commit: without a background worker the
+documents are posted in-process, each once per transaction.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from core.models import Client, Invoice, InvoiceItem, JournalEntry, Payment, Product
+from core.services import posting
+
+
+@override_settings(BACKGROUND_WORKER=False)
+class PostingDispatchTests(TransactionTestCase):
+
+    def setUp(self):
+        call_command('setup_chart_of_accounts', stdout=StringIO())
+        self.client_record = Client.objects.create(name='Acme Holdings', phone='0210000000')
+        self.product = Product.objects.create(name='9kg Gas', sku='GAS9', unit_price=Decimal('350.00'))
+
+    def test_documents_posted_in_process_once_per_transaction(self):
+        with mock.patch('core.tasks.post_journal_entries.apply_async') as apply_async, \
+                mock.patch.object(posting, 'post_documents', wraps=posting.post_documents) as post_documents:
+            with transaction.atomic():
+                invoice = Invoice.objects.create(
+                    client=self.client_record, issue_date=date(2026, 3, 2), due_date=date(2026, 4, 2),
+                )
+                for quantity in (1, 2, 3):
+                    InvoiceItem.objects.create(
+                        invoice=invoice, product=self.product, quantity=quantity,
+                        unit_price=self.product.unit_price, tax_rate=Decimal('15'),
+                    )
+                invoice.refresh_from_db()
+                invoice.calculate_totals()
+                payment = Payment.objects.create(
+                    invoice=invoice, client=self.client_record, payment_date=date(2026, 3, 3),
+                    amount=Decimal('100.00'), payment_method='eft',
+                )
+
+        apply_async.assert_not_called()
+        self.assertEqual(
+            sorted(call.args for call in post_documents.call_args_list),
+            [('invoice', [invoice.pk]), ('payment', [payment.pk])],
+        )
+        self.assertEqual(
+            sorted(JournalEntry.objects.values_list('source', flat=True)),
+            [f'invoice:{invoice.pk}', f'payment:{payment.pk}'],
+        )
@@ -41,13 +41,18 @@ from ..views_forms import (
 )
 
 from ..views_eft_reconciliation import (
-    eft_reconciliation_upload, eft_reconciliation_review,
+    eft_reconciliation_upload, eft_reconciliation_progress, eft_reconciliation_status,
+    eft_reconciliation_review,
 )
 
 from ..views_analytics import (
     client_analytics, client_analytics_api,
 )
 
+from ..views_ledger import (
+    trial_balance, trial_balance_api, account_ledger, account_ledger_api, account_ledger_csv,
+)
+
 from ..pdf_generator import download_invoice_pdf, download_quote_pdf
 from ..views_loyalty import (
     loyalty_card_list, loyalty_card_detail,
@@ -157,7 +162,16 @@ urlpatterns = [
     path('journal-entries/', journal_entry_list, name='journal_entry_list'),
     path('journal-entries/<int:pk>/', journal_entry_detail, name='journal_entry_detail'),
     
+    # General Ledger Reports
+    path('trial-balance/', trial_balance, name='trial_balance'),
+    path('api/trial-balance/', trial_balance_api, name='trial_balance_api'),
+    path('ledger/<int:pk>/', account_ledger, name='account_ledger'),
+    path('ledger/<int:pk>/export/', account_ledger_csv, name='account_ledger_csv'),
+    path('api/ledger/<int:pk>/', account_ledger_api, name='account_ledger_api'),
+    
     # EFT Reconciliation
     path('eft-reconciliation/', eft_reconciliation_upload, name='eft_reconciliation_upload'),
-    path('eft-reconciliation/review/', eft_reconciliation_review, name='eft_reconciliation_review'),
+    path('eft-reconciliation/<int:pk>/', eft_reconciliation_progress, name='eft_reconciliation_progress'),
+    path('eft-reconciliation/<int:pk>/status/', eft_reconciliation_status, name='eft_reconciliation_status'),
+    path('eft-reconciliation/<int:pk>/review/', eft_reconciliation_review, name='eft_reconciliation_review'),
 ]
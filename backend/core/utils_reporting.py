@@ -0,0 +1,82 @@
+"""Time-bucketing helpers for sales and accounting reports"""
+import calendar
+from datetime import timedelta
+
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncWeek, TruncMonth
+
+
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket_start(value, period):
+    """First day of the day/week/month bucket containing a date (weeks start on Monday)"""
+    if period == 'day':
+        return value
+    if period == 'week':
+        return value - timedelta(days=value.weekday())
+    if period == 'month':
+        return value.replace(day=1)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def next_bucket(value, period):
+    """First day of the bucket after the one starting at value"""
+    if period == 'day':
+        return value + timedelta(days=1)
+    if period == 'week':
+        return value + timedelta(days=7)
+    if period == 'month':
+        days_in_month = calendar.monthrange(value.year, value.month)[1]
+        return value.replace(day=1) + timedelta(days=days_in_month)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def bucket_totals(queryset, date_field, period, total='amount', count=None):
+    """
+    Totals per bucket in one grouped query. count names a field to sum for
+    pre-aggregated rows; by default the rows themselves are counted.
+    Returns {bucket_start: {'total': ..., 'count': ...}} for buckets with rows.
+    """
+    if period == 'day':
+        bucket = F(date_field)
+    elif period == 'week':
+        bucket = TruncWeek(date_field)
+    elif period == 'month':
+        bucket = TruncMonth(date_field)
+    else:
+        raise ValueError(f"Unknown period: {period}")
+
+    rows = queryset.annotate(bucket=bucket).values('bucket').annotate(
+        total=Sum(total),
+        count=Sum(count) if count else Count('id'),
+    ).order_by('bucket')
+    return {
+        row['bucket']: {'total': row['total'] or 0, 'count': row['count']}
+        for row in rows
+    }
+
+
+def bucket_series(queryset, date_field, period, start_date, end_date, total='amount', count=None):
+    """
+    Every day/week/month bucket between start_date and end_date with its
+    totals, empty buckets included with zero totals. Partial weeks and
+    months at either end are clipped to the range.
+
+    Returns a list of {'start', 'end', 'total', 'count'} in date order and
+    always costs one query, whatever the length of the range.
+    """
+    totals = bucket_totals(queryset, date_field, period, total=total, count=count)
+    series = []
+    current = bucket_start(start_date, period)
+    while current <= end_date:
+        following = next_bucket(current, period)
+        values = totals.get(current, {'total': 0, 'count': 0})
+        series.append({
+            'start': max(current, start_date),
+            'end': min(following - timedelta(days=1), end_date),
+            'total': values['total'],
+            'count': values['count'],
+        })
+        current = following
+    return series
@@ -0,0 +1,71 @@
+"""
+Work deferred until the current transaction commits, merged per transaction,
+and lookups cached for the rest of a transaction.
+Signal receivers add keys (client ids, payment dates, document pks) to a
+named batch; after the commit the batch is handed to its flush function
+once, however many saves added to it. Outside a transaction the keys are
+flushed straight away, as transaction.on_commit would. A batch or cached
+value belongs to its on_commit callback, so a rollback that discards the
+callback discards the batch or value too.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def _registered(connection, callback):
+    return any(entry[1] is callback for entry in connection.run_on_commit)
+
+
+def defer(name, keys, flush):
+    """Add keys to the named batch and flush(keys) it once the transaction commits"""
+    keys = {key for key in keys if key}
+    if not keys:
+        return
+    connection = connections[DEFAULT_DB_ALIAS]
+    if not connection.in_atomic_block:
+        flush(keys)
+        return
+
+    # The connection object is per thread, so each thread keeps its own batches
+    batches = connection.__dict__.setdefault('deferred_batches', {})
+    batch = batches.get(name)
+    if batch is None or not _registered(connection, batch[1]):
+        pending = set()
+
+        def callback():
+            if batches.get(name) is batch_entry:
+                del batches[name]
+            flush(pending)
+
+        batch = batch_entry = (pending, callback)
+        batches[name] = batch
+        transaction.on_commit(callback)
+    batch[0].update(keys)
+
+
+def cached(name, compute):
+    """
+    compute() once per transaction and its result for the rest of it.
+    Outside a transaction it is computed on every call. Call forget(name)
+    when the transaction changes what compute() reads.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if not connection.in_atomic_block:
+        return compute()
+
+    values = connection.__dict__.setdefault('transaction_cache', {})
+    entry = values.get(name)
+    if entry is None or not _registered(connection, entry[1]):
+
+        def callback():
+            if values.get(name) is entry:
+                del values[name]
+
+        entry = (compute(), callback)
+        values[name] = entry
+        transaction.on_commit(callback)
+    return entry[0]
+
+
+def forget(name):
+    """Drop the value cached by cached(name, ...) in this transaction"""
+    connections[DEFAULT_DB_ALIAS].__dict__.get('transaction_cache', {}).pop(name, None)
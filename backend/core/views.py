@@ -5,7 +5,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
 from .models import (
     HeroBanner, CompanySettings, Client, Category, Product, ProductVariant,
@@ -20,6 +20,7 @@ from .serializers import (
     DeliveryZoneSerializer, PromoCodeSerializer, DriverSerializer, ProductVariantSerializer, OrderSerializer, OrderItemSerializer, OrderStatusHistorySerializer,
     ContactSubmissionSerializer, TestimonialSerializer, CustomScriptSerializer
 )
+from .services.statement_service import StatementService
 
 
 class HeroBannerViewSet(viewsets.ModelViewSet):
@@ -103,90 +104,60 @@ class ClientViewSet(viewsets.ModelViewSet):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
-        # Get all invoices for the client within date range
-        invoices = client.invoices.all().order_by('issue_date')
-        if start_date:
-            invoices = invoices.filter(issue_date__gte=start_date)
-        if end_date:
-            invoices = invoices.filter(issue_date__lte=end_date)
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+            end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        except ValueError:
+            return Response(
+                {'error': 'start_date and end_date must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Calculate balance brought forward (invoices before start_date)
-        balance_bf = Decimal('0.00')
-        if start_date:
-            previous_invoices = client.invoices.filter(issue_date__lt=start_date)
-            balance_bf = sum(inv.balance for inv in previous_invoices)
+        statement = StatementService(client, start, end).build()
         
-        # Build statement data
         transactions = []
-        running_balance = balance_bf
-        
-        for invoice in invoices:
-            # Add invoice as debit
-            running_balance += invoice.total_amount
+        for row in statement['transactions']:
+            obj = row['object']
+            if row['type'] == 'invoice':
+                invoice_number = obj.invoice_number
+                description = f'Invoice #{obj.invoice_number}'
+                row_status = obj.status
+            elif row['type'] == 'payment':
+                invoice_number = obj.invoice.invoice_number if obj.invoice else ''
+                description = f'Payment - {obj.payment_method}'
+                row_status = 'paid'
+            else:
+                invoice_number = obj.invoice.invoice_number
+                description = f'Credit Note #{obj.credit_note_number}'
+                row_status = obj.status
             transactions.append({
-                'date': invoice.issue_date,
-                'invoice_number': invoice.invoice_number,
-                'description': f'Invoice #{invoice.invoice_number}',
-                'debit': float(invoice.total_amount),
-                'credit': 0,
-                'balance': float(running_balance),
-                'status': invoice.status
+                'date': row['date'],
+                'invoice_number': invoice_number,
+                'description': description,
+                'debit': float(row['debit']),
+                'credit': float(row['credit']),
+                'balance': float(row['balance']),
+                'status': row_status
             })
-            
-            # Add payments as credits
-            for payment in invoice.payments.all():
-                if (not start_date or payment.payment_date >= datetime.strptime(start_date, '%Y-%m-%d').date()) and \
-                   (not end_date or payment.payment_date <= datetime.strptime(end_date, '%Y-%m-%d').date()):
-                    running_balance -= payment.amount
-                    transactions.append({
-                        'date': payment.payment_date,
-                        'invoice_number': invoice.invoice_number,
-                        'description': f'Payment - {payment.payment_method}',
-                        'debit': 0,
-                        'credit': float(payment.amount),
-                        'balance': float(running_balance),
-                        'status': 'paid'
-                    })
-        
-        # Calculate aging
-        today = date.today()
-        aging = {
-            'current': Decimal('0.00'),
-            '30_days': Decimal('0.00'),
-            '60_days': Decimal('0.00'),
-            '90_days': Decimal('0.00'),
-            'over_90_days': Decimal('0.00'),
-        }
-        
-        for invoice in client.invoices.filter(status__in=['sent', 'partially_paid', 'overdue']):
-            days_overdue = (today - invoice.due_date).days
-            if days_overdue < 0:
-                aging['current'] += invoice.balance
-            elif days_overdue <= 30:
-                aging['30_days'] += invoice.balance
-            elif days_overdue <= 60:
-                aging['60_days'] += invoice.balance
-            elif days_overdue <= 90:
-                aging['90_days'] += invoice.balance
-            else:
-                aging['over_90_days'] += invoice.balance
         
+        aging = statement['aging']
         return Response({
             'client': ClientSerializer(client).data,
             'start_date': start_date,
             'end_date': end_date,
-            'balance_brought_forward': float(balance_bf),
+            'balance_brought_forward': float(statement['balance_bf']),
             'transactions': transactions,
-            'total_debits': float(sum(t['debit'] for t in transactions)),
-            'total_credits': float(sum(t['credit'] for t in transactions)),
-            'total_balance': float(running_balance),
+            'total_debits': float(statement['total_debits']),
+            'total_credits': float(statement['total_credits']),
+            'total_balance': float(statement['closing_balance']),
             'aging': {
                 'current': float(aging['current']),
-                '30_days': float(aging['30_days']),
-                '60_days': float(aging['60_days']),
-                '90_days': float(aging['90_days']),
-                'over_90_days': float(aging['over_90_days']),
-                'total': float(sum(aging.values()))
+                '30_days': float(aging['days_1_30']),
+                '60_days': float(aging['days_31_60']),
+                '90_days': float(aging['days_61_90']),
+                'over_90_days': float(aging['over_90']),
+                'credit': float(aging['credit']),
+                'total': float(aging['total'])
             }
         })
 
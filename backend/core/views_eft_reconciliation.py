@@ -1,16 +1,45 @@
-import csv
-import io
+import logging
 import re
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import combinations
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import timedelta
 from difflib import SequenceMatcher
-from django.shortcuts import render, redirect
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
-from .models import Invoice, Payment, Client
+from django.http import JsonResponse
+from django.utils import timezone
+from .models import Invoice, Payment, Client, ReconciliationBatch, ReconciliationLine, PayerAlias
+from .services import bank_statements
 
 
+logger = logging.getLogger(__name__)
+
+
+# Bank lines matched between progress updates in a background run
+MATCH_CHUNK_SIZE = 100
+
+# Statement lines inserted per query while an upload is streamed
+STATEMENT_CHUNK_SIZE = 500
+
+# A batch left pending this long was never picked up by a worker and is matched in-process
+PENDING_TIMEOUT = timedelta(seconds=30)
+
+# Bounds for matching one EFT against several invoices of the same client
+MAX_COMBINATION_SIZE = 3        # invoices paid by one EFT
+MAX_COMBINATION_INVOICES = 12   # oldest open invoices considered per client
+MAX_COMBINATION_CLIENTS = 5     # description-matched clients tried per row
+
+# Added to the description score of a client whose payer reference was accepted before
+PAYER_ALIAS_BOOST = 40
+# Accepted this many times, a payer reference matches its client's invoices without fuzzy scoring
+PAYER_ALIAS_TRUSTED = 3
+
 # Descriptions to skip - these are not EFT payments from clients
 SKIP_DESCRIPTIONS = [
     'carried forward', 'brought forward', 'provisional statement',
@@ -94,10 +123,144 @@ def is_expense(description):
     return False
 
 
-def _score_description_match(invoice, description):
+ADDRESS_SPLIT = re.compile(r'[\s,./\-]+')
+DIGIT_RUN = re.compile(r'\d+')
+
+
+def _grams(text):
+    """Distinct 3-character fragments of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _SubstringIndex:
+    """
+    Finds which indexed tokens occur inside a text. A token can only be a
+    substring if every one of its 3-grams is in the text, so the postings of
+    the text's 3-grams are intersected per token before a final `in` check.
+    Tokens must be at least 3 characters long.
+    """
+
+    def __init__(self):
+        self._gram_tokens = defaultdict(set)
+        self._token_gram_count = {}
+        self._token_clients = defaultdict(set)
+
+    def add(self, token, client_id):
+        if token not in self._token_gram_count:
+            grams = _grams(token)
+            self._token_gram_count[token] = len(grams)
+            for gram in grams:
+                self._gram_tokens[gram].add(token)
+        self._token_clients[token].add(client_id)
+
+    def clients_in(self, text, text_grams):
+        hits = defaultdict(int)
+        for gram in text_grams:
+            for token in self._gram_tokens.get(gram, ()):
+                hits[token] += 1
+        client_ids = set()
+        for token, count in hits.items():
+            if count == self._token_gram_count[token] and token in text:
+                client_ids |= self._token_clients[token]
+        return client_ids
+
+
+class ClientMatchIndex:
+    """
+    Inverted index over client names, addresses and cities, built once per
+    upload. Maps name tokens, street-name 3-grams, street numbers and cities
+    to client ids, so each bank row's description evidence for every client
+    comes from a few postings lookups instead of tokenising each client's
+    details again on every row.
+    """
+
+    def __init__(self, clients=()):
+        self._name_parts = _SubstringIndex()
+        self._name_words = _SubstringIndex()
+        self._cities = _SubstringIndex()
+        self._street_grams = defaultdict(set)
+        self._street_numbers = defaultdict(set)
+        self.numbered_clients = set()
+        for client in clients:
+            self.add(client)
+
+    def add(self, client):
+        if client.name:
+            name_lower = client.name.lower()
+            for part in name_lower.split():
+                if len(part) >= 3:
+                    self._name_parts.add(part, client.pk)
+            # Words as partial_contains() splits them
+            for word in ADDRESS_SPLIT.split(name_lower):
+                if len(word) >= 3:
+                    self._name_words.add(word, client.pk)
+
+        if client.address:
+            for part in ADDRESS_SPLIT.split(client.address.lower()):
+                if len(part) < 2:
+                    continue
+                if part.isdigit():
+                    self._street_numbers[part].add(client.pk)
+                    self.numbered_clients.add(client.pk)
+                elif len(part) >= 3:
+                    for gram in _grams(part):
+                        self._street_grams[gram].add(client.pk)
+
+        if client.city and len(client.city) >= 3:
+            self._cities.add(client.city.lower(), client.pk)
+
+    def match(self, description):
+        """Description evidence for every indexed client"""
+        description_lower = description.lower() if description else ''
+        grams = _grams(description_lower)
+
+        street_clients = set()
+        for gram in grams:
+            street_clients |= self._street_grams.get(gram, set())
+
+        # A street number can only occur inside one of the description's digit runs
+        number_clients = set()
+        for run in DIGIT_RUN.findall(description_lower):
+            for start in range(len(run) - 1):
+                for end in range(start + 2, len(run) + 1):
+                    number_clients |= self._street_numbers.get(run[start:end], set())
+
+        return DescriptionEvidence(
+            numbered_clients=self.numbered_clients,
+            name_clients=self._name_parts.clients_in(description_lower, grams),
+            word_clients=self._name_words.clients_in(description_lower, grams),
+            street_clients=street_clients,
+            number_clients=number_clients,
+            city_clients=self._cities.clients_in(description_lower, grams),
+        )
+
+
+class DescriptionEvidence:
+    """Which clients' names, streets, street numbers and cities occur in one bank description"""
+
+    def __init__(self, numbered_clients, name_clients, word_clients, street_clients,
+                 number_clients, city_clients):
+        self.numbered_clients = numbered_clients
+        self.name_clients = name_clients
+        self.word_clients = word_clients
+        self.street_clients = street_clients
+        self.number_clients = number_clients
+        self.city_clients = city_clients
+
+    def candidate_client_ids(self):
+        """
+        Clients with any indexed evidence. Excludes clients that could only
+        score on fuzzy name similarity, which cannot be indexed.
+        """
+        return self.name_clients | self.word_clients | self.street_clients | self.city_clients
+
+
+def _score_description_match(invoice, description, evidence=None):
     """
     Score how well a bank description matches an invoice's client info.
     Returns (score, reasons) where score > 0 means some description evidence.
+    Pass the row's DescriptionEvidence from a ClientMatchIndex when scoring
+    many invoices against the same description.
     """
     score = 0
     reasons = []
@@ -106,6 +269,10 @@ def _score_description_match(invoice, description):
     if not description_lower:
         return score, reasons
     
+    client = invoice.client
+    if evidence is None:
+        evidence = ClientMatchIndex([client]).match(description)
+    
     # 1. Check if invoice number appears in description
     inv_num_raw = invoice.invoice_number  # e.g. INV-004185
     inv_num_digits = inv_num_raw.replace('INV-', '').replace('INV', '').lstrip('0') or '0'
@@ -122,13 +289,10 @@ def _score_description_match(invoice, description):
                 reasons.append(f"Invoice number match: {inv_num_raw}")
     
     # 2. Check client name match
-    client_name = invoice.client.name
+    client_name = client.name
     if client_name:
-        # Split client name into parts and check each
-        name_parts = [p for p in client_name.lower().split() if len(p) >= 3]
-        name_in_desc = any(part in description_lower for part in name_parts)
-        
-        if name_in_desc:
+        # Any name part (3+ chars) in the description
+        if client.pk in evidence.name_clients:
             score += 35
             reasons.append(f"Client name '{client_name}' found in description")
         elif partial_contains(description, client_name):
@@ -141,53 +305,114 @@ def _score_description_match(invoice, description):
                 reasons.append(f"Client name similarity: {int(name_similarity * 100)}%")
     
     # 3. Check client address match - require BOTH number AND street name (3+ letters)
-    client_address = invoice.client.address
+    client_address = client.address
     if client_address:
-        # Extract address components
-        addr_parts = [p for p in re.split(r'[\s,./\-]+', client_address.lower()) if len(p) >= 2]
-        
-        # Find street number (numeric parts)
-        addr_numbers = [p for p in addr_parts if p.isdigit()]
-        # Find street name parts (3+ letter words)
-        addr_words = [p for p in addr_parts if not p.isdigit() and len(p) >= 3]
-        
-        # Check if description contains address components
-        has_number_match = any(num in description_lower for num in addr_numbers)
-        
-        # Check for street name match (at least 3 letters)
-        street_name_matches = []
-        for word in addr_words:
-            if word in description_lower:
-                street_name_matches.append(word)
-            elif len(word) >= 3:
-                # Check if at least 3 consecutive letters from street name appear in description
-                for i in range(len(word) - 2):
-                    if word[i:i+3] in description_lower:
-                        street_name_matches.append(word[:i+3])
-                        break
-        
-        has_street_match = len(street_name_matches) > 0
+        has_number_match = client.pk in evidence.number_clients
+        # A street name matches when at least 3 consecutive letters of it appear
+        has_street_match = client.pk in evidence.street_clients
         
         # Only score if BOTH number and street name match
         if has_number_match and has_street_match:
             score += 40
             reasons.append(f"Address match: number + street name '{client_address}'")
-        elif has_street_match and not addr_numbers:
+        elif has_street_match and client.pk not in evidence.numbered_clients:
             # No number in address, but street name matches
             score += 30
             reasons.append(f"Street name match: '{client_address}'")
     
     # 4. Check city match
-    client_city = invoice.client.city
-    if client_city and len(client_city) >= 3:
-        if client_city.lower() in description_lower:
-            score += 10
-            reasons.append(f"City '{client_city}' found in description")
+    client_city = client.city
+    if client.pk in evidence.city_clients:
+        score += 10
+        reasons.append(f"City '{client_city}' found in description")
     
     return score, reasons
 
 
-def find_matching_invoices(description, amount, payment_date):
+def to_cents(amount):
+    """Amount in whole cents, for exact amount comparisons"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+class OpenInvoiceIndex:
+    """
+    Unpaid and partially paid invoices, loaded once per upload.
+    Keyed by balance in cents, each amount's invoices sorted by issue date,
+    so a bank row finds its exact-amount candidates with a dict lookup and
+    a bisect on the payment date instead of a query over every open invoice.
+    Their clients are indexed for description matching in self.clients, and
+    the learned payer references of those clients are kept in self.aliases.
+    """
+
+    def __init__(self):
+        self._invoices = defaultdict(list)
+        self._issue_dates = defaultdict(list)
+        self._by_client = defaultdict(list)
+
+        open_invoices = Invoice.objects.filter(
+            Q(status='unpaid') | Q(status='partially_paid'),
+        ).select_related('client').order_by('issue_date', 'pk')
+
+        clients = {}
+        for invoice in open_invoices:
+            cents = to_cents(invoice.balance)
+            self._invoices[cents].append(invoice)
+            self._issue_dates[cents].append(invoice.issue_date)
+            if cents > 0:
+                self._by_client[invoice.client_id].append(invoice)
+            clients[invoice.client_id] = invoice.client
+        
+        self.clients = ClientMatchIndex(clients.values())
+        self.aliases = {
+            reference: (client_id, times_matched)
+            for reference, client_id, times_matched in PayerAlias.objects.filter(
+                client_id__in=clients
+            ).values_list('reference', 'client_id', 'times_matched')
+        }
+
+    def candidates(self, amount, payment_date):
+        """Open invoices with exactly this balance issued on or before payment_date"""
+        cents = to_cents(amount)
+        if cents not in self._invoices:
+            return []
+        end = bisect_right(self._issue_dates[cents], payment_date)
+        return self._invoices[cents][:end]
+
+    def client_invoices(self, client_id, payment_date):
+        """A client's oldest open invoices issued on or before payment_date"""
+        invoices = [
+            invoice for invoice in self._by_client.get(client_id, ())
+            if invoice.issue_date <= payment_date
+        ]
+        return invoices[:MAX_COMBINATION_INVOICES]
+
+
+def find_invoice_combinations(invoices, cents, max_size=MAX_COMBINATION_SIZE, limit=5):
+    """
+    Sets of 2 to max_size invoices whose balances add up to exactly cents.
+    The last invoice of a set is found with a dict lookup on the amount still
+    needed, so sets of k invoices cost O(n^(k-1)) instead of O(n^k).
+    """
+    balances = [to_cents(invoice.balance) for invoice in invoices]
+    positions = defaultdict(list)
+    for position, balance in enumerate(balances):
+        positions[balance].append(position)
+    
+    found = []
+    for size in range(2, max_size + 1):
+        for head in combinations(range(len(invoices)), size - 1):
+            remaining = cents - sum(balances[position] for position in head)
+            if remaining <= 0:
+                continue
+            for position in positions.get(remaining, ()):
+                if position > head[-1]:
+                    found.append([invoices[p] for p in head + (position,)])
+                    if len(found) >= limit:
+                        return found
+    return found
+
+
+def find_matching_invoices(description, amount, payment_date, index=None):
     """
     Find potential invoice matches.
     
@@ -196,25 +421,45 @@ def find_matching_invoices(description, amount, payment_date):
       2. Exact amount match (payment amount = invoice balance)
     
     No matches are returned unless BOTH conditions are satisfied.
-    """
-    amount_decimal = Decimal(str(amount))
+    A payer reference accepted for a client before counts as description
+    evidence for that client's invoices and boosts their score; other
+    clients' invoices are still scored as usual. Once the reference has been
+    accepted PAYER_ALIAS_TRUSTED times, that client's exact-amount invoices
+    are returned straight from the alias lookup, without fuzzy scoring.
     
-    # Get all unpaid/partially paid invoices where issue_date <= payment_date
-    unpaid_invoices = Invoice.objects.filter(
-        Q(status='unpaid') | Q(status='partially_paid'),
-        issue_date__lte=payment_date,
-    ).select_related('client')
+    Pass an OpenInvoiceIndex built once per upload when matching many rows.
+    """
+    if index is None:
+        index = OpenInvoiceIndex()
     
     matches = []
+    candidates = index.candidates(amount, payment_date)
+    alias = index.aliases.get(PayerAlias.normalize(description))
+    if not candidates:
+        return find_combination_matches(description, amount, payment_date, index, alias)
     
-    for invoice in unpaid_invoices:
-        # First check: exact amount match (mandatory)
-        amount_match = abs(amount_decimal - invoice.balance) < Decimal('0.01')
-        if not amount_match:
-            continue  # Skip if amount doesn't match exactly
-        
+    # Known payer: exact reference lookup
+    if alias and alias[1] >= PAYER_ALIAS_TRUSTED:
+        for invoice in candidates:
+            if invoice.client_id == alias[0]:
+                reasons = []
+                _payer_alias_boost(invoice, alias, reasons)
+                matches.append({
+                    'invoice': invoice,
+                    'match_score': 100 + 20,
+                    'match_reasons': reasons + [f"Exact amount match: R{invoice.balance}"],
+                    'amount_match': True,
+                })
+        if matches:
+            return matches[:5]
+    
+    evidence = index.clients.match(description)
+    
+    # First check: exact amount match (mandatory) - only same-balance invoices
+    for invoice in candidates:
         # Second check: description match (mandatory)
-        desc_score, desc_reasons = _score_description_match(invoice, description)
+        desc_score, desc_reasons = _score_description_match(invoice, description, evidence)
+        desc_score += _payer_alias_boost(invoice, alias, desc_reasons)
         if desc_score <= 0:
             continue  # Skip if no description evidence
         
@@ -229,214 +474,344 @@ def find_matching_invoices(description, amount, payment_date):
             'amount_match': True,
         })
     
+    if not matches:
+        # No single invoice fits; try several of one client's invoices
+        return find_combination_matches(description, amount, payment_date, index, alias)
+    
     # Sort by description score (highest first)
     matches.sort(key=lambda x: -x['match_score'])
     
     return matches[:5]
 
 
-def parse_nedbank_date(date_str):
-    """Parse Nedbank date format: DDMonYYYY (e.g. 01Feb2026)"""
-    date_str = date_str.strip()
-    # Try Nedbank format first: DDMonYYYY
-    try:
-        return datetime.strptime(date_str, '%d%b%Y').date()
-    except ValueError:
-        pass
-    # Fallback formats
-    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y']:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
+def _payer_alias_boost(invoice, alias, reasons):
+    """PAYER_ALIAS_BOOST, with its reason, if the row's payer reference is known for the invoice's client"""
+    if not alias or alias[0] != invoice.client_id:
+        return 0
+    reasons.append(f"Known payer reference for '{invoice.client.name}' (accepted {alias[1]} time(s) before)")
+    return PAYER_ALIAS_BOOST
+
+
+def find_combination_matches(description, amount, payment_date, index, alias=None):
+    """
+    Matches for an EFT that pays several invoices of one client at once.
+    Only clients known from a payer alias or with name or street evidence
+    in the description are tried, best scoring first.
+    """
+    cents = to_cents(amount)
+    evidence = index.clients.match(description)
+    
+    client_ids = evidence.name_clients | evidence.word_clients | evidence.street_clients
+    if alias:
+        client_ids = client_ids | {alias[0]}
+    
+    scored_clients = []
+    for client_id in client_ids:
+        invoices = index.client_invoices(client_id, payment_date)
+        if len(invoices) < 2:
             continue
-    return None
+        scores = {}
+        for invoice in invoices:
+            score, reasons = _score_description_match(invoice, description, evidence)
+            scores[invoice.pk] = (score + _payer_alias_boost(invoice, alias, reasons), reasons)
+        best = max(score for score, _ in scores.values())
+        if best > 0:
+            scored_clients.append((best, client_id, invoices, scores))
+    scored_clients.sort(key=lambda item: -item[0])
+    
+    matches = []
+    for _, _, invoices, scores in scored_clients[:MAX_COMBINATION_CLIENTS]:
+        for combination in find_invoice_combinations(invoices, cents):
+            desc_score, desc_reasons = max((scores[invoice.pk] for invoice in combination), key=lambda item: item[0])
+            numbers = ' + '.join(invoice.invoice_number for invoice in combination)
+            matches.append({
+                'invoice': combination[0],
+                'invoices': combination,
+                'match_score': desc_score + 10,  # Below a single exact-amount match
+                'match_reasons': list(desc_reasons) + [f"Combined balance of {numbers} = R{amount}"],
+                'amount_match': True,
+            })
+    
+    matches.sort(key=lambda x: -x['match_score'])
+    return matches[:5]
+
+
+def serialize_match(match):
+    """A find_matching_invoices() match as stored on a ReconciliationLine"""
+    invoices = match.get('invoices') or [match['invoice']]
+    return {
+        'invoice_id': invoices[0].id,
+        'invoice_ids': [invoice.id for invoice in invoices],
+        'match_score': match['match_score'],
+        'match_reasons': match['match_reasons'],
+        'amount_match': match.get('amount_match', False),
+    }
+
+
+def match_batch(batch_id):
+    """
+    Match every pending line of a batch against the open invoices.
+    Runs from the match_reconciliation_batch task; progress is saved on the
+    batch after every chunk of lines so the upload page can poll it.
+    """
+    batch = ReconciliationBatch.objects.get(pk=batch_id)
+    batch.status = 'matching'
+    batch.save(update_fields=['status', 'updated_at'])
+    
+    try:
+        index = OpenInvoiceIndex()
+        lines = list(batch.lines.filter(status='pending'))
+        processed = 0
+        matched = 0
+        
+        for start in range(0, len(lines), MATCH_CHUNK_SIZE):
+            chunk = lines[start:start + MATCH_CHUNK_SIZE]
+            for line in chunk:
+                line.matches = [
+                    serialize_match(match)
+                    for match in find_matching_invoices(line.description, line.amount, line.date, index)
+                ]
+                if line.matches:
+                    matched += 1
+            ReconciliationLine.objects.bulk_update(chunk, ['matches'])
+            
+            processed += len(chunk)
+            ReconciliationBatch.objects.filter(pk=batch.pk).update(
+                processed_lines=processed,
+                matched_lines=matched,
+                updated_at=timezone.now(),
+            )
+        
+        ReconciliationBatch.objects.filter(pk=batch.pk).update(status='ready', updated_at=timezone.now())
+    except Exception as e:
+        logger.exception(f'Matching reconciliation batch {batch_id} failed')
+        ReconciliationBatch.objects.filter(pk=batch.pk).update(
+            status='failed', error=str(e), updated_at=timezone.now()
+        )
+
+
+def start_batch_matching(batch_id):
+    """Queue matching on Celery, or run it here without a worker or if the broker cannot be reached"""
+    from .tasks import match_reconciliation_batch
+    if not settings.BACKGROUND_WORKER:
+        match_batch(batch_id)
+        return
+    try:
+        # Fail fast instead of retrying the broker connection during the request
+        match_reconciliation_batch.apply_async((batch_id,), retry=False)
+    except Exception as e:
+        logger.warning(f'Could not queue reconciliation batch {batch_id}, matching in-process: {e}')
+        match_batch(batch_id)
+
+
+def match_stalled_batch(batch):
+    """
+    Match a batch in-process if it has stayed pending past PENDING_TIMEOUT,
+    i.e. the task was queued but no worker took it. Claiming the batch with a
+    conditional update keeps concurrent polls from matching it twice.
+    """
+    if batch.status != 'pending':
+        return batch
+    claimed = ReconciliationBatch.objects.filter(
+        pk=batch.pk, status='pending', updated_at__lt=timezone.now() - PENDING_TIMEOUT,
+    ).update(updated_at=timezone.now())
+    if claimed:
+        logger.warning(f'Reconciliation batch {batch.pk} was not picked up by a worker, matching in-process')
+        match_batch(batch.pk)
+        batch.refresh_from_db()
+    return batch
 
 
 @login_required
 def eft_reconciliation_upload(request):
-    """Upload CSV bank statement for EFT reconciliation"""
+    """Upload a bank statement (CSV, OFX or QIF) for EFT reconciliation"""
+    recent_batches = ReconciliationBatch.objects.all()[:10]
+    context = {
+        'recent_batches': recent_batches,
+        'bank_choices': bank_statements.parser_choices(),
+        'accept': ','.join(bank_statements.supported_extensions()),
+    }
+    
     if request.method == 'POST':
-        csv_file = request.FILES.get('csv_file')
+        statement_file = request.FILES.get('csv_file')
         
-        if not csv_file:
-            messages.error(request, 'Please select a CSV file to upload.')
-            return render(request, 'core/eft_reconciliation_upload.html')
+        if not statement_file:
+            messages.error(request, 'Please select a bank statement file to upload.')
+            return render(request, 'core/eft_reconciliation_upload.html', context)
         
-        if not csv_file.name.endswith('.csv'):
-            messages.error(request, 'Please upload a valid CSV file.')
-            return render(request, 'core/eft_reconciliation_upload.html')
+        if not statement_file.name.lower().endswith(tuple(bank_statements.supported_extensions())):
+            messages.error(request, 'Please upload a CSV, OFX or QIF bank statement.')
+            return render(request, 'core/eft_reconciliation_upload.html', context)
         
         try:
-            # Read CSV file
-            decoded_file = csv_file.read().decode('utf-8')
-            csv_reader = csv.reader(io.StringIO(decoded_file))
-            
-            # Skip Nedbank header rows (4 rows):
-            # Row 1: "Statement Enquiry :"
-            # Row 2: "Account Number : ,1101466707"
-            # Row 3: "Account Description :,Alpha LPG Savvy Plus"
-            # Row 4: "Statement Number : ,737,"
-            for _ in range(4):
-                next(csv_reader, None)
-            
-            # Process data rows
-            # Format: Col0=Date(DDMonYYYY), Col1=Description, Col2=Amount, Col3=RunningBalance
-            bank_transactions = []
-            skipped_count = 0
+            # Rows are streamed from the upload and stored in chunks
+            parser, transactions = bank_statements.read_statement(
+                statement_file, bank=request.POST.get('bank') or None
+            )
             
-            for row_num, row in enumerate(csv_reader, start=5):
-                if len(row) < 3:
-                    continue
+            with transaction.atomic():
+                batch = ReconciliationBatch.objects.create(
+                    filename=statement_file.name[:255],
+                    created_by=request.user,
+                )
                 
-                try:
-                    date_str = row[0].strip()
-                    description = row[1].strip()
-                    amount_str = row[2].strip() if len(row) > 2 else ''
-                    
-                    # Skip rows with no date
-                    if not date_str:
-                        continue
-                    
-                    # Skip rows with empty amount
-                    if not amount_str:
-                        continue
-                    
-                    # Parse date
-                    payment_date = parse_nedbank_date(date_str)
-                    if not payment_date:
-                        continue
-                    
-                    # Parse amount
-                    amount_clean = amount_str.replace('R', '').replace(',', '').replace(' ', '').strip()
-                    try:
-                        amount = float(amount_clean)
-                    except ValueError:
-                        continue
-                    
+                chunk = []
+                total_count = skipped_count = 0
+                for txn in transactions:
                     # Skip negative amounts (debits/expenses)
-                    if amount <= 0:
-                        continue
-                    
-                    # Skip non-EFT rows
-                    if is_skip_row(description):
-                        skipped_count += 1
+                    if txn.amount <= 0:
                         continue
                     
-                    # Skip known expenses
-                    if is_expense(description):
+                    # Skip non-EFT rows, known expenses and YOCO card payments
+                    if is_skip_row(txn.description) or is_expense(txn.description) \
+                            or txn.description.upper().startswith('YOCO'):
                         skipped_count += 1
                         continue
                     
-                    # Skip YOCO transactions (card payments, not EFT)
-                    if description.upper().startswith('YOCO'):
-                        skipped_count += 1
-                        continue
-                    
-                    # Find matching invoices (exact amount match required)
-                    invoice_matches = find_matching_invoices(description, amount, payment_date)
-                    
-                    bank_transactions.append({
-                        'row_num': row_num,
-                        'date': payment_date,
-                        'amount': amount,
-                        'description': description,
-                        'matches': invoice_matches[:5]
-                    })
+                    chunk.append(ReconciliationLine(
+                        batch=batch,
+                        row_num=txn.row_num,
+                        date=txn.date,
+                        amount=txn.amount,
+                        description=txn.description,
+                    ))
+                    if len(chunk) >= STATEMENT_CHUNK_SIZE:
+                        ReconciliationLine.objects.bulk_create(chunk)
+                        total_count += len(chunk)
+                        chunk = []
+                ReconciliationLine.objects.bulk_create(chunk)
+                total_count += len(chunk)
                 
-                except Exception as e:
-                    continue
+                if not total_count:
+                    transaction.set_rollback(True)
+                else:
+                    batch.total_lines = total_count
+                    batch.skipped_rows = skipped_count
+                    batch.save(update_fields=['total_lines', 'skipped_rows', 'updated_at'])
+                    # Invoice matching runs in the background
+                    transaction.on_commit(lambda: start_batch_matching(batch.pk))
             
-            if not bank_transactions:
-                messages.warning(request, 'No EFT transactions found in the CSV file.')
-                return render(request, 'core/eft_reconciliation_upload.html')
-            
-            matched_count = sum(1 for t in bank_transactions if t['matches'])
-            
-            # Store in session for review page
-            request.session['bank_transactions'] = [
-                {
-                    'row_num': t['row_num'],
-                    'date': t['date'].isoformat(),
-                    'amount': str(t['amount']),
-                    'description': t['description'],
-                    'matches': [
-                        {
-                            'invoice_id': m['invoice'].id,
-                            'invoice_number': m['invoice'].invoice_number,
-                            'client_name': m['invoice'].client.name,
-                            'client_address': m['invoice'].client.address or '',
-                            'balance': str(m['invoice'].balance),
-                            'issue_date': m['invoice'].issue_date.isoformat(),
-                            'match_score': m['match_score'],
-                            'match_reasons': m['match_reasons'],
-                            'amount_match': m.get('amount_match', False),
-                        }
-                        for m in t['matches']
-                    ]
-                }
-                for t in bank_transactions
-            ]
+            if not total_count:
+                messages.warning(request, f'No EFT transactions found in the {parser.label} statement.')
+                return render(request, 'core/eft_reconciliation_upload.html', context)
             
             messages.success(
                 request,
-                f'Processed {len(bank_transactions)} EFT transactions. '
-                f'{matched_count} have invoice matches. '
-                f'{skipped_count} non-EFT rows were skipped.'
+                f'Uploaded {total_count} EFT transactions from the {parser.label} statement. '
+                f'{skipped_count} non-EFT rows were skipped. Matching invoices...'
             )
-            return redirect('accounting_forms:eft_reconciliation_review')
+            return redirect('accounting_forms:eft_reconciliation_progress', pk=batch.pk)
         
+        except bank_statements.StatementFormatError as e:
+            messages.error(request, str(e))
+            return render(request, 'core/eft_reconciliation_upload.html', context)
         except Exception as e:
-            messages.error(request, f'Error processing CSV file: {str(e)}')
-            return render(request, 'core/eft_reconciliation_upload.html')
+            messages.error(request, f'Error processing bank statement: {str(e)}')
+            return render(request, 'core/eft_reconciliation_upload.html', context)
     
-    return render(request, 'core/eft_reconciliation_upload.html')
+    return render(request, 'core/eft_reconciliation_upload.html', context)
 
 
 @login_required
-def eft_reconciliation_review(request):
+def eft_reconciliation_progress(request, pk):
+    """Matching progress for an uploaded statement; polls the status endpoint"""
+    batch = match_stalled_batch(get_object_or_404(ReconciliationBatch, pk=pk))
+    if batch.status in ('ready', 'completed'):
+        return redirect('accounting_forms:eft_reconciliation_review', pk=batch.pk)
+    return render(request, 'core/eft_reconciliation_progress.html', {'batch': batch})
+
+
+@login_required
+def eft_reconciliation_status(request, pk):
+    """Matching progress as JSON"""
+    batch = match_stalled_batch(get_object_or_404(ReconciliationBatch, pk=pk))
+    return JsonResponse({
+        'status': batch.status,
+        'status_display': batch.get_status_display(),
+        'processed': batch.processed_lines,
+        'total': batch.total_lines,
+        'matched': batch.matched_lines,
+        'progress': batch.progress_percent,
+        'error': batch.error,
+    })
+
+
+@login_required
+def eft_reconciliation_review(request, pk):
     """Review and accept/reject EFT payment matches"""
-    bank_transactions = request.session.get('bank_transactions', [])
+    batch = get_object_or_404(ReconciliationBatch, pk=pk)
     
-    if not bank_transactions:
-        messages.warning(request, 'No transactions to review. Please upload a bank statement first.')
+    if batch.status in ('pending', 'matching'):
+        return redirect('accounting_forms:eft_reconciliation_progress', pk=batch.pk)
+    if batch.status == 'failed':
+        messages.error(request, f'Matching this statement failed: {batch.error}')
         return redirect('accounting_forms:eft_reconciliation_upload')
+    if batch.status == 'completed':
+        messages.info(request, 'This statement has already been processed.')
+        return redirect('accounting_forms:payment_list')
+    
+    lines = list(batch.lines.all())
     
     if request.method == 'POST':
-        accepted_count = 0
+        # Each accepted row posts one invoice id, or several joined by commas
+        selected_ids = {}
+        for line in lines:
+            if request.POST.get(f'action_{line.row_num}') == 'accept':
+                selected = request.POST.get(f'invoice_{line.row_num}', '').split(',')
+                if selected and all(value.isdigit() for value in selected):
+                    selected_ids[line.row_num] = [int(value) for value in selected]
+        invoices = Invoice.objects.select_related('client').in_bulk(
+            {invoice_id for ids in selected_ids.values() for invoice_id in ids}
+        )
         
-        for transaction in bank_transactions:
-            row_num = transaction['row_num']
-            action = request.POST.get(f'action_{row_num}')
+        accepted = []
+        payments = []
+        for line in lines:
+            line_invoices = [invoices.get(invoice_id) for invoice_id in selected_ids.get(line.row_num, ())]
+            if not line_invoices or None in line_invoices:
+                line.status = 'rejected'
+                continue
             
-            if action == 'accept':
-                selected_invoice_id = request.POST.get(f'invoice_{row_num}')
-                
-                if selected_invoice_id:
-                    try:
-                        invoice = Invoice.objects.get(id=int(selected_invoice_id))
-                        payment_date = datetime.fromisoformat(transaction['date']).date()
-                        amount = Decimal(transaction['amount'])
-                        
-                        # Create payment record
-                        Payment.objects.create(
-                            client=invoice.client,
-                            invoice=invoice,
-                            payment_date=payment_date,
-                            amount=amount,
-                            payment_method='eft',
-                            reference_number=transaction['description'][:100],
-                            notes=f"EFT reconciliation from bank statement (Row {row_num})",
-                            created_by=request.user
-                        )
-                        
-                        accepted_count += 1
-                    
-                    except Exception as e:
-                        messages.error(request, f'Error creating payment for row {row_num}: {str(e)}')
+            line.status = 'accepted'
+            line_payments = []
+            remaining = line.amount
+            for position, invoice in enumerate(line_invoices):
+                # Pay each balance in turn; anything left over goes on the last invoice
+                if position == len(line_invoices) - 1:
+                    amount = remaining
+                else:
+                    amount = min(invoice.balance, remaining)
+                if amount <= 0:
+                    continue
+                remaining -= amount
+                part = f", {position + 1} of {len(line_invoices)}" if len(line_invoices) > 1 else ''
+                line_payments.append(Payment(
+                    client=invoice.client,
+                    invoice=invoice,
+                    payment_date=line.date,
+                    amount=amount,
+                    payment_method='eft',
+                    reference_number=line.description[:100],
+                    notes=f"EFT reconciliation from bank statement (Row {line.row_num}{part})",
+                    created_by=request.user
+                ))
+            line.payment = line_payments[0]
+            payments.extend(line_payments)
+            accepted.append(line)
         
-        # Clear session
-        if 'bank_transactions' in request.session:
-            del request.session['bank_transactions']
+        try:
+            # Payments, invoice balances and the reviewed lines in one transaction
+            with transaction.atomic():
+                Payment.bulk_post(payments)
+                PayerAlias.learn((line.description, line.payment.client_id) for line in accepted)
+                ReconciliationLine.objects.bulk_update(lines, ['status', 'payment'])
+                batch.status = 'completed'
+                batch.save(update_fields=['status', 'updated_at'])
+        except Exception as e:
+            logger.exception(f'Posting EFT payments for batch {batch.pk} failed')
+            messages.error(request, f'Error creating EFT payments: {str(e)}')
+            return redirect('accounting_forms:eft_reconciliation_review', pk=batch.pk)
+        accepted_count = len(accepted)
         
         if accepted_count > 0:
             messages.success(request, f'Successfully created {accepted_count} EFT payment(s).')
@@ -445,27 +820,37 @@ def eft_reconciliation_review(request):
         
         return redirect('accounting_forms:payment_list')
     
+    def match_invoice_ids(match):
+        return match.get('invoice_ids') or [match['invoice_id']]
+    
+    # Every matched invoice in one query
+    invoice_ids = {
+        invoice_id for line in lines for match in line.matches for invoice_id in match_invoice_ids(match)
+    }
+    invoices = Invoice.objects.select_related('client').in_bulk(invoice_ids)
+    
     # Prepare data for template
     transactions_with_invoices = []
-    for transaction in bank_transactions:
+    for line in lines:
         matches = []
-        for match in transaction['matches']:
-            try:
-                invoice = Invoice.objects.select_related('client').get(id=match['invoice_id'])
-                matches.append({
-                    'invoice': invoice,
-                    'match_score': match['match_score'],
-                    'match_reasons': match['match_reasons'],
-                    'amount_match': match.get('amount_match', False),
-                })
-            except Invoice.DoesNotExist:
+        for match in line.matches:
+            ids = match_invoice_ids(match)
+            if not all(invoice_id in invoices for invoice_id in ids):
                 continue
+            matches.append({
+                'invoice': invoices[ids[0]],
+                'invoices': [invoices[invoice_id] for invoice_id in ids],
+                'value': ','.join(str(invoice_id) for invoice_id in ids),
+                'match_score': match['match_score'],
+                'match_reasons': match['match_reasons'],
+                'amount_match': match.get('amount_match', False),
+            })
         
         transactions_with_invoices.append({
-            'row_num': transaction['row_num'],
-            'date': datetime.fromisoformat(transaction['date']),
-            'amount': Decimal(transaction['amount']),
-            'description': transaction['description'],
+            'row_num': line.row_num,
+            'date': line.date,
+            'amount': line.amount,
+            'description': line.description,
             'matches': matches,
             'has_matches': len(matches) > 0,
         })
@@ -477,6 +862,7 @@ def eft_reconciliation_review(request):
     unmatched_count = len(transactions_with_invoices) - matched_count
     
     context = {
+        'batch': batch,
         'transactions': transactions_with_invoices,
         'matched_count': matched_count,
         'unmatched_count': unmatched_count,
@@ -7,8 +7,11 @@ from django.db.models import Sum
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import date, timedelta
-from .models import Client, Product, Quote, QuoteItem, Invoice, InvoiceItem, Payment, CreditNote, CreditNoteItem, Order, Driver, DeliveryZone, ContactSubmission
+from .models import Client, Product, Quote, QuoteItem, Invoice, InvoiceItem, Payment, CreditNote, CreditNoteItem, Order, Driver, DeliveryZone, ContactSubmission, DailySalesFact
 from .models_accounting import Supplier, Expense, ExpenseCategory, JournalEntry, TaxPeriod
+from .utils_reporting import bucket_series
+from .services.statement_service import StatementService
+from .services import pdf_cache
 from .forms import (
     ClientForm, ProductForm, QuoteForm, QuoteItemFormSet,
     InvoiceForm, InvoiceItemFormSet, PaymentForm, MultiPaymentForm,
@@ -222,173 +225,23 @@ def client_statement(request, pk):
 def client_statement_preview(request, pk, start_date, end_date):
     """Preview client statement before downloading"""
     from datetime import datetime
-    from decimal import Decimal
     
     client = get_object_or_404(Client, pk=pk)
     start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
     end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Calculate balance brought forward - sum all transactions before start_date
-    # Get invoices issued before start date
-    bf_invoices = Invoice.objects.filter(
-        client=client,
-        issue_date__lt=start_date
-    )
-    
-    # Get payments made before start date
-    from django.db.models import Q
-    bf_payments = Payment.objects.filter(
-        Q(invoice__client=client) | Q(client=client, invoice__isnull=True),
-        payment_date__lt=start_date
-    )
-    
-    # Get credit notes issued before start date
-    bf_credit_notes = CreditNote.objects.filter(
-        client=client,
-        issue_date__lt=start_date
-    )
-    
-    # Calculate balance brought forward
-    balance_bf = Decimal('0.00')
-    
-    # Add invoice totals
-    for inv in bf_invoices:
-        balance_bf += inv.total_amount
-    
-    # Subtract payments
-    for pmt in bf_payments:
-        balance_bf -= pmt.amount
-    
-    # Subtract credit notes
-    for cn in bf_credit_notes:
-        balance_bf -= cn.total_amount
-    
-    # Get all transactions in the period
-    invoices = Invoice.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    ).order_by('issue_date')
-    
-    payments = Payment.objects.filter(
-        Q(invoice__client=client) | Q(client=client, invoice__isnull=True),
-        payment_date__gte=start_date,
-        payment_date__lte=end_date
-    ).order_by('payment_date')
-    
-    credit_notes = CreditNote.objects.filter(
-        client=client,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    ).order_by('issue_date')
-    
-    # Combine and sort all transactions
-    transactions = []
-    
-    for inv in invoices:
-        transactions.append({
-            'date': inv.issue_date,
-            'type': 'invoice',
-            'description': 'Invoice',
-            'reference': inv.invoice_number,
-            'debit': inv.total_amount,
-            'credit': Decimal('0.00'),
-            'object': inv
-        })
-    
-    for pmt in payments:
-        transactions.append({
-            'date': pmt.payment_date,
-            'type': 'payment',
-            'description': f'Payment - {pmt.get_payment_method_display()}',
-            'reference': pmt.payment_number,
-            'debit': Decimal('0.00'),
-            'credit': pmt.amount,
-            'object': pmt
-        })
-    
-    for cn in credit_notes:
-        transactions.append({
-            'date': cn.issue_date,
-            'type': 'credit_note',
-            'description': 'Credit Note',
-            'reference': cn.credit_note_number,
-            'debit': Decimal('0.00'),
-            'credit': cn.total_amount,
-            'object': cn
-        })
-    
-    # Sort by date
-    transactions.sort(key=lambda x: x['date'])
-    
-    # Calculate running balance
-    running_balance = balance_bf
-    for trans in transactions:
-        running_balance += trans['debit'] - trans['credit']
-        trans['balance'] = running_balance
-    
-    # Calculate totals
-    total_invoices = sum(t['debit'] for t in transactions)
-    total_credits = sum(t['credit'] for t in transactions)
-    
-    # Calculate aging buckets
-    from datetime import date, timedelta
-    today = date.today()
-    
-    aging = {
-        'current': Decimal('0.00'),
-        'days_1_30': Decimal('0.00'),
-        'days_31_60': Decimal('0.00'),
-        'days_61_90': Decimal('0.00'),
-        'over_90': Decimal('0.00'),
-        'credit': Decimal('0.00')
-    }
-    
-    # Get all unpaid/partially paid invoices for this client
-    unpaid_invoices = Invoice.objects.filter(
-        client=client
-    ).exclude(status__in=['paid', 'cancelled', 'draft'])
-    
-    for invoice in unpaid_invoices:
-        balance = invoice.balance
-        if balance > 0:
-            # Use due_date for aging calculation
-            reference_date = invoice.due_date
-            days_overdue = (today - reference_date).days
-            
-            if days_overdue < 0:
-                # Not yet due
-                aging['current'] += balance
-            elif days_overdue >= 1 and days_overdue <= 30:
-                # 1-30 days overdue
-                aging['days_1_30'] += balance
-            elif days_overdue >= 31 and days_overdue <= 60:
-                # 31-60 days overdue
-                aging['days_31_60'] += balance
-            elif days_overdue >= 61 and days_overdue <= 90:
-                # 61-90 days overdue
-                aging['days_61_90'] += balance
-            else:
-                # Over 90 days overdue
-                aging['over_90'] += balance
-        elif balance < 0:
-            # Credit balance
-            aging['credit'] += abs(balance)
-    
-    # Calculate total from aging buckets
-    aging_total = (aging['current'] + aging['days_1_30'] + aging['days_31_60'] + 
-                   aging['days_61_90'] + aging['over_90'] - aging['credit'])
+    statement = StatementService(client, start_date, end_date).build()
     
     return render(request, 'core/client_statement_preview.html', {
         'client': client,
         'start_date': start_date,
         'end_date': end_date,
-        'balance_bf': balance_bf,
-        'transactions': transactions,
-        'total_invoices': total_invoices,
-        'total_credits': total_credits,
-        'current_balance': running_balance,
-        'aging': aging
+        'balance_bf': statement['balance_bf'],
+        'transactions': statement['transactions'],
+        'total_invoices': statement['total_debits'],
+        'total_credits': statement['total_credits'],
+        'current_balance': statement['closing_balance'],
+        'aging': statement['aging']
     })
 
 
@@ -755,6 +608,18 @@ def invoice_bulk_action(request):
             ])
         return response
     
+    elif action == 'export_pdf':
+        from django.http import FileResponse
+        from .services.invoice_export import InvoicePDFExport
+        invoice_pks = invoices.order_by('-issue_date', '-pk').values_list('pk', flat=True)
+        merged = InvoicePDFExport(invoice_pks).build()
+        return FileResponse(
+            merged,
+            as_attachment=True,
+            filename=f'invoices_export_{date.today().isoformat()}.pdf',
+            content_type='application/pdf',
+        )
+    
     elif action == 'mark_whatsapp_sent':
         now = timezone.now()
         updated = invoices.update(whatsapp_sent=True, whatsapp_sent_at=now)
@@ -829,6 +694,9 @@ def invoice_create(request):
                 logger.error(f'Error processing loyalty stamp for invoice {invoice.invoice_number}: {str(e)}')
                 messages.warning(request, 'Invoice created successfully, but loyalty stamp could not be processed.')
             
+            # Render the PDF in the background so the first WhatsApp link click is instant
+            pdf_cache.prewarm('invoice', invoice.pk)
+            
             messages.success(request, f'Invoice {invoice.invoice_number} for {invoice.client.name} created successfully!')
             return redirect('accounting_forms:invoice_detail', invoice_number=invoice.invoice_number)
     else:
@@ -1331,7 +1199,7 @@ def credit_note_detail(request, pk):
 @login_required
 def daily_sales_report(request):
     """Sales overview with payment type and product breakdown - supports daily, weekly, monthly, yearly, and custom ranges"""
-    from django.db.models import Sum, Count, Q, F
+    from django.db.models import Sum, F
     from datetime import datetime, date, timedelta
     import calendar
     
@@ -1410,21 +1278,28 @@ def daily_sales_report(request):
         payment_date__lte=end_date
     ).select_related('invoice', 'invoice__client', 'client')
     
+    # Totals come from the pre-aggregated daily sales facts: rows without a
+    # product hold payments, rows with a product hold the paid invoice lines
+    facts = DailySalesFact.objects.filter(date__gte=start_date, date__lte=end_date)
+    payment_facts = facts.filter(product__isnull=True)
+    product_facts = facts.filter(product__isnull=False)
+    
     # Calculate totals by payment method
-    payment_summary = payments.values('payment_method').annotate(
+    payment_summary = payment_facts.values('payment_method').annotate(
         total=Sum('amount'),
-        count=Count('id')
+        count=Sum('payment_count')
     ).order_by('payment_method')
     
     # Calculate overall totals
-    total_sales = payments.aggregate(total=Sum('amount'))['total'] or 0
-    total_transactions = payments.count()
+    overall = payment_facts.aggregate(total=Sum('amount'), count=Sum('payment_count'))
+    total_sales = overall['total'] or 0
+    total_transactions = overall['count'] or 0
     
     # Get invoices created in the date range
     invoices_created = Invoice.objects.filter(
         issue_date__gte=start_date,
         issue_date__lte=end_date
-    )
+    ).select_related('client')
     invoices_created_total = invoices_created.aggregate(total=Sum('total_amount'))['total'] or 0
     invoices_created_count = invoices_created.count()
     
@@ -1435,15 +1310,12 @@ def daily_sales_report(request):
     ).distinct()
     
     # Get product sales breakdown for invoices paid in this range
-    product_summary = InvoiceItem.objects.filter(
-        invoice__payments__payment_date__gte=start_date,
-        invoice__payments__payment_date__lte=end_date
-    ).values(
+    product_summary = product_facts.values(
         'product__name'
     ).annotate(
         quantity_sold=Sum('quantity'),
-        total_sales=Sum('total'),
-        total_vat=Sum('tax_amount')
+        total_sales=Sum('sales_total'),
+        total_vat=Sum('vat_amount')
     ).order_by('-total_sales')
     
     # Calculate product totals
@@ -1462,11 +1334,11 @@ def daily_sales_report(request):
     if num_days > 1:
         # Group payments by day of week
         from django.db.models.functions import ExtractWeekDay
-        dow_summary = payments.annotate(
-            dow=ExtractWeekDay('payment_date')
+        dow_summary = payment_facts.annotate(
+            dow=ExtractWeekDay('date')
         ).values('dow').annotate(
             total=Sum('amount'),
-            count=Count('id')
+            count=Sum('payment_count')
         ).order_by('dow')
         
         # Map day numbers to names (1=Sunday, 2=Monday, etc.)
@@ -1487,160 +1359,134 @@ def daily_sales_report(request):
     
     # Weekly breakdown by day (for weekly view)
     if range_type == 'weekly':
-        current_date = start_date
-        while current_date <= end_date:
-            day_payments = payments.filter(payment_date=current_date)
-            day_total = day_payments.aggregate(total=Sum('amount'))['total'] or 0
-            day_count = day_payments.count()
-            daily_breakdown.append({
-                'date': current_date,
-                'day_name': current_date.strftime('%A'),
-                'total': day_total,
-                'count': day_count
-            })
-            current_date += timedelta(days=1)
+        daily_breakdown = [
+            {
+                'date': bucket['start'],
+                'day_name': bucket['start'].strftime('%A'),
+                'total': bucket['total'],
+                'count': bucket['count']
+            }
+            for bucket in bucket_series(payment_facts, 'date', 'day', start_date, end_date, count='payment_count')
+        ]
     
     # Monthly breakdown by day and week (for monthly view)
     elif range_type == 'monthly':
         # Daily breakdown
-        current_date = start_date
-        while current_date <= end_date:
-            day_payments = payments.filter(payment_date=current_date)
-            day_total = day_payments.aggregate(total=Sum('amount'))['total'] or 0
-            day_count = day_payments.count()
-            daily_breakdown.append({
-                'date': current_date,
-                'day_name': current_date.strftime('%a'),
-                'total': day_total,
-                'count': day_count
-            })
-            current_date += timedelta(days=1)
+        daily_breakdown = [
+            {
+                'date': bucket['start'],
+                'day_name': bucket['start'].strftime('%a'),
+                'total': bucket['total'],
+                'count': bucket['count']
+            }
+            for bucket in bucket_series(payment_facts, 'date', 'day', start_date, end_date, count='payment_count')
+        ]
         
-        # Weekly breakdown
-        week_start = start_date - timedelta(days=start_date.weekday())  # Start from Monday
-        week_num = 1
-        while week_start <= end_date:
-            week_end = min(week_start + timedelta(days=6), end_date)
-            # Only include weeks that overlap with the month
-            if week_end >= start_date:
-                actual_start = max(week_start, start_date)
-                actual_end = min(week_end, end_date)
-                week_payments = payments.filter(
-                    payment_date__gte=actual_start,
-                    payment_date__lte=actual_end
-                )
-                week_total = week_payments.aggregate(total=Sum('amount'))['total'] or 0
-                week_count = week_payments.count()
-                weekly_breakdown.append({
-                    'week_num': week_num,
-                    'start_date': actual_start,
-                    'end_date': actual_end,
-                    'total': week_total,
-                    'count': week_count
-                })
-                week_num += 1
-            week_start += timedelta(days=7)
+        # Weekly breakdown (Monday-based weeks, clipped to the month)
+        weekly_breakdown = [
+            {
+                'week_num': week_num,
+                'start_date': bucket['start'],
+                'end_date': bucket['end'],
+                'total': bucket['total'],
+                'count': bucket['count']
+            }
+            for week_num, bucket in enumerate(
+                bucket_series(payment_facts, 'date', 'week', start_date, end_date, count='payment_count'), start=1
+            )
+        ]
     
     # Yearly breakdown by day, week, and month (for yearly view)
     elif range_type == 'yearly':
-        # Daily breakdown (aggregated by day of year)
-        from django.db.models.functions import TruncDate
-        daily_summary = payments.annotate(
-            date=TruncDate('payment_date')
-        ).values('date').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('date')
-        
+        # Daily breakdown (only days with sales)
         daily_breakdown = [
             {
-                'date': item['date'],
-                'day_name': item['date'].strftime('%a'),
-                'total': item['total'],
-                'count': item['count']
+                'date': bucket['start'],
+                'day_name': bucket['start'].strftime('%a'),
+                'total': bucket['total'],
+                'count': bucket['count']
             }
-            for item in daily_summary
+            for bucket in bucket_series(payment_facts, 'date', 'day', start_date, end_date, count='payment_count')
+            if bucket['count']
         ]
         
-        # Weekly breakdown
-        week_start = start_date
-        week_num = 1
-        while week_start <= end_date:
-            week_end = min(week_start + timedelta(days=6), end_date)
-            week_payments = payments.filter(
-                payment_date__gte=week_start,
-                payment_date__lte=week_end
+        # Weekly breakdown (Monday-based weeks, only weeks with sales)
+        weekly_breakdown = [
+            {
+                'week_num': week_num,
+                'start_date': bucket['start'],
+                'end_date': bucket['end'],
+                'total': bucket['total'],
+                'count': bucket['count']
+            }
+            for week_num, bucket in enumerate(
+                bucket_series(payment_facts, 'date', 'week', start_date, end_date, count='payment_count'), start=1
             )
-            week_total = week_payments.aggregate(total=Sum('amount'))['total'] or 0
-            week_count = week_payments.count()
-            if week_total > 0 or week_count > 0:  # Only include weeks with data
-                weekly_breakdown.append({
-                    'week_num': week_num,
-                    'start_date': week_start,
-                    'end_date': week_end,
-                    'total': week_total,
-                    'count': week_count
-                })
-            week_start += timedelta(days=7)
-            week_num += 1
+            if bucket['count']
+        ]
         
         # Monthly breakdown
-        for month_num in range(1, 13):
-            month_start = date(start_date.year, month_num, 1)
-            last_day = calendar.monthrange(start_date.year, month_num)[1]
-            month_end = date(start_date.year, month_num, last_day)
-            month_payments = payments.filter(
-                payment_date__gte=month_start,
-                payment_date__lte=month_end
-            )
-            month_total = month_payments.aggregate(total=Sum('amount'))['total'] or 0
-            month_count = month_payments.count()
-            monthly_breakdown.append({
-                'month_num': month_num,
-                'month_name': month_start.strftime('%B'),
-                'total': month_total,
-                'count': month_count
-            })
+        monthly_breakdown = [
+            {
+                'month_num': bucket['start'].month,
+                'month_name': bucket['start'].strftime('%B'),
+                'total': bucket['total'],
+                'count': bucket['count']
+            }
+            for bucket in bucket_series(payment_facts, 'date', 'month', start_date, end_date, count='payment_count')
+        ]
     
     # Lead time analysis - calculate days between orders for each client
-    from django.db.models import Min, Max
+    from django.db.models import Window
+    from django.db.models.functions import Lag
     lead_time_data = []
     
-    # Get all clients who have invoices in the date range
+    # Full invoice history of every client with invoices in the date range,
+    # each row carrying the client's previous issue date from a LAG window
     clients_with_invoices = Invoice.objects.filter(
         issue_date__gte=start_date,
         issue_date__lte=end_date
-    ).values_list('client_id', flat=True).distinct()
-    
-    for client_id in clients_with_invoices:
-        client = Client.objects.get(id=client_id)
-        client_invoices = Invoice.objects.filter(
-            client_id=client_id
-        ).order_by('issue_date')
-        
-        if client_invoices.count() >= 2:
-            # Calculate intervals between consecutive invoices
-            invoice_dates = list(client_invoices.values_list('issue_date', flat=True))
-            intervals = []
-            for i in range(1, len(invoice_dates)):
-                days_between = (invoice_dates[i] - invoice_dates[i-1]).days
-                intervals.append(days_between)
-            
-            if intervals:
-                avg_interval = sum(intervals) / len(intervals)
-                min_interval = min(intervals)
-                max_interval = max(intervals)
-                
-                lead_time_data.append({
-                    'client': client,
-                    'client_id': client_id,
-                    'total_orders': client_invoices.count(),
-                    'avg_days_between': round(avg_interval, 1),
-                    'min_days_between': min_interval,
-                    'max_days_between': max_interval,
-                    'last_order_date': invoice_dates[-1],
-                    'first_order_date': invoice_dates[0],
-                })
+    ).values('client_id')
+    invoice_intervals = Invoice.objects.filter(
+        client_id__in=clients_with_invoices
+    ).annotate(
+        previous_date=Window(
+            expression=Lag('issue_date'),
+            partition_by=[F('client_id')],
+            order_by=[F('issue_date').asc(), F('id').asc()],
+        )
+    ).order_by('client_id', 'issue_date', 'id').values_list('client_id', 'issue_date', 'previous_date')
+    
+    client_intervals = {}
+    for client_id, issue_date, previous_date in invoice_intervals:
+        entry = client_intervals.setdefault(client_id, {
+            'total_orders': 0,
+            'first_order_date': issue_date,
+            'intervals': [],
+        })
+        entry['total_orders'] += 1
+        entry['last_order_date'] = issue_date
+        if previous_date is not None:
+            entry['intervals'].append((issue_date - previous_date).days)
+    
+    # Client names in one bulk fetch
+    clients = Client.objects.in_bulk(
+        [client_id for client_id, entry in client_intervals.items() if entry['intervals']]
+    )
+    for client_id, entry in client_intervals.items():
+        intervals = entry['intervals']
+        if not intervals:
+            continue
+        lead_time_data.append({
+            'client': clients[client_id],
+            'client_id': client_id,
+            'total_orders': entry['total_orders'],
+            'avg_days_between': round(sum(intervals) / len(intervals), 1),
+            'min_days_between': min(intervals),
+            'max_days_between': max(intervals),
+            'last_order_date': entry['last_order_date'],
+            'first_order_date': entry['first_order_date'],
+        })
     
     # Sort by average days between orders
     lead_time_data.sort(key=lambda x: x['avg_days_between'])
@@ -1681,11 +1527,18 @@ def accounting_dashboard(request):
     """Accounting dashboard with overview"""
     from django.db.models import Sum, Count, Q
     from datetime import datetime, timedelta
+    import calendar
     
     # Get current month data
     today = datetime.now()
     first_day = today.replace(day=1)
     
+    # Same stretch of the month a year ago (29 Feb falls back to the 28th)
+    last_year_first_day = first_day.date().replace(year=first_day.year - 1)
+    last_year_today = last_year_first_day.replace(
+        day=min(today.day, calendar.monthrange(last_year_first_day.year, last_year_first_day.month)[1])
+    )
+    
     stats = {
         'total_clients': Client.objects.filter(is_active=True).count(),
         'pending_quotes': Quote.objects.filter(status='draft').count(),
@@ -1694,10 +1547,16 @@ def accounting_dashboard(request):
             status__in=['draft', 'sent'],
             due_date__lt=today
         ).count(),
-        'monthly_revenue': Invoice.objects.filter(
-            issue_date__gte=first_day,
-            status='paid'
-        ).aggregate(total=Sum('total_amount'))['total'] or 0,
+        'monthly_revenue': DailySalesFact.objects.filter(
+            date__gte=first_day.date(),
+            date__lte=today.date(),
+            product__isnull=True
+        ).aggregate(total=Sum('amount'))['total'] or 0,
+        'monthly_revenue_last_year': DailySalesFact.objects.filter(
+            date__gte=last_year_first_day,
+            date__lte=last_year_today,
+            product__isnull=True
+        ).aggregate(total=Sum('amount'))['total'] or 0,
         'outstanding_amount': Invoice.objects.filter(
             status__in=['draft', 'sent']
         ).aggregate(total=Sum('total_amount'))['total'] or 0,
@@ -2323,4 +2182,5 @@ def journal_entry_detail(request, pk):
     entry = get_object_or_404(JournalEntry, pk=pk)
     return render(request, 'core/journal_entry_detail.html', {
         'entry': entry,
+        'lines': entry.lines.select_related('account'),
     })
@@ -0,0 +1,145 @@
+import csv
+from datetime import date
+from django.shortcuts import render, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from .models import AccountType
+from .services import ledger
+
+
+# Ledger lines per page in the account ledger view and API
+LEDGER_PAGE_SIZE = 100
+
+
+class Echo:
+    """File-like object for csv.writer that hands each row back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def _date_param(request, name):
+    value = request.GET.get(name, '')
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise Http404(f'Invalid {name}')
+
+
+def _ledger_request(request, pk):
+    """Account, period and keyset position of an account ledger request"""
+    account = get_object_or_404(AccountType, pk=pk)
+    start_date = _date_param(request, 'start_date')
+    end_date = _date_param(request, 'end_date')
+    after = None
+    if request.GET.get('after'):
+        try:
+            after = ledger.parse_cursor(request.GET['after'])
+        except ValueError:
+            raise Http404('Invalid page cursor')
+    return account, start_date, end_date, after
+
+
+@login_required
+def trial_balance(request):
+    """Trial balance of every account as at a date"""
+    as_of = _date_param(request, 'as_of') or date.today()
+    rows = ledger.trial_balance(as_of)
+
+    return render(request, 'core/trial_balance.html', {
+        'rows': rows,
+        'as_of': as_of,
+        'total_debit': sum((row['debit'] for row in rows), ledger.ZERO),
+        'total_credit': sum((row['credit'] for row in rows), ledger.ZERO),
+    })
+
+
+@login_required
+def trial_balance_api(request):
+    """Trial balance as JSON"""
+    as_of = _date_param(request, 'as_of') or date.today()
+    rows = ledger.trial_balance(as_of)
+
+    return JsonResponse({
+        'as_of': as_of.isoformat(),
+        'accounts': [
+            {
+                'id': row['account'].pk,
+                'code': row['account'].code,
+                'name': row['account'].name,
+                'category': row['account'].category,
+                'debit': str(row['debit']),
+                'credit': str(row['credit']),
+            }
+            for row in rows
+        ],
+        'total_debit': str(sum((row['debit'] for row in rows), ledger.ZERO)),
+        'total_credit': str(sum((row['credit'] for row in rows), ledger.ZERO)),
+    })
+
+
+@login_required
+def account_ledger(request, pk):
+    """One account's posted journal lines with a running balance, a page at a time"""
+    account, start_date, end_date, after = _ledger_request(request, pk)
+    opening, lines, next_after = ledger.ledger_page(account, start_date, end_date, after, LEDGER_PAGE_SIZE)
+
+    return render(request, 'core/account_ledger.html', {
+        'account': account,
+        'start_date': start_date,
+        'end_date': end_date,
+        'opening_balance': opening,
+        'lines': lines,
+        'is_first_page': after is None,
+        'next_cursor': ledger.format_cursor(next_after) if next_after else '',
+    })
+
+
+@login_required
+def account_ledger_api(request, pk):
+    """A page of an account's ledger as JSON; pass next_cursor back as ?after= for the next page"""
+    account, start_date, end_date, after = _ledger_request(request, pk)
+    opening, lines, next_after = ledger.ledger_page(account, start_date, end_date, after, LEDGER_PAGE_SIZE)
+
+    return JsonResponse({
+        'account': {'id': account.pk, 'code': account.code, 'name': account.name},
+        'opening_balance': str(opening),
+        'lines': [
+            {
+                'id': line.pk,
+                'date': line.date.isoformat(),
+                'entry_number': line.entry.entry_number,
+                'description': line.description or line.entry.description,
+                'debit': str(line.debit),
+                'credit': str(line.credit),
+                'running_balance': str(line.running_balance),
+            }
+            for line in lines
+        ],
+        'next_cursor': ledger.format_cursor(next_after) if next_after else None,
+    })
+
+
+@login_required
+def account_ledger_csv(request, pk):
+    """Whole account ledger for the period as CSV, streamed as it is read"""
+    account, start_date, end_date, _ = _ledger_request(request, pk)
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(['Date', 'Entry', 'Description', 'Debit', 'Credit', 'Balance'])
+        for line in ledger.iter_ledger(account, start_date, end_date):
+            yield writer.writerow([
+                line.date.isoformat(),
+                line.entry.entry_number,
+                line.description or line.entry.description,
+                line.debit,
+                line.credit,
+                line.running_balance,
+            ])
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="ledger_{account.code}_{date.today().isoformat()}.csv"'
+    return response